@@ -179,6 +179,68 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# 用例/套件执行与性能测试分别使用独立队列，避免长时间的压测阻塞功能测试
+CELERY_TASK_ROUTES = {
+    'executions.*': {'queue': 'executions'},
+    'performance.*': {'queue': 'performance'},
+}
+
+# 执行任务队列：celery（提交到 Celery worker）或 local（本进程内线程池，适用于未部署 Redis 的环境）
+EXECUTION_QUEUE_BACKEND = os.getenv('EXECUTION_QUEUE_BACKEND', 'local')
+# 本地队列的工作线程数
+LOCAL_JOB_WORKERS = int(os.getenv('LOCAL_JOB_WORKERS', '4'))
+
+# 套件/参数化子执行记录批量写入：缓冲条数达到阈值或距上次写入超过指定秒数时写入
+EXECUTION_RECORD_BATCH_SIZE = int(os.getenv('EXECUTION_RECORD_BATCH_SIZE', '100'))
+EXECUTION_RECORD_FLUSH_INTERVAL = float(os.getenv('EXECUTION_RECORD_FLUSH_INTERVAL', '2'))
+
+# 执行结果大字段（响应体、响应头等）单独压缩存储：db（ResultBlob 表）或 filesystem（RESULT_BLOB_DIR 目录）
+RESULT_BLOB_BACKEND = os.getenv('RESULT_BLOB_BACKEND', 'db')
+# 大字段合计超过该字节数时才单独存储
+RESULT_BLOB_THRESHOLD = int(os.getenv('RESULT_BLOB_THRESHOLD', '1024'))
+RESULT_BLOB_DIR = os.getenv('RESULT_BLOB_DIR', os.path.join(MEDIA_ROOT, 'result_blobs'))
+
+# 测试套件并行执行：未在套件上单独配置时使用的默认最大并发数
+SUITE_MAX_CONCURRENCY = int(os.getenv('SUITE_MAX_CONCURRENCY', '4'))
+
+# 用例执行模式：sync（requests，同步逐个发送）或 async（httpx，单进程内并发发送）
+TESTCASE_EXECUTION_MODE = os.getenv('TESTCASE_EXECUTION_MODE', 'sync')
+# 异步执行模式下同时在途的最大请求数
+ASYNC_EXECUTION_CONCURRENCY = int(os.getenv('ASYNC_EXECUTION_CONCURRENCY', '100'))
+
+# 响应体读取：内存中最多保留的字节数（超出部分只计算大小和摘要，断言和变量提取只能使用保留部分）
+RESPONSE_CAPTURE_MAX_BYTES = int(os.getenv('RESPONSE_CAPTURE_MAX_BYTES', str(10 * 1024 * 1024)))
+# 执行结果中保存的响应体最大字节数（超出时只保存前缀，以及完整响应体的大小和 SHA-256）
+RESPONSE_PERSIST_MAX_BYTES = int(os.getenv('RESPONSE_PERSIST_MAX_BYTES', str(1024 * 1024)))
+# 流式读取响应体的分块大小
+RESPONSE_CHUNK_SIZE = int(os.getenv('RESPONSE_CHUNK_SIZE', str(64 * 1024)))
+
+# 用户脚本（前置/后置脚本、手动断言、环境钩子）在常驻的脚本进程池中执行
+SCRIPT_SANDBOX_ENABLED = os.getenv('SCRIPT_SANDBOX_ENABLED', 'True') == 'True'
+# 脚本进程数量
+SCRIPT_POOL_SIZE = int(os.getenv('SCRIPT_POOL_SIZE', '2'))
+# 单个脚本的最长执行时间（秒），超时的脚本进程会被结束
+SCRIPT_TIMEOUT = float(os.getenv('SCRIPT_TIMEOUT', '5'))
+# 脚本进程的内存上限（MB）
+SCRIPT_MEMORY_LIMIT_MB = int(os.getenv('SCRIPT_MEMORY_LIMIT_MB', '512'))
+
+# 性能测试执行引擎：cli（locust 命令行，解析 CSV 结果）或 embedded（独立进程中通过 Locust Python API 运行，
+# 请求事件直接记录到直方图，百分位精确并包含状态码分布和错误样例；只支持单进程）
+LOCUST_ENGINE = os.getenv('LOCUST_ENGINE', 'cli')
+# 性能测试：分布式压测的 Locust worker 进程数（0 表示使用 CPU 核数，1 表示单进程），可在性能测试上单独配置
+LOCUST_WORKERS = int(os.getenv('LOCUST_WORKERS', '0'))
+# 等待所有 worker 连接到 master 的最长时间（秒）
+LOCUST_WORKER_CONNECT_TIMEOUT = int(os.getenv('LOCUST_WORKER_CONNECT_TIMEOUT', '30'))
+# 按循环次数执行（持续时间为 0）的最长运行时间（秒），超时后结束所有 Locust 进程
+LOCUST_LOOP_TIMEOUT = int(os.getenv('LOCUST_LOOP_TIMEOUT', '3600'))
+# 性能测试实时指标：每次运行在内存中保留的最近数据点数（每秒一个）和同时跟踪的运行数
+PERF_LIVE_BUFFER_SIZE = int(os.getenv('PERF_LIVE_BUFFER_SIZE', '900'))
+PERF_LIVE_MAX_RUNS = int(os.getenv('PERF_LIVE_MAX_RUNS', '32'))
+# SSE 推送间隔（秒）和单个连接的最长时间（秒，超时后客户端携带 Last-Event-ID 重连）
+PERF_LIVE_STREAM_INTERVAL = float(os.getenv('PERF_LIVE_STREAM_INTERVAL', '1'))
+PERF_LIVE_STREAM_TIMEOUT = int(os.getenv('PERF_LIVE_STREAM_TIMEOUT', '600'))
+# 性能回归检测的显著性水平（变化超过容差且 p 值小于该值才判定为回归）
+PERF_REGRESSION_ALPHA = float(os.getenv('PERF_REGRESSION_ALPHA', '0.05'))
 
 # Logging
 LOGGING = {
@@ -5,13 +5,13 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
 import requests
-import re
 import time
 from typing import Dict, Any, Optional
 from .models import API
 from .serializers import APISerializer
 from .importers import PostmanImporter, SwaggerImporter
 from .exporters import PostmanExporter
+from apps.testcases.templating import compile_template, render, render_field
 
 
 class APIViewSet(viewsets.ModelViewSet):
@@ -45,25 +45,11 @@ class APIViewSet(viewsets.ModelViewSet):
         """替换变量 ${variable}"""
         if not text or not isinstance(text, str):
             return text
-        
-        vars_dict = variables or {}
-        
-        def replace_match(match):
-            var_name = match.group(1)
-            return str(vars_dict.get(var_name, match.group(0)))
-        
-        return re.sub(r'\$\{(\w+)\}', replace_match, text)
+        return compile_template(text).render(variables or {})
     
     def _replace_variables_in_dict(self, data: Dict, variables: Dict = None) -> Dict:
         """递归替换字典中的变量"""
-        if isinstance(data, dict):
-            return {k: self._replace_variables_in_dict(v, variables) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._replace_variables_in_dict(item, variables) for item in data]
-        elif isinstance(data, str):
-            return self._replace_variables(data, variables)
-        else:
-            return data
+        return render(data, variables or {})
 
     def _build_url(self, api_instance: API, base_url: str = '') -> str:
         """构建完整的请求URL（不替换变量，变量在execute中替换）"""
@@ -138,8 +124,8 @@ class APIViewSet(viewsets.ModelViewSet):
             # 构建请求参数
             url = self._build_url(api_instance, base_url)
             headers = self._build_headers(api_instance, variables)
-            params = self._replace_variables_in_dict(api_instance.params or {}, variables)
-            body = self._replace_variables_in_dict(api_instance.body or {}, variables)
+            params = render_field(api_instance, 'params', variables or {}, {})
+            body = render_field(api_instance, 'body', variables or {}, {})
             auth = self._build_auth(api_instance, variables)
             
             # 替换URL中的变量
@@ -170,29 +156,32 @@ class APIViewSet(viewsets.ModelViewSet):
             # 发送请求（只计算HTTP请求的实际时间）
             # 使用Session来复用连接，减少连接建立时间
             from apps.testcases.executor import get_session
+            from apps.testcases.capture import capture_response
             session = get_session()
             method = request_kwargs.pop('method')
-            response = session.request(method=method, **request_kwargs)
+            raw_response = session.request(method=method, stream=True, **request_kwargs)
             
             # 使用response.elapsed获取真实的HTTP请求时间（不包括平台处理时间）
-            http_request_time_ms = response.elapsed.total_seconds() * 1000  # 转换为毫秒
+            http_request_time_ms = raw_response.elapsed.total_seconds() * 1000  # 转换为毫秒
+            
+            # 流式读取响应体（大响应只保留前缀）
+            response = capture_response(raw_response)
+            body_info = response.persisted_body()
             
             # 构建响应
             result = {
                 'status_code': response.status_code,
                 'headers': dict(response.headers),
-                'body': response.text,
+                **body_info,
                 'time': round(http_request_time_ms, 2),
                 'url': url,
                 'success': 200 <= response.status_code < 300,
                 'variables': variables.copy() if variables else {}  # 记录使用的变量
             }
             
-            # 尝试解析JSON响应
-            try:
-                result['json'] = response.json()
-            except:
-                pass
+            # 尝试解析JSON响应（响应体被截断时不返回）
+            if not body_info['body_truncated'] and response.json_data is not None:
+                result['json'] = response.json_data
             
             return result
             
@@ -6,5 +6,17 @@ class EnvironmentsConfig(AppConfig):
     name = 'apps.environments'
     verbose_name = '环境管理'
 
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from apps.testcases.scripts import invalidate_scripts
+        from .models import Environment, GlobalToken
+        from .tokens import invalidate_global_token_resolvers
 
-
+        # 全局 Token 变更时使执行中的 Token 缓存失效
+        post_save.connect(invalidate_global_token_resolvers, sender=GlobalToken,
+                          dispatch_uid='global_token_resolver_post_save')
+        post_delete.connect(invalidate_global_token_resolvers, sender=GlobalToken,
+                            dispatch_uid='global_token_resolver_post_delete')
+        # 环境更新/删除时清除其前置/后置钩子的编译缓存
+        post_save.connect(invalidate_scripts, sender=Environment, dispatch_uid='environment_scripts_post_save')
+        post_delete.connect(invalidate_scripts, sender=Environment, dispatch_uid='environment_scripts_post_delete')
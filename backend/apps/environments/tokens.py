@@ -0,0 +1,59 @@
+"""
+全局 Token 解析
+
+一次执行（单个用例、参数化执行、套件执行）创建一个解析器并传给所有执行器，
+全局 Token 只在首次使用时查询一次；GlobalToken 保存或删除时通过信号使本进程内
+所有存活的解析器失效，下次使用时重新加载。
+"""
+import threading
+import weakref
+from typing import Optional
+from .models import GlobalToken
+
+# 本进程内存活的解析器（弱引用，执行结束后自动移除）
+_resolvers = weakref.WeakSet()
+_resolvers_lock = threading.Lock()
+
+
+class GlobalTokenResolver:
+    """全局 Token 解析器"""
+
+    def __init__(self):
+        self._token = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        with _resolvers_lock:
+            _resolvers.add(self)
+
+    def get(self) -> Optional[GlobalToken]:
+        """
+        获取全局 Token
+        优先级：默认 Token > 启用的第一个 Token（即模型默认排序下的第一个启用 Token）
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._token = self._load()
+                    self._loaded = True
+        return self._token
+
+    @staticmethod
+    def _load() -> Optional[GlobalToken]:
+        try:
+            return GlobalToken.objects.filter(is_active=True).order_by('-is_default', '-created_at').first()
+        except Exception:
+            return None
+
+    def invalidate(self) -> None:
+        """使缓存失效，下次获取时重新查询"""
+        with self._lock:
+            self._token = None
+            self._loaded = False
+
+
+def invalidate_global_token_resolvers(**kwargs) -> None:
+    """GlobalToken 变更时使所有解析器失效（post_save/post_delete 信号处理函数）"""
+    with _resolvers_lock:
+        resolvers = list(_resolvers)
+    for resolver in resolvers:
+        resolver.invalidate()
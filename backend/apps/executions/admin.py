@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Execution
+from .models import Execution, ProjectHourlyStat, TestCaseHourlyStat, TestCaseLatestStatus, ResultBlob
 
 
 @admin.register(Execution)
@@ -36,3 +36,37 @@ class ExecutionAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('project', 'testsuite', 'testcase', 'executor', 'parent')
 
+
+
+@admin.register(ProjectHourlyStat)
+class ProjectHourlyStatAdmin(admin.ModelAdmin):
+    """项目小时统计（汇总表）"""
+    list_display = ('project', 'hour', 'total', 'passed', 'failed', 'skipped', 'duration_sum', 'duration_count')
+    list_filter = ('project',)
+    date_hierarchy = 'hour'
+
+
+@admin.register(TestCaseHourlyStat)
+class TestCaseHourlyStatAdmin(admin.ModelAdmin):
+    """用例小时统计（汇总表）"""
+    list_display = ('testcase', 'project', 'hour', 'total', 'passed', 'failed', 'skipped', 'duration_sum', 'duration_count')
+    list_filter = ('project',)
+    date_hierarchy = 'hour'
+    list_select_related = ('testcase', 'project')
+
+
+@admin.register(TestCaseLatestStatus)
+class TestCaseLatestStatusAdmin(admin.ModelAdmin):
+    """用例最新状态（汇总表）"""
+    list_display = ('testcase', 'status', 'execution', 'executed_at')
+    list_filter = ('status',)
+    list_select_related = ('testcase',)
+
+
+@admin.register(ResultBlob)
+class ResultBlobAdmin(admin.ModelAdmin):
+    """执行结果数据管理"""
+    list_display = ('digest', 'size', 'created_at')
+    search_fields = ('digest',)
+    readonly_fields = ('digest', 'size', 'created_at')
+    exclude = ('data',)
@@ -0,0 +1,254 @@
+"""
+执行结果大字段存储
+
+Execution.result 中的响应体、解析后的JSON、响应头和提取变量等大字段单独压缩存储，
+按内容的 SHA-256 寻址（相同内容只存一份）。result 中只保留摘要信息和引用：
+    result['payload_ref'] = {'digest': ..., 'size': ..., 'fields': [...]}
+列表查询不再传输大字段，详情和报告导出时再按需加载（hydrate_results）。
+
+存储后端由 RESULT_BLOB_BACKEND 配置：db（ResultBlob 表，默认）或 filesystem（RESULT_BLOB_DIR 目录）。
+删除执行记录时清理不再被任何执行记录引用的内容（release_blobs），
+遗留的孤立内容由 cleanup_result_blobs 命令清理。
+"""
+import json
+import zlib
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Execution, ResultBlob
+
+logger = logging.getLogger(__name__)
+
+# 单独存储的结果字段
+PAYLOAD_FIELDS = ('body', 'json', 'headers', 'extracted_variables')
+# 结果摘要中保留的响应体预览长度
+BODY_PREVIEW_LENGTH = 200
+
+
+def _backend() -> str:
+    return getattr(settings, 'RESULT_BLOB_BACKEND', 'db')
+
+
+def _threshold() -> int:
+    """大字段合计超过该字节数时才单独存储"""
+    return getattr(settings, 'RESULT_BLOB_THRESHOLD', 1024)
+
+
+def _blob_dir() -> Path:
+    return Path(getattr(settings, 'RESULT_BLOB_DIR', Path(settings.MEDIA_ROOT) / 'result_blobs'))
+
+
+def _blob_path(digest: str) -> Path:
+    return _blob_dir() / digest[:2] / digest[2:4] / digest
+
+
+def _encode(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+
+
+def put_blobs(payloads: Dict[str, bytes]) -> None:
+    """
+    批量写入（已编码的）内容，已存在的摘要直接跳过
+    :param payloads: {digest: 原始内容}
+    """
+    if not payloads:
+        return
+    if _backend() == 'filesystem':
+        for digest, raw in payloads.items():
+            path = _blob_path(digest)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(zlib.compress(raw))
+            tmp_path.replace(path)
+        return
+    existing = set(ResultBlob.objects.filter(digest__in=list(payloads)).values_list('digest', flat=True))
+    ResultBlob.objects.bulk_create([
+        ResultBlob(digest=digest, data=zlib.compress(raw), size=len(raw))
+        for digest, raw in payloads.items() if digest not in existing
+    ], ignore_conflicts=True)
+
+
+def get_blobs(digests: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """批量读取内容（一次查询），返回 {digest: 解码后的字典}"""
+    digests = {digest for digest in digests if digest}
+    if not digests:
+        return {}
+    blobs = {}
+    if _backend() == 'filesystem':
+        for digest in digests:
+            path = _blob_path(digest)
+            if path.exists():
+                blobs[digest] = path.read_bytes()
+    else:
+        for digest, data in ResultBlob.objects.filter(digest__in=digests).values_list('digest', 'data'):
+            blobs[digest] = bytes(data)
+    decoded = {}
+    for digest, data in blobs.items():
+        try:
+            decoded[digest] = json.loads(zlib.decompress(data).decode('utf-8'))
+        except Exception as e:
+            logger.warning(f"读取执行结果数据 {digest} 失败: {e}")
+    return decoded
+
+
+def _split(result: Any, pending: Dict[str, bytes]) -> Any:
+    """拆分单个结果：大字段编码后放入 pending，返回只含摘要和引用的结果"""
+    if not isinstance(result, dict) or 'payload_ref' in result:
+        return result
+    payload = {field: result[field] for field in PAYLOAD_FIELDS if result.get(field) not in (None, '', {}, [])}
+    if not payload:
+        return result
+    raw = _encode(payload)
+    if len(raw) < _threshold():
+        return result
+    digest = hashlib.sha256(raw).hexdigest()
+    pending[digest] = raw
+
+    packed = {key: value for key, value in result.items() if key not in payload}
+    body = result.get('body')
+    if isinstance(body, str) and body:
+        packed['body_preview'] = body[:BODY_PREVIEW_LENGTH]
+    packed['payload_ref'] = {'digest': digest, 'size': len(raw), 'fields': sorted(payload)}
+    return packed
+
+
+def pack_result(result: Any) -> Any:
+    """拆分并存储单个执行结果的大字段"""
+    pending: Dict[str, bytes] = {}
+    packed = _split(result, pending)
+    put_blobs(pending)
+    return packed
+
+
+def pack_executions(executions: Iterable) -> None:
+    """批量拆分执行记录的结果（写入前调用，大字段一次批量存储）"""
+    pending: Dict[str, bytes] = {}
+    for execution in executions:
+        execution.result = _split(execution.result, pending)
+    put_blobs(pending)
+
+
+def summarize_result(result: Any) -> Any:
+    """
+    生成执行结果摘要（用于父记录中 case_results/results 的内嵌结果，不包含响应体等大字段）
+    完整结果在子执行记录中
+    """
+    if not isinstance(result, dict):
+        return result
+    return {key: value for key, value in result.items() if key not in PAYLOAD_FIELDS}
+
+
+def unpack_result(result: Any, blobs: Optional[Dict[str, Dict[str, Any]]] = None) -> Any:
+    """还原执行结果中引用的大字段"""
+    if not isinstance(result, dict) or 'payload_ref' not in result:
+        return result
+    digest = result['payload_ref'].get('digest')
+    if blobs is None:
+        blobs = get_blobs([digest])
+    payload = blobs.get(digest)
+    if payload is None:
+        return result
+    unpacked = {key: value for key, value in result.items() if key not in ('payload_ref', 'body_preview')}
+    unpacked.update(payload)
+    return unpacked
+
+
+def hydrate_results(executions: List) -> None:
+    """批量还原执行记录的结果（就地修改，一次读取所有引用的内容）"""
+    digests = [
+        execution.result['payload_ref'].get('digest')
+        for execution in executions
+        if isinstance(execution.result, dict) and 'payload_ref' in execution.result
+    ]
+    if not digests:
+        return
+    blobs = get_blobs(digests)
+    for execution in executions:
+        execution.result = unpack_result(execution.result, blobs)
+
+
+def referenced_digests(queryset) -> Set[str]:
+    """执行记录（包含级联删除的子记录）引用的内容摘要"""
+    ids = list(queryset.values_list('id', flat=True))
+    digests = Execution.objects.filter(
+        Q(id__in=ids) | Q(parent_id__in=ids)
+    ).values_list('result__payload_ref__digest', flat=True)
+    return {digest for digest in digests if digest}
+
+
+def _unreferenced(digests: Set[str]) -> Set[str]:
+    """过滤掉仍被执行记录引用的摘要"""
+    candidates = sorted(digests)
+    digests = set(candidates)
+    for offset in range(0, len(candidates), 500):
+        batch = candidates[offset:offset + 500]
+        still_used = Execution.objects.filter(
+            result__payload_ref__digest__in=batch
+        ).values_list('result__payload_ref__digest', flat=True)
+        digests.difference_update(still_used)
+    return digests
+
+
+def delete_blobs(digests: Iterable[str]) -> int:
+    """删除内容（不检查引用），返回删除的数量"""
+    digests = set(digests)
+    if not digests:
+        return 0
+    if _backend() == 'filesystem':
+        deleted = 0
+        for digest in digests:
+            try:
+                _blob_path(digest).unlink()
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+    return ResultBlob.objects.filter(digest__in=digests).delete()[0]
+
+
+def release_blobs(digests: Iterable[str]) -> int:
+    """
+    删除执行记录后调用：删除其中不再被任何执行记录引用的内容（相同内容可能被其他执行记录共享）
+    :return: 删除的数量
+    """
+    try:
+        return delete_blobs(_unreferenced(set(digests)))
+    except Exception as e:
+        logger.warning(f"清理执行结果数据失败: {e}")
+        return 0
+
+
+def stored_digests(before: Optional[datetime] = None) -> Set[str]:
+    """已存储的内容摘要，before 不为空时只返回此前写入的内容"""
+    if _backend() == 'filesystem':
+        blob_dir = _blob_dir()
+        if not blob_dir.exists():
+            return set()
+        cutoff = before.timestamp() if before else None
+        return {
+            path.name for path in blob_dir.glob('*/*/*')
+            if path.suffix != '.tmp' and (cutoff is None or path.stat().st_mtime < cutoff)
+        }
+    queryset = ResultBlob.objects.all()
+    if before is not None:
+        queryset = queryset.filter(created_at__lt=before)
+    return set(queryset.values_list('digest', flat=True))
+
+
+def cleanup_orphans(grace: timedelta = timedelta(hours=1), dry_run: bool = False) -> int:
+    """
+    清理没有被任何执行记录引用的内容
+    内容在执行记录写入前存储，只清理 grace 之前写入的内容，避免删除正在写入的执行记录引用的内容
+    :return: 清理（dry_run 时为待清理）的数量
+    """
+    orphans = _unreferenced(stored_digests(before=timezone.now() - grace))
+    if dry_run:
+        return len(orphans)
+    return delete_blobs(orphans)
@@ -0,0 +1,272 @@
+"""
+后台执行任务队列
+
+执行接口只负责创建执行记录并提交任务，立即返回执行记录ID；
+任务由专用的 Celery worker 执行，未部署 Redis/Celery 时使用本进程内的线程池执行。
+"""
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 本地队列（进程内线程池），按需创建
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def run_testcase_job(execution_id, parameterized_data=None):
+    """执行测试用例任务"""
+    from apps.testcases.runner import TestCaseRunner
+    from .models import Execution
+
+    execution = Execution.objects.select_related('testcase', 'executor').get(id=execution_id)
+    if not execution.testcase:
+        _mark_failed(execution, '测试用例不存在或已被删除')
+        return
+    try:
+        TestCaseRunner(execution.testcase, user=execution.executor).run(execution, parameterized_data)
+    except Exception as e:
+        _mark_failed(execution, f'执行失败: {str(e)}')
+        raise
+
+
+def run_testsuite_job(execution_id, max_concurrency=None):
+    """执行测试套件任务"""
+    from apps.testsuites.runner import SuiteRunner
+    from .models import Execution
+
+    execution = Execution.objects.select_related('testsuite', 'executor').get(id=execution_id)
+    if not execution.testsuite:
+        _mark_failed(execution, '测试套件不存在或已被删除')
+        return
+
+    execution.status = 'running'
+    execution.start_time = timezone.now()
+    execution.save(update_fields=['status', 'start_time'])
+    try:
+        SuiteRunner(execution.testsuite, user=execution.executor, max_workers=max_concurrency).run(execution)
+    except Exception as e:
+        _mark_failed(execution, f'执行失败: {str(e)}')
+        raise
+
+    # 发送通知
+    try:
+        from apps.notifications.service import send_execution_notification
+        send_execution_notification(execution)
+    except Exception as e:
+        # 通知失败不影响执行结果
+        logger.warning(f'发送通知失败: {str(e)}')
+
+
+def run_performance_job(performance_test_id):
+    """执行性能测试任务"""
+    from apps.testcases.models import PerformanceTest
+    from apps.testcases.locust_executor import LocustExecutor
+
+    performance_test = PerformanceTest.objects.select_related('api', 'environment', 'testsuite__environment').get(id=performance_test_id)
+    try:
+        result = LocustExecutor(performance_test).execute()
+    except Exception as e:
+        logger.exception(f"执行性能测试失败: {e}")
+        result = {'success': False, 'error': f'执行失败: {str(e)}'}
+
+    run = _record_performance_run(performance_test, result)
+    if run is not None:
+        result['run_id'] = run.id
+    regression = _check_performance_regression(performance_test, run) if result.get('success') else None
+    if regression:
+        result['regression'] = regression
+
+    if result.get('success'):
+        result['status'] = 'completed'
+        performance_test.last_result = result
+        performance_test.last_execution_time = timezone.now()
+        # 只更新结果字段，避免覆盖运行期间修改的配置（如基线运行）
+        performance_test.save(update_fields=['last_result', 'last_execution_time'])
+    else:
+        # 执行失败时保留上一次的成功结果，只记录本次的错误信息
+        last_result = dict(performance_test.last_result or {})
+        last_result.update({
+            'status': 'failed',
+            'error': result.get('error', '未知错误'),
+            'failed_result': result
+        })
+        performance_test.last_result = last_result
+        performance_test.save(update_fields=['last_result'])
+
+    if regression:
+        _notify_performance_regression(performance_test, run, regression)
+
+
+def _record_performance_run(performance_test, result):
+    """保存本次运行的汇总指标和每秒时间序列（历史运行对比使用），保存失败不影响执行结果"""
+    from django.utils.dateparse import parse_datetime
+    from apps.testcases.models import PerformanceRun
+    from apps.testcases.series import build_series
+
+    try:
+        series, series_names, point_count = build_series(result.get('csv_prefix'))
+        metrics = result.get('metrics') or {}
+        return PerformanceRun.objects.create(
+            performance_test=performance_test,
+            status='completed' if result.get('success') else 'failed',
+            start_time=parse_datetime(result['start_time']) if result.get('start_time') else None,
+            end_time=parse_datetime(result['end_time']) if result.get('end_time') else timezone.now(),
+            duration=result.get('duration') or 0,
+            threads=performance_test.threads,
+            workers=metrics.get('workers', 1),
+            summary={key: value for key, value in metrics.items() if key != 'response_times'},
+            error=None if result.get('success') else result.get('error'),
+            series=series,
+            series_names=series_names,
+            point_count=point_count,
+        )
+    except Exception as e:
+        logger.exception(f"保存性能测试运行记录失败: {e}")
+        return None
+
+
+def _check_performance_regression(performance_test, run):
+    """与性能测试的基线运行比较，结果保存到运行记录；没有基线时返回 None，检测失败不影响执行结果"""
+    from apps.testcases.models import PerformanceRun
+
+    if run is None or not performance_test.baseline_run_id or performance_test.baseline_run_id == run.id:
+        return None
+    try:
+        baseline = PerformanceRun.objects.get(id=performance_test.baseline_run_id)
+        regression = run.compare_to(baseline, performance_test.regression_tolerances)
+        run.verdict = regression['verdict']
+        run.regression = regression
+        run.save(update_fields=['verdict', 'regression'])
+    except Exception as e:
+        logger.exception(f"性能回归检测失败: {e}")
+        return None
+    logger.info(
+        f"性能测试 {performance_test.name} 回归检测: {regression['verdict']}"
+        f"（基线运行 {baseline.id}，回归指标: {', '.join(regression['regressions']) or '无'}）"
+    )
+    return regression
+
+
+def _notify_performance_regression(performance_test, run, regression):
+    """
+    回归检测结果记录为一条性能回归检测执行记录（execution_type='performance'）并发送通知：
+    有回归时执行记录为失败，与用例/套件执行共用通知渠道。
+    该记录不关联套件，也不计入执行统计汇总表，不影响套件执行列表和用例/项目的通过率统计
+    """
+    from .models import Execution
+
+    metrics = regression.get('metrics') or {}
+    failed = len(regression.get('regressions') or [])
+    total = len(metrics)
+    try:
+        execution = Execution.objects.create(
+            name=f"[性能测试] {performance_test.name}",
+            project_id=performance_test.project_id,
+            status='failed' if regression['verdict'] == 'failed' else 'passed',
+            execution_type='performance',
+            result={
+                'performance_test_id': performance_test.id,
+                'run_id': run.id,
+                'baseline_run_id': regression.get('baseline_run_id'),
+                'total': total,
+                'passed': total - failed,
+                'failed': failed,
+                'pass_rate': round((total - failed) / total * 100, 2) if total else 100,
+                'regression': regression,
+            },
+            start_time=run.start_time,
+            end_time=run.end_time,
+            duration=run.duration,
+        )
+    except Exception as e:
+        logger.exception(f"保存性能回归检测执行记录失败: {e}")
+        return
+
+    try:
+        from apps.notifications.service import send_execution_notification
+        send_execution_notification(execution)
+    except Exception as e:
+        # 通知失败不影响执行结果
+        logger.warning(f'发送通知失败: {str(e)}')
+
+
+JOBS = {
+    'run_testcase_job': run_testcase_job,
+    'run_testsuite_job': run_testsuite_job,
+    'run_performance_job': run_performance_job,
+}
+
+
+def _mark_failed(execution, error):
+    """任务无法执行时将执行记录标记为失败"""
+    execution.status = 'failed'
+    execution.result = {'error': error, 'success': False}
+    execution.end_time = timezone.now()
+    execution.save()
+
+    from .rollups import record_finished
+    record_finished([execution])
+
+
+def get_queue_backend() -> str:
+    """获取任务队列后端：celery 或 local"""
+    return getattr(settings, 'EXECUTION_QUEUE_BACKEND', 'local')
+
+
+def _get_local_pool() -> ThreadPoolExecutor:
+    """获取本地任务线程池"""
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LOCAL_JOB_WORKERS', 4),
+                thread_name_prefix='benchlink-job'
+            )
+    return _local_pool
+
+
+def _run_local_job(job_id, job_name, args):
+    """在本地线程池中执行任务"""
+    try:
+        JOBS[job_name](*args)
+    except Exception as e:
+        logger.exception(f"后台任务 {job_name}[{job_id}] 执行失败: {e}")
+    finally:
+        # 任务线程持有独立的数据库连接，执行完毕后关闭
+        connection.close()
+
+
+def _submit(job_id, job_name, args) -> None:
+    """提交任务到 Celery（未启用或 Broker 不可用时提交到本地队列）"""
+    if get_queue_backend() == 'celery':
+        try:
+            from . import tasks
+            getattr(tasks, job_name).apply_async(args=args, task_id=job_id, retry=False)
+            return
+        except Exception as e:
+            # Broker 不可用时回退到本地队列，保证执行请求不会丢失
+            logger.warning(f"提交 Celery 任务 {job_name} 失败，改用本地队列执行: {e}")
+    _get_local_pool().submit(_run_local_job, job_id, job_name, args)
+
+
+def enqueue(job_name, *args) -> str:
+    """
+    提交后台任务
+    :param job_name: 任务名称（见 JOBS）
+    :param args: 任务参数（需可JSON序列化）
+    :return: 任务ID
+    """
+    if job_name not in JOBS:
+        raise ValueError(f'未知的任务类型: {job_name}')
+
+    job_id = uuid.uuid4().hex
+    # 在当前事务提交后再提交任务（Celery 和本地队列相同），确保任务能读到刚创建的执行记录
+    from django.db import transaction
+    transaction.on_commit(lambda: _submit(job_id, job_name, args))
+    return job_id
@@ -0,0 +1,72 @@
+"""
+重建执行统计汇总表
+
+按天分批聚合 Execution 历史数据，写入项目/用例小时统计表，并重新计算用例最新状态。
+用法：
+    python manage.py backfill_execution_stats            # 全量重建
+    python manage.py backfill_execution_stats --days 30  # 只重建最近30天的小时统计
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from apps.executions.models import Execution, ProjectHourlyStat, TestCaseHourlyStat, TestCaseLatestStatus
+from apps.executions.rollups import (
+    COUNTER_FIELDS, aggregate_project_hours, aggregate_testcase_hours, refresh_latest_status, to_hour
+)
+from apps.testcases.models import TestCase
+
+
+class Command(BaseCommand):
+    help = '根据执行记录重建执行统计汇总表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='只重建最近N天的小时统计（默认全量重建）')
+        parser.add_argument('--chunk-days', type=int, default=1, help='每批聚合的天数（默认1天）')
+
+    def handle(self, *args, **options):
+        end = to_hour(timezone.now()) + timedelta(hours=1)
+        if options['days']:
+            start = to_hour(timezone.now() - timedelta(days=options['days']))
+        else:
+            first = Execution.objects.aggregate(first=Min('created_at'))['first']
+            start = to_hour(first) if first else end
+
+        # 删除范围内的旧统计后重建
+        ProjectHourlyStat.objects.filter(hour__gte=start).delete()
+        TestCaseHourlyStat.objects.filter(hour__gte=start).delete()
+
+        chunk = timedelta(days=max(options['chunk_days'], 1))
+        window_start = start
+        project_rows = testcase_rows = 0
+        while window_start < end:
+            window_end = min(window_start + chunk, end)
+            window = Execution.objects.filter(created_at__gte=window_start, created_at__lt=window_end)
+            with transaction.atomic():
+                project_stats = [
+                    ProjectHourlyStat(project_id=row['project_id'], hour=row['hour'],
+                                      **{field: row[field] or 0 for field in COUNTER_FIELDS})
+                    for row in aggregate_project_hours(window)
+                ]
+                testcase_stats = [
+                    TestCaseHourlyStat(testcase_id=row['testcase_id'], project_id=row['project_id'], hour=row['hour'],
+                                       **{field: row[field] or 0 for field in COUNTER_FIELDS})
+                    for row in aggregate_testcase_hours(window)
+                ]
+                ProjectHourlyStat.objects.bulk_create(project_stats, batch_size=1000)
+                TestCaseHourlyStat.objects.bulk_create(testcase_stats, batch_size=1000)
+            project_rows += len(project_stats)
+            testcase_rows += len(testcase_stats)
+            window_start = window_end
+
+        # 重新计算所有用例的最新状态
+        testcase_ids = list(TestCase.objects.values_list('id', flat=True))
+        TestCaseLatestStatus.objects.exclude(testcase_id__in=testcase_ids).delete()
+        for offset in range(0, len(testcase_ids), 500):
+            refresh_latest_status(testcase_ids[offset:offset + 500])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'统计汇总表重建完成：项目小时统计 {project_rows} 条，用例小时统计 {testcase_rows} 条，'
+            f'用例最新状态 {TestCaseLatestStatus.objects.count()} 条'
+        ))
@@ -0,0 +1,28 @@
+"""
+清理孤立的执行结果数据
+
+删除执行记录时会清理不再被引用的响应体等大字段（见 blobs.release_blobs），
+本命令清理遗留的孤立内容（如删除前写入失败、直接在数据库中删除的执行记录）。
+用法：
+    python manage.py cleanup_result_blobs              # 清理1小时前写入且未被引用的内容
+    python manage.py cleanup_result_blobs --dry-run    # 只统计数量，不删除
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from apps.executions.blobs import cleanup_orphans
+
+
+class Command(BaseCommand):
+    help = '清理没有被任何执行记录引用的执行结果数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=1,
+                            help='只清理N小时前写入的内容，避免删除正在写入的执行记录引用的内容（默认1小时）')
+        parser.add_argument('--dry-run', action='store_true', help='只统计待清理的数量，不删除')
+
+    def handle(self, *args, **options):
+        count = cleanup_orphans(grace=timedelta(hours=max(options['grace_hours'], 0)), dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'待清理的执行结果数据 {count} 条')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已清理执行结果数据 {count} 条'))
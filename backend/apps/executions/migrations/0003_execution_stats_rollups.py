@@ -0,0 +1,70 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('testcases', '0005_testcase_files_override'),
+        ('executions', '0002_add_parent_and_execution_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectHourlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='统计小时')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='执行次数')),
+                ('passed', models.PositiveIntegerField(default=0, verbose_name='通过次数')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='失败次数')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='跳过次数')),
+                ('duration_sum', models.FloatField(default=0, verbose_name='耗时合计(秒)')),
+                ('duration_count', models.PositiveIntegerField(default=0, verbose_name='耗时计数')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='projects.project', verbose_name='所属项目')),
+            ],
+            options={
+                'verbose_name': '项目小时统计',
+                'verbose_name_plural': '项目小时统计',
+                'ordering': ['-hour'],
+                'unique_together': {('project', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TestCaseHourlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='统计小时')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='执行次数')),
+                ('passed', models.PositiveIntegerField(default=0, verbose_name='通过次数')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='失败次数')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='跳过次数')),
+                ('duration_sum', models.FloatField(default=0, verbose_name='耗时合计(秒)')),
+                ('duration_count', models.PositiveIntegerField(default=0, verbose_name='耗时计数')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='testcase_hourly_stats', to='projects.project', verbose_name='所属项目')),
+                ('testcase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='testcases.testcase', verbose_name='测试用例')),
+            ],
+            options={
+                'verbose_name': '用例小时统计',
+                'verbose_name_plural': '用例小时统计',
+                'ordering': ['-hour'],
+                'unique_together': {('testcase', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TestCaseLatestStatus',
+            fields=[
+                ('testcase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_status', serialize=False, to='testcases.testcase', verbose_name='测试用例')),
+                ('status', models.CharField(choices=[('pending', '待执行'), ('running', '执行中'), ('passed', '通过'), ('failed', '失败'), ('skipped', '跳过')], max_length=20, verbose_name='执行状态')),
+                ('executed_at', models.DateTimeField(help_text='执行记录的创建时间', verbose_name='执行时间')),
+                ('execution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='executions.execution', verbose_name='执行记录')),
+            ],
+            options={
+                'verbose_name': '用例最新状态',
+                'verbose_name_plural': '用例最新状态',
+            },
+        ),
+    ]
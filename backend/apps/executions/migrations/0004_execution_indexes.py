@@ -0,0 +1,37 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executions', '0003_execution_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['parent', '-created_at'], name='exec_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['project', 'parent', '-created_at'], name='exec_project_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['-created_at'], name='exec_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['status', 'parent'], name='exec_status_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['testcase', '-created_at'], name='exec_testcase_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['testsuite', 'testcase', '-created_at'], name='exec_suite_case_created_idx'),
+        ),
+    ]
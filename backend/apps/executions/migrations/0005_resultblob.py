@@ -0,0 +1,26 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executions', '0004_execution_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultBlob',
+            fields=[
+                ('digest', models.CharField(help_text='压缩前内容的SHA-256', max_length=64, primary_key=True, serialize=False, verbose_name='内容摘要')),
+                ('data', models.BinaryField(verbose_name='压缩数据')),
+                ('size', models.PositiveIntegerField(verbose_name='原始大小(字节)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '执行结果数据',
+                'verbose_name_plural': '执行结果数据',
+            },
+        ),
+    ]
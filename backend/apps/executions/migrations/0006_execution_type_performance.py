@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executions', '0005_resultblob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='execution',
+            name='execution_type',
+            field=models.CharField(choices=[('normal', '普通执行'), ('parameterized', '参数化执行'), ('suite', '套件执行'), ('performance', '性能回归检测')], default='normal', max_length=20, verbose_name='执行类型'),
+        ),
+    ]
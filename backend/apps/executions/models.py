@@ -1,3 +1,4 @@
+import json
 from django.db import models
 from django.contrib.auth import get_user_model
 from apps.projects.models import Project
@@ -35,6 +36,7 @@ class Execution(models.Model):
             ('normal', '普通执行'),
             ('parameterized', '参数化执行'),
             ('suite', '套件执行'),
+            ('performance', '性能回归检测'),
         ],
         default='normal',
         verbose_name='执行类型'
@@ -45,9 +47,126 @@ class Execution(models.Model):
         verbose_name = '测试执行'
         verbose_name_plural = '测试执行'
         ordering = ['-created_at']
+        # 按高频查询的过滤/排序条件建立组合索引（见 tests.ExecutionQueryPlanTests）
+        indexes = [
+            # 执行记录列表（只显示父记录，按创建时间倒序）、子记录查询
+            models.Index(fields=['parent', '-created_at'], name='exec_parent_created_idx'),
+            # 按项目筛选的执行记录列表
+            models.Index(fields=['project', 'parent', '-created_at'], name='exec_project_parent_idx'),
+            # 仪表盘最近运行、按时间范围统计
+            models.Index(fields=['-created_at'], name='exec_created_idx'),
+            # 仪表盘运行中数量、按状态筛选
+            models.Index(fields=['status', 'parent'], name='exec_status_parent_idx'),
+            # 用例最新执行、用例执行历史、用例统计
+            models.Index(fields=['testcase', '-created_at'], name='exec_testcase_created_idx'),
+            # 套件执行记录（套件父记录 testcase 为空）按时间查找
+            models.Index(fields=['testsuite', 'testcase', '-created_at'], name='exec_suite_case_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    # 最近一次从数据库读取或保存时 result 的指纹（JSON 序列化的哈希，用于判断 result 是否修改过）
+    _result_fingerprint = None
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'result' in instance.__dict__:
+            instance._remember_result()
+        return instance
 
+    def _fingerprint_result(self):
+        return hash(json.dumps(self.result, ensure_ascii=False, default=str))
+
+    def _remember_result(self):
+        self._result_fingerprint = self._fingerprint_result()
+
+    def save(self, *args, **kwargs):
+        # 响应体等大字段单独压缩存储，result 中只保留摘要和引用（见 blobs.py）
+        # result 未修改（或本次只更新其他字段）时跳过拆分
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'result' in update_fields:
+            if self._result_fingerprint is None or self._fingerprint_result() != self._result_fingerprint:
+                from .blobs import pack_result
+                self.result = pack_result(self.result)
+        super().save(*args, **kwargs)
+        if 'result' in self.__dict__:
+            self._remember_result()
+
+
+
+
+
+class ProjectHourlyStat(models.Model):
+    """项目每小时执行统计（汇总表，只统计已结束的父记录，按创建时间所在整点分桶，UTC）"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='hourly_stats', verbose_name='所属项目')
+    hour = models.DateTimeField(verbose_name='统计小时')
+    total = models.PositiveIntegerField(default=0, verbose_name='执行次数')
+    passed = models.PositiveIntegerField(default=0, verbose_name='通过次数')
+    failed = models.PositiveIntegerField(default=0, verbose_name='失败次数')
+    skipped = models.PositiveIntegerField(default=0, verbose_name='跳过次数')
+    # 耗时只统计通过/失败且有耗时的执行，平均耗时 = duration_sum / duration_count
+    duration_sum = models.FloatField(default=0, verbose_name='耗时合计(秒)')
+    duration_count = models.PositiveIntegerField(default=0, verbose_name='耗时计数')
+
+    class Meta:
+        verbose_name = '项目小时统计'
+        verbose_name_plural = '项目小时统计'
+        unique_together = [['project', 'hour']]
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.project_id} - {self.hour}"
+
+
+class TestCaseHourlyStat(models.Model):
+    """用例每小时执行统计（汇总表，统计所有已结束的用例执行记录，按创建时间所在整点分桶，UTC）"""
+    testcase = models.ForeignKey(TestCase, on_delete=models.CASCADE, related_name='hourly_stats', verbose_name='测试用例')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='testcase_hourly_stats', verbose_name='所属项目')
+    hour = models.DateTimeField(verbose_name='统计小时')
+    total = models.PositiveIntegerField(default=0, verbose_name='执行次数')
+    passed = models.PositiveIntegerField(default=0, verbose_name='通过次数')
+    failed = models.PositiveIntegerField(default=0, verbose_name='失败次数')
+    skipped = models.PositiveIntegerField(default=0, verbose_name='跳过次数')
+    duration_sum = models.FloatField(default=0, verbose_name='耗时合计(秒)')
+    duration_count = models.PositiveIntegerField(default=0, verbose_name='耗时计数')
+
+    class Meta:
+        verbose_name = '用例小时统计'
+        verbose_name_plural = '用例小时统计'
+        unique_together = [['testcase', 'hour']]
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.testcase_id} - {self.hour}"
+
+
+class TestCaseLatestStatus(models.Model):
+    """用例最新执行状态（汇总表，每个用例一行，记录最近一次已结束的执行）"""
+    testcase = models.OneToOneField(TestCase, on_delete=models.CASCADE, primary_key=True, related_name='latest_status', verbose_name='测试用例')
+    execution = models.ForeignKey(Execution, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='执行记录')
+    status = models.CharField(max_length=20, choices=Execution.STATUS_CHOICES, verbose_name='执行状态')
+    executed_at = models.DateTimeField(verbose_name='执行时间', help_text='执行记录的创建时间')
+
+    class Meta:
+        verbose_name = '用例最新状态'
+        verbose_name_plural = '用例最新状态'
+
+    def __str__(self):
+        return f"{self.testcase_id} - {self.status}"
+
+
+class ResultBlob(models.Model):
+    """执行结果大字段存储（按内容SHA-256寻址，zlib压缩的JSON）"""
+    digest = models.CharField(max_length=64, primary_key=True, verbose_name='内容摘要', help_text='压缩前内容的SHA-256')
+    data = models.BinaryField(verbose_name='压缩数据')
+    size = models.PositiveIntegerField(verbose_name='原始大小(字节)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '执行结果数据'
+        verbose_name_plural = '执行结果数据'
+
+    def __str__(self):
+        return self.digest
@@ -0,0 +1,149 @@
+"""
+执行记录批量写入
+
+套件执行和参数化执行会产生大量子执行记录。子记录在用例执行完成后才以最终状态写入，
+并按数量或时间阈值批量 bulk_create，每条记录只需一次写入（原先为 create + save 两次）。
+之后没有新的子记录（如剩余用例耗时较长）时，由定时器在时间阈值到达时写入缓冲中的记录。
+每次写入批次时同步更新父记录中的执行进度，前端执行过程中仍可看到进度。
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from .models import Execution
+from .rollups import record_finished
+from .blobs import pack_executions
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionRecorder:
+    """子执行记录缓冲写入器（线程安全）"""
+
+    def __init__(self, parent: Execution, total: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        """
+        :param parent: 父执行记录
+        :param total: 预计的子记录总数（用于进度显示）
+        :param batch_size: 缓冲的记录数达到该值时写入
+        :param flush_interval: 距离上次写入超过该秒数时写入
+        """
+        self.parent = parent
+        self.total = total
+        self.batch_size = batch_size or getattr(settings, 'EXECUTION_RECORD_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            getattr(settings, 'EXECUTION_RECORD_FLUSH_INTERVAL', 2.0)
+        self.completed = 0
+        self.passed = 0
+        self.failed = 0
+        self._pending: List[Tuple[Execution, Optional[Dict[str, Any]]]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        # 按时间阈值写入的定时器（缓冲中有记录时启动）
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def new(self, **fields) -> Execution:
+        """创建（未保存的）子执行记录"""
+        fields.setdefault('parent', self.parent)
+        return Execution(**fields)
+
+    def record(self, execution: Execution, case_result: Optional[Dict[str, Any]] = None) -> None:
+        """
+        提交已完成的子执行记录
+        :param execution: 子执行记录（已设置最终状态和结果）
+        :param case_result: 写入后需要回填 execution_id 的结果字典（可选）
+        """
+        with self._lock:
+            self._pending.append((execution, case_result))
+            self.completed += 1
+            if execution.status == 'passed':
+                self.passed += 1
+            else:
+                self.failed += 1
+            elapsed = time.monotonic() - self._last_flush
+            if len(self._pending) >= self.batch_size or elapsed >= self.flush_interval:
+                self.flush()
+            elif self._timer is None and not self._closed:
+                self._timer = threading.Timer(self.flush_interval - elapsed, self._flush_on_timeout)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_timeout(self) -> None:
+        """定时器线程：到达时间阈值时写入缓冲中的记录"""
+        try:
+            with self._lock:
+                if self._timer is threading.current_thread():
+                    self._timer = None
+                if self._pending:
+                    self.flush()
+        except Exception as e:
+            logger.exception(f"定时写入执行记录 {self.parent.id} 的子记录失败: {e}")
+        finally:
+            # 关闭定时器线程使用的数据库连接
+            connection.close()
+
+    def flush(self) -> None:
+        """写入缓冲中的子执行记录并更新父记录进度"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if pending:
+                executions = [execution for execution, _ in pending]
+                # bulk_create 不经过 Execution.save，需先拆分存储大字段
+                pack_executions(executions)
+                after_id = None
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    after_id = Execution.objects.filter(parent=self.parent).aggregate(last=Max('id'))['last'] or 0
+                Execution.objects.bulk_create(executions, batch_size=self.batch_size)
+                self._assign_ids(executions, after_id)
+                record_finished(executions)
+                for execution, case_result in pending:
+                    if case_result is not None:
+                        case_result['execution_id'] = execution.id
+            self._save_progress()
+
+    def close(self) -> None:
+        """写入剩余的子执行记录并停止定时器"""
+        with self._lock:
+            self._closed = True
+            self.flush()
+
+    def _assign_ids(self, executions: List[Execution], after_id: Optional[int]) -> None:
+        """
+        回填主键：PostgreSQL 等数据库 bulk_create 后已设置主键；
+        MySQL 不返回自增主键：记录按列表顺序插入，自增主键递增，且父记录的子记录只由本写入器写入，
+        因此写入前最大子记录主键（after_id）之后的记录按主键顺序与本批次记录一一对应（与名称无关）
+        """
+        missing = [execution for execution in executions if execution.pk is None]
+        if not missing:
+            return
+        ids = list(Execution.objects
+                   .filter(parent=self.parent, id__gt=after_id or 0)
+                   .order_by('id')
+                   .values_list('id', flat=True)[:len(missing) + 1])
+        if len(ids) != len(missing):
+            logger.warning(f"执行记录 {self.parent.id} 新写入的子记录数与本批次不一致"
+                           f"（{len(ids)}/{len(missing)}），未回填ID")
+            return
+        for execution, pk in zip(missing, ids):
+            execution.pk = pk
+            execution._state.adding = False
+
+    def _save_progress(self) -> None:
+        """将执行进度写入父记录"""
+        result = dict(self.parent.result or {})
+        result['progress'] = {
+            'completed': self.completed,
+            'total': self.total,
+            'passed': self.passed,
+            'failed': self.failed
+        }
+        self.parent.result = result
+        Execution.objects.filter(pk=self.parent.pk).update(result=result)
@@ -0,0 +1,188 @@
+"""
+执行统计汇总表维护
+
+执行记录结束（通过/失败/跳过）时增量更新汇总表，仪表盘和用例统计直接读取汇总表，
+不再扫描 Execution 历史数据：
+- ProjectHourlyStat：项目每小时的父记录执行统计
+- TestCaseHourlyStat：用例每小时的执行统计（含套件/参数化子记录）
+- TestCaseLatestStatus：用例最近一次已结束执行的状态
+
+历史数据可通过 backfill_execution_stats 管理命令重建。
+"""
+import logging
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterable, Set, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncHour
+from apps.testcases.models import TestCase
+from .models import Execution, ProjectHourlyStat, TestCaseHourlyStat, TestCaseLatestStatus
+
+logger = logging.getLogger(__name__)
+
+# 计入统计的结束状态
+FINISHED_STATUSES = ('passed', 'failed', 'skipped')
+COUNTER_FIELDS = ('total', 'passed', 'failed', 'skipped', 'duration_sum', 'duration_count')
+
+
+def to_hour(value):
+    """将时间截断到整点（UTC），与 TruncHour(tzinfo=UTC) 分桶一致"""
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _empty_counters() -> Dict[str, float]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def _add(counters: Dict[str, float], status: str, duration, count_duration: bool) -> None:
+    counters['total'] += 1
+    counters[status] += 1
+    if count_duration and duration is not None:
+        counters['duration_sum'] += duration
+        counters['duration_count'] += 1
+
+
+def _apply(model, lookup: Dict, counters: Dict[str, float], defaults: Dict = None, sign: int = 1) -> None:
+    """原子地累加计数（不存在时创建，并发创建冲突时重试累加）"""
+    changes = {field: F(field) + sign * value for field, value in counters.items() if value}
+    if not changes:
+        return
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    if sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **counters)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_finished(executions: Iterable[Execution]) -> None:
+    """
+    执行记录结束后更新汇总表（同一批记录按分桶合并后写入）
+    :param executions: 已结束的执行记录（需已写入数据库）
+    """
+    project_buckets: Dict[Tuple, Dict[str, float]] = defaultdict(_empty_counters)
+    testcase_buckets: Dict[Tuple, Dict[str, float]] = defaultdict(_empty_counters)
+    latest: Dict[int, Execution] = {}
+
+    for execution in executions:
+        if execution.status not in FINISHED_STATUSES or execution.pk is None or not execution.created_at:
+            continue
+        hour = to_hour(execution.created_at)
+        if execution.parent_id is None:
+            _add(project_buckets[(execution.project_id, hour)], execution.status, execution.duration,
+                 execution.status in ('passed', 'failed'))
+        if execution.testcase_id:
+            _add(testcase_buckets[(execution.testcase_id, execution.project_id, hour)],
+                 execution.status, execution.duration, True)
+            current = latest.get(execution.testcase_id)
+            if current is None or (execution.created_at, execution.pk) > (current.created_at, current.pk):
+                latest[execution.testcase_id] = execution
+
+    try:
+        for (project_id, hour), counters in project_buckets.items():
+            _apply(ProjectHourlyStat, {'project_id': project_id, 'hour': hour}, counters)
+        for (testcase_id, project_id, hour), counters in testcase_buckets.items():
+            _apply(TestCaseHourlyStat, {'testcase_id': testcase_id, 'hour': hour}, counters,
+                   defaults={'project_id': project_id})
+        for testcase_id, execution in latest.items():
+            _update_latest_status(testcase_id, execution)
+    except Exception as e:
+        # 汇总表更新失败不影响执行结果，可通过 backfill_execution_stats 重建
+        logger.warning(f"更新执行统计汇总表失败: {e}")
+
+
+def _update_latest_status(testcase_id: int, execution: Execution) -> None:
+    """更新用例最新状态（只有更新的执行记录才会覆盖）"""
+    values = {'execution_id': execution.pk, 'status': execution.status, 'executed_at': execution.created_at}
+    updated = TestCaseLatestStatus.objects.filter(
+        testcase_id=testcase_id, executed_at__lte=execution.created_at
+    ).update(**values)
+    if updated or TestCaseLatestStatus.objects.filter(testcase_id=testcase_id).exists():
+        return
+    try:
+        with transaction.atomic():
+            TestCaseLatestStatus.objects.create(testcase_id=testcase_id, **values)
+    except IntegrityError:
+        TestCaseLatestStatus.objects.filter(
+            testcase_id=testcase_id, executed_at__lte=execution.created_at
+        ).update(**values)
+
+
+def _aggregate(queryset, group_fields, count_duration_filter: Q):
+    """按整点分桶聚合执行记录"""
+    return queryset.filter(status__in=FINISHED_STATUSES).annotate(
+        hour=TruncHour('created_at', tzinfo=dt_timezone.utc)
+    ).values(*group_fields, 'hour').annotate(
+        total=Count('id'),
+        passed=Count('id', filter=Q(status='passed')),
+        failed=Count('id', filter=Q(status='failed')),
+        skipped=Count('id', filter=Q(status='skipped')),
+        duration_sum=Sum('duration', filter=count_duration_filter),
+        duration_count=Count('duration', filter=count_duration_filter),
+    ).order_by()
+
+
+def aggregate_project_hours(queryset):
+    """聚合父记录的项目小时统计（性能回归检测记录不计入，见 jobs._notify_performance_regression）"""
+    return _aggregate(queryset.filter(parent__isnull=True).exclude(execution_type='performance'), ('project_id',),
+                      Q(status__in=['passed', 'failed'], duration__isnull=False))
+
+
+def aggregate_testcase_hours(queryset):
+    """聚合用例小时统计"""
+    return _aggregate(queryset.filter(testcase__isnull=False), ('testcase_id', 'project_id'),
+                      Q(duration__isnull=False))
+
+
+def _counters(row) -> Dict[str, float]:
+    return {field: row[field] or 0 for field in COUNTER_FIELDS}
+
+
+def remove_executions(queryset) -> Set[int]:
+    """
+    删除执行记录前从汇总表中扣除（包含级联删除的子记录），删除后调用 refresh_latest_status
+    :param queryset: 将要删除的执行记录
+    :return: 受影响的用例ID集合
+    """
+    ids = list(queryset.values_list('id', flat=True))
+    affected = Execution.objects.filter(Q(id__in=ids) | Q(parent_id__in=ids))
+    testcase_ids = set()
+    try:
+        for row in aggregate_project_hours(affected):
+            _apply(ProjectHourlyStat, {'project_id': row['project_id'], 'hour': row['hour']},
+                   _counters(row), sign=-1)
+        for row in aggregate_testcase_hours(affected):
+            testcase_ids.add(row['testcase_id'])
+            _apply(TestCaseHourlyStat, {'testcase_id': row['testcase_id'], 'hour': row['hour']},
+                   _counters(row), sign=-1)
+    except Exception as e:
+        logger.warning(f"扣除执行统计汇总表失败: {e}")
+    return testcase_ids
+
+
+def refresh_latest_status(testcase_ids) -> None:
+    """按现有执行记录重新计算指定用例的最新状态"""
+    testcase_ids = set(testcase_ids or ())
+    if not testcase_ids:
+        return
+    # 与 record_finished 相同的“最新”定义：按 (created_at, id) 最大
+    latest = Execution.objects.filter(
+        testcase_id=OuterRef('pk'), status__in=FINISHED_STATUSES
+    ).order_by('-created_at', '-id').values('id')[:1]
+    latest_ids = TestCase.objects.filter(id__in=testcase_ids).annotate(
+        latest_id=Subquery(latest)
+    ).filter(latest_id__isnull=False).values_list('latest_id', flat=True)
+    rows = {
+        execution.testcase_id: execution
+        for execution in Execution.objects.filter(id__in=list(latest_ids)).only('id', 'testcase_id', 'status', 'created_at')
+    }
+    TestCaseLatestStatus.objects.filter(testcase_id__in=testcase_ids - set(rows)).delete()
+    for testcase_id, execution in rows.items():
+        TestCaseLatestStatus.objects.update_or_create(
+            testcase_id=testcase_id,
+            defaults={'execution_id': execution.pk, 'status': execution.status, 'executed_at': execution.created_at}
+        )
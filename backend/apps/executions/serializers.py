@@ -1,9 +1,7 @@
 from rest_framework import serializers
-from datetime import timedelta
-from django.utils import timezone
 from .models import Execution
 from apps.projects.serializers import ProjectSerializer
-from apps.testcases.serializers import TestCaseSerializer
+from apps.testcases.serializers import TestCaseSerializer, get_latest_executions
 from apps.testsuites.serializers import TestSuiteSerializer
 from apps.users.serializers import UserSerializer
 
@@ -16,7 +14,7 @@ class ExecutionSerializer(serializers.ModelSerializer):
     executor = UserSerializer(read_only=True)
     children = serializers.SerializerMethodField()  # 使用parent字段获取子记录
     execution_type = serializers.CharField(read_only=True)
-    parent_id = serializers.IntegerField(source='parent.id', read_only=True, allow_null=True)
+    parent_id = serializers.IntegerField(read_only=True, allow_null=True)
     children_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -28,46 +26,33 @@ class ExecutionSerializer(serializers.ModelSerializer):
 
     def get_children(self, obj):
         """获取子执行记录（通过parent字段），按套件中的用例顺序排列"""
-        from apps.testsuites.models import TestSuiteTestCase
-        
-        # 使用prefetch_related预加载的children，或查询children
-        if hasattr(obj, 'children'):
-            # 如果已经预加载
-            children = obj.children.all()
-        else:
-            # 如果没有预加载，直接查询
-            children = Execution.objects.filter(parent=obj)
+        # 视图中已通过 Prefetch 预加载并按创建时间排序，未预加载时单独查询
+        children = list(obj.children.all())
+        if not children:
+            return []
         
         # 如果是套件执行，按照用例在套件中的顺序排列
         if obj.testsuite and not obj.testcase:
-            # 获取当前套件的用例顺序映射
-            suite_testcase_order = {}
-            suite_relations = TestSuiteTestCase.objects.filter(testsuite=obj.testsuite)
-            for relation in suite_relations:
-                suite_testcase_order[relation.testcase_id] = relation.order
-            
-            # 转换为列表并排序
-            children_list = list(children.select_related('testcase'))
-            children_list.sort(key=lambda x: (
+            # 用例顺序映射（使用预加载的套件关联关系）
+            suite_testcase_order = {
+                relation.testcase_id: relation.order
+                for relation in obj.testsuite.testsuitetestcase_set.all()
+            }
+            children.sort(key=lambda x: (
                 suite_testcase_order.get(x.testcase_id, 9999),  # 如果找不到order，放到最后
                 x.id  # 相同order时按id排序
             ))
-            
-            # 使用简化版序列化器（避免递归）
-            return SimpleExecutionSerializer(children_list, many=True).data
-        else:
-            # 其他情况按创建时间排序
-            children = children.order_by('created_at')
-            if children.exists():
-                return SimpleExecutionSerializer(children, many=True).data
         
-        return []
+        # 使用简化版序列化器（避免递归）
+        return SimpleExecutionSerializer(children, many=True, context=self.context).data
     
     def get_children_count(self, obj):
         """获取子记录数量"""
-        if hasattr(obj, 'children'):
-            return obj.children.count()
-        return Execution.objects.filter(parent=obj).count()
+        # 优先使用查询时注解的数量
+        children_total = getattr(obj, 'children_total', None)
+        if children_total is not None:
+            return children_total
+        return obj.children.count()
 
 
 class SimpleExecutionSerializer(serializers.ModelSerializer):
@@ -80,68 +65,15 @@ class SimpleExecutionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-
-
-    def get_child_executions(self, obj):
-        """获取套件执行的所有子用例执行记录"""
-        # 如果是套件执行记录（有testsuite但没有testcase），返回所有子用例执行记录
-        if obj.testsuite and not obj.testcase:
-            # 优先从result中的case_results获取execution_id（最准确）
-            child_ids = []
-            if obj.result and isinstance(obj.result, dict):
-                case_results = obj.result.get('case_results', [])
-                child_ids = [case.get('execution_id') for case in case_results if case.get('execution_id')]
-            
-            if child_ids:
-                # 如果result中有execution_id，直接使用
-                child_executions = Execution.objects.filter(id__in=child_ids).order_by('created_at')
-            else:
-                # 否则，根据套件执行的时间范围来查找子用例（兼容旧数据）
-                start_window = obj.start_time if obj.start_time else obj.created_at
-                if obj.end_time:
-                    end_window = obj.end_time + timedelta(minutes=1)
-                else:
-                    end_window = timezone.now()
-                
-                child_executions = Execution.objects.filter(
-                    testsuite=obj.testsuite,
-                    testcase__isnull=False,
-                    created_at__gte=start_window - timedelta(minutes=1),
-                    created_at__lte=end_window
-                ).order_by('created_at')
-            
-            return ExecutionSerializer(child_executions, many=True).data
-        return []
-    
-    def get_parent_suite_execution_id(self, obj):
-        """获取子用例对应的父套件执行ID"""
-        # 如果是子用例（有testsuite和testcase），查找对应的套件执行记录
-        if obj.testsuite and obj.testcase:
-            # 查找同一套件、同一时间段、没有testcase的执行记录
-            # 查找在子用例创建时间前后5分钟内的套件执行记录
-            start_window = obj.start_time if obj.start_time else obj.created_at
-            
-            # 查找套件执行记录（有testsuite但没有testcase）
-            suite_executions = Execution.objects.filter(
-                testsuite=obj.testsuite,
-                testcase__isnull=True,
-                created_at__gte=start_window - timedelta(minutes=5),
-                created_at__lte=start_window + timedelta(minutes=5)
-            ).order_by('-created_at')
-            
-            if suite_executions.exists():
-                # 检查该套件执行记录的result中是否包含当前子用例
-                for suite_exec in suite_executions:
-                    if suite_exec.result and isinstance(suite_exec.result, dict):
-                        case_results = suite_exec.result.get('case_results', [])
-                        child_ids = [case.get('execution_id') for case in case_results]
-                        if obj.id in child_ids:
-                            return suite_exec.id
-                
-                # 如果没有在result中找到，返回时间最接近的套件执行记录
-                return suite_executions.first().id
-            
-        return None
-
-
-
+def build_serializer_context(executions):
+    """
+    为一页执行记录批量准备序列化器上下文（父记录、子记录和套件中所有用例的最新执行记录）
+    需配合 ExecutionViewSet.get_queryset 的预加载使用，查询次数与记录数无关
+    """
+    testcase_ids = set()
+    for execution in executions:
+        testcase_ids.add(execution.testcase_id)
+        testcase_ids.update(child.testcase_id for child in execution.children.all())
+        if execution.testsuite:
+            testcase_ids.update(relation.testcase_id for relation in execution.testsuite.testsuitetestcase_set.all())
+    return {'latest_executions': get_latest_executions(testcase_ids)}
@@ -0,0 +1,23 @@
+"""
+执行相关的 Celery 任务（由 BenchLink/celery.py 的 autodiscover_tasks 自动注册）
+"""
+from celery import shared_task
+from . import jobs
+
+
+@shared_task(name='executions.run_testcase_job')
+def run_testcase_job(execution_id, parameterized_data=None):
+    """执行测试用例"""
+    jobs.run_testcase_job(execution_id, parameterized_data)
+
+
+@shared_task(name='executions.run_testsuite_job')
+def run_testsuite_job(execution_id, max_concurrency=None):
+    """执行测试套件"""
+    jobs.run_testsuite_job(execution_id, max_concurrency)
+
+
+@shared_task(name='performance.run_performance_job')
+def run_performance_job(performance_test_id):
+    """执行性能测试"""
+    jobs.run_performance_job(performance_test_id)
@@ -0,0 +1,431 @@
+import json
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.utils import timezone
+from apps.apis.models import API
+from apps.projects.models import Project
+from apps.testcases.models import TestCase as CaseModel
+from apps.testsuites.models import TestSuite, TestSuiteTestCase
+from .blobs import get_blobs
+from .jobs import _notify_performance_regression, enqueue
+from .models import Execution, ProjectHourlyStat, ResultBlob, TestCaseLatestStatus
+from .recorder import ExecutionRecorder
+from .rollups import record_finished, refresh_latest_status
+
+User = get_user_model()
+
+EXECUTION_TABLE = Execution._meta.db_table
+
+
+def find_full_scans(plan: str) -> list:
+    """
+    从执行计划中找出对执行记录表的全表扫描
+    支持 MySQL（EXPLAIN FORMAT=JSON）、PostgreSQL 和 SQLite
+    """
+    vendor = connection.vendor
+    scans = []
+    if vendor == 'mysql':
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get('table_name') == EXECUTION_TABLE and node.get('access_type') == 'ALL':
+                    scans.append(node)
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+        walk(json.loads(plan))
+    elif vendor == 'postgresql':
+        scans = [line for line in plan.splitlines() if f'Seq Scan on {EXECUTION_TABLE}' in line]
+    else:
+        # SQLite：SCAN 且未使用索引即为全表扫描
+        scans = [line for line in plan.splitlines()
+                 if f'SCAN {EXECUTION_TABLE}' in line and 'INDEX' not in line]
+    return scans
+
+
+class ExecutionQueryPlanTests(TestCase):
+    """执行记录高频查询的执行计划回归测试：数据量增长时不能退化为全表扫描"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='plan-tester', password='plan-tester')
+        cls.project = Project.objects.create(name='plan', owner=user)
+        api = API.objects.create(name='plan', url='/plan', project=cls.project)
+        cls.testsuite = TestSuite.objects.create(name='plan', project=cls.project)
+        cls.testcases = [
+            CaseModel.objects.create(name=f'plan-{i}', project=cls.project, api=api) for i in range(10)
+        ]
+
+        # 生成足够多的父子记录，让优化器在有可用索引时选择索引
+        Execution.objects.bulk_create([
+            Execution(name=f'suite-{i}', project=cls.project, testsuite=cls.testsuite,
+                      status='passed' if i % 3 else 'failed', execution_type='suite')
+            for i in range(200)
+        ])
+        parent_ids = list(Execution.objects.filter(testcase__isnull=True).values_list('id', flat=True))
+        cls.parent_ids = parent_ids[:20]
+        Execution.objects.bulk_create([
+            Execution(name=f'case-{i}', project=cls.project, testsuite=cls.testsuite,
+                      testcase=cls.testcases[i % 10], parent_id=parent_ids[i % len(parent_ids)],
+                      status='passed' if i % 4 else 'failed', execution_type='suite')
+            for i in range(1000)
+        ])
+
+    def setUp(self):
+        vendor = connection.vendor
+        with connection.cursor() as cursor:
+            if vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {EXECUTION_TABLE}')
+                # 让优化器在小数据量下也按索引的代价估算（与生产数据量下的选择一致）
+                cursor.execute('SET SESSION max_seeks_for_key = 1')
+            elif vendor == 'postgresql':
+                cursor.execute(f'ANALYZE {EXECUTION_TABLE}')
+                # 存在可用索引时禁止顺序扫描；没有可用索引时计划中仍会出现 Seq Scan
+                cursor.execute('SET enable_seqscan = off')
+            elif vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset):
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+        else:
+            plan = queryset.explain()
+        scans = find_full_scans(plan)
+        self.assertFalse(scans, f'查询对 {EXECUTION_TABLE} 进行了全表扫描:\n{queryset.query}\n{plan}')
+
+    def test_execution_list(self):
+        """执行记录列表：只显示父记录，按创建时间倒序分页"""
+        self.assertNoFullScan(Execution.objects.filter(parent__isnull=True).order_by('-created_at')[:20])
+
+    def test_execution_list_by_project(self):
+        """按项目筛选的执行记录列表"""
+        self.assertNoFullScan(
+            Execution.objects.filter(project=self.project, parent__isnull=True).order_by('-created_at')[:20]
+        )
+
+    def test_children_of_page(self):
+        """执行记录列表的子记录（一页父记录的所有子记录）"""
+        self.assertNoFullScan(Execution.objects.filter(parent_id__in=self.parent_ids))
+
+    def test_dashboard_running_count(self):
+        """仪表盘运行中的执行数量"""
+        self.assertNoFullScan(Execution.objects.filter(status='running', parent__isnull=True))
+
+    def test_dashboard_recent_runs(self):
+        """仪表盘最近运行列表"""
+        since = timezone.now() - timedelta(hours=1)
+        self.assertNoFullScan(Execution.objects.filter(created_at__gte=since).order_by('-created_at')[:10])
+
+    def test_testcase_latest_execution(self):
+        """用例最新执行记录"""
+        self.assertNoFullScan(
+            Execution.objects.filter(testcase=self.testcases[0]).order_by('-created_at')[:1]
+        )
+
+    def test_suite_parent_executions(self):
+        """套件父记录按时间范围查找"""
+        since = timezone.now() - timedelta(minutes=5)
+        self.assertNoFullScan(
+            Execution.objects.filter(testsuite=self.testsuite, testcase__isnull=True, created_at__gte=since)
+        )
+
+
+class ExecutionListQueryCountTests(TestCase):
+    """执行记录列表的查询次数不随父记录和子记录数量增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='list-tester', password='list-tester')
+        cls.project = Project.objects.create(name='list', owner=cls.user)
+        cls.project.members.add(cls.user)
+        cls.api = API.objects.create(name='list', url='/list', project=cls.project)
+        cls.testsuite = TestSuite.objects.create(name='list', project=cls.project)
+        cls.testcases = [
+            CaseModel.objects.create(name=f'list-{i}', project=cls.project, api=cls.api) for i in range(5)
+        ]
+        for order, testcase in enumerate(cls.testcases):
+            TestSuiteTestCase.objects.create(testsuite=cls.testsuite, testcase=testcase, order=order)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_suite_runs(self, count, children):
+        for i in range(count):
+            parent = Execution.objects.create(name=f'suite-{i}', project=self.project, testsuite=self.testsuite,
+                                              executor=self.user, status='passed', execution_type='suite')
+            Execution.objects.bulk_create([
+                Execution(name=f'case-{j}', project=self.project, testsuite=self.testsuite,
+                          testcase=self.testcases[j % len(self.testcases)], parent=parent,
+                          status='passed', execution_type='suite')
+                for j in range(children)
+            ])
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('execution-list'), {'project_id': self.project.id})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_fixed(self):
+        self.create_suite_runs(1, 1)
+        baseline = self.count_list_queries()
+        self.create_suite_runs(10, 8)
+        self.assertEqual(self.count_list_queries(), baseline)
+
+    def test_children_ordered_by_suite_order(self):
+        parent = Execution.objects.create(name='suite', project=self.project, testsuite=self.testsuite,
+                                          status='passed', execution_type='suite')
+        for testcase in reversed(self.testcases):
+            Execution.objects.create(name=testcase.name, project=self.project, testsuite=self.testsuite,
+                                     testcase=testcase, parent=parent, status='passed', execution_type='suite')
+        response = self.client.get(reverse('execution-list'), {'project_id': self.project.id})
+        row = response.data['results'][0]
+        self.assertEqual(row['children_count'], len(self.testcases))
+        self.assertEqual([child['testcase']['id'] for child in row['children']],
+                         [testcase.id for testcase in self.testcases])
+
+    def test_latest_status_from_rollup(self):
+        """套件用例的最新状态读取用例最新状态汇总表（最近一次已结束的执行）"""
+        parent = Execution.objects.create(name='suite', project=self.project, testsuite=self.testsuite,
+                                          status='passed', execution_type='suite')
+        finished = Execution.objects.create(name='case', project=self.project, testsuite=self.testsuite,
+                                            testcase=self.testcases[0], parent=parent, status='failed',
+                                            duration=0.5, execution_type='suite')
+        record_finished([finished])
+        # 执行中的记录不计入最新状态
+        Execution.objects.create(name='case', project=self.project, testcase=self.testcases[0], status='running')
+        response = self.client.get(reverse('execution-list'), {'project_id': self.project.id, 'type': 'suite'})
+        row = response.data['results'][0]
+        self.assertEqual(row['children'][0]['testcase']['status'], '失败')
+        self.assertEqual(row['children'][0]['testcase']['duration'], '500ms')
+
+
+class ResultBlobTests(TestCase):
+    """响应体等大字段单独存储：详情接口还原父记录和子记录，result 未修改时保存不再拆分"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='blob-tester', password='blob-tester')
+        cls.project = Project.objects.create(name='blob', owner=cls.user)
+        cls.project.members.add(cls.user)
+        cls.api = API.objects.create(name='blob', url='/blob', project=cls.project)
+        cls.testcase = CaseModel.objects.create(name='blob', project=cls.project, api=cls.api)
+        cls.testsuite = TestSuite.objects.create(name='blob', project=cls.project)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_hydrates_children(self):
+        body = 'x' * 4096
+        parent = Execution.objects.create(name='suite', project=self.project, testsuite=self.testsuite,
+                                          status='passed', execution_type='suite')
+        child = Execution.objects.create(name='case', project=self.project, testsuite=self.testsuite,
+                                         testcase=self.testcase, parent=parent, status='passed',
+                                         execution_type='suite', result={'status_code': 200, 'body': body})
+        self.assertIn('payload_ref', Execution.objects.get(pk=child.pk).result)
+        response = self.client.get(reverse('execution-detail', args=[parent.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['children'][0]['result']['body'], body)
+
+    def test_save_skips_pack_when_result_unchanged(self):
+        execution = Execution.objects.create(name='case', project=self.project, testcase=self.testcase,
+                                             status='passed', result={'status_code': 200, 'body': 'x' * 4096})
+        execution = Execution.objects.get(pk=execution.pk)
+        with mock.patch('apps.executions.blobs.pack_result') as pack_result:
+            execution.status = 'failed'
+            execution.save()
+            execution.save(update_fields=['status'])
+        pack_result.assert_not_called()
+
+        execution.result['status_code'] = 500
+        execution.save()
+        self.assertEqual(Execution.objects.get(pk=execution.pk).result['status_code'], 500)
+
+    def create_with_body(self, body, **kwargs):
+        return Execution.objects.create(name='case', project=self.project, testcase=self.testcase, status='passed',
+                                        result={'status_code': 200, 'body': body}, **kwargs)
+
+    def assert_delete_releases_blobs(self):
+        body = 'y' * 4096
+        parent = Execution.objects.create(name='suite', project=self.project, testsuite=self.testsuite,
+                                          status='passed', execution_type='suite')
+        child = self.create_with_body(body, parent=parent)
+        shared = self.create_with_body(body)
+        digest = Execution.objects.get(pk=child.pk).result['payload_ref']['digest']
+        self.assertIn(digest, get_blobs([digest]))
+
+        # 级联删除的子记录引用的内容仍被其他执行记录共享，不删除
+        response = self.client.delete(reverse('execution-detail', args=[parent.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertIn(digest, get_blobs([digest]))
+
+        response = self.client.post(reverse('execution-batch-delete'), {'ids': [shared.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_blobs([digest]), {})
+
+    def test_delete_releases_unreferenced_blobs(self):
+        self.assert_delete_releases_blobs()
+
+    def test_delete_releases_unreferenced_blob_files(self):
+        with tempfile.TemporaryDirectory() as blob_dir, \
+                override_settings(RESULT_BLOB_BACKEND='filesystem', RESULT_BLOB_DIR=blob_dir):
+            self.assert_delete_releases_blobs()
+
+    def test_cleanup_command_removes_old_orphans(self):
+        kept = self.create_with_body('k' * 4096)
+        kept_digest = Execution.objects.get(pk=kept.pk).result['payload_ref']['digest']
+        ResultBlob.objects.create(digest='a' * 64, data=b'', size=0)
+        ResultBlob.objects.create(digest='b' * 64, data=b'', size=0)
+        ResultBlob.objects.exclude(digest='b' * 64).update(created_at=timezone.now() - timedelta(hours=2))
+
+        call_command('cleanup_result_blobs', '--dry-run', stdout=StringIO())
+        self.assertEqual(ResultBlob.objects.count(), 3)
+        call_command('cleanup_result_blobs', stdout=StringIO())
+        # 被引用的内容和宽限期内写入的内容保留
+        self.assertEqual(set(ResultBlob.objects.values_list('digest', flat=True)), {kept_digest, 'b' * 64})
+
+
+class PerformanceRegressionNotificationTests(TestCase):
+    """性能回归检测记录：不作为套件执行，不计入执行统计汇总表"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='perf-tester', password='perf-tester')
+        cls.project = Project.objects.create(name='perf', owner=cls.user)
+        cls.project.members.add(cls.user)
+        cls.testsuite = TestSuite.objects.create(name='perf', project=cls.project)
+
+    def test_regression_execution(self):
+        performance_test = mock.Mock(id=1, project_id=self.project.id, testsuite_id=self.testsuite.id)
+        performance_test.name = 'perf'
+        now = timezone.now()
+        run = mock.Mock(id=2, start_time=now, end_time=now, duration=60)
+        regression = {'verdict': 'failed', 'regressions': ['throughput'],
+                      'metrics': {'throughput': {}, 'p95_response_time': {}, 'error_rate': {}}}
+        with mock.patch('apps.notifications.service.send_execution_notification') as send:
+            _notify_performance_regression(performance_test, run, regression)
+
+        execution = Execution.objects.get()
+        send.assert_called_once_with(execution)
+        self.assertEqual(execution.execution_type, 'performance')
+        self.assertEqual(execution.status, 'failed')
+        self.assertIsNone(execution.testsuite_id)
+        self.assertEqual(execution.result['failed'], 1)
+        self.assertFalse(ProjectHourlyStat.objects.exists())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('execution-list'), {'project_id': self.project.id, 'type': 'suite'})
+        self.assertEqual(response.data['count'], 0)
+        response = client.get(reverse('execution-list'), {'project_id': self.project.id, 'type': 'performance'})
+        self.assertEqual(response.data['count'], 1)
+
+
+class LatestStatusTests(TestCase):
+    """用例最新状态：增量更新和重新计算都按 (created_at, id) 取最新的已结束执行"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='latest-tester', password='latest-tester')
+        cls.project = Project.objects.create(name='latest', owner=cls.user)
+        cls.api = API.objects.create(name='latest', url='/latest', project=cls.project)
+        cls.testcase = CaseModel.objects.create(name='latest', project=cls.project, api=cls.api)
+
+    def test_refresh_orders_by_created_at(self):
+        newer = Execution.objects.create(name='newer', project=self.project, testcase=self.testcase, status='passed')
+        # id 更大但创建时间更早（如补录的历史记录）
+        older = Execution.objects.create(name='older', project=self.project, testcase=self.testcase, status='failed')
+        Execution.objects.filter(pk=older.pk).update(created_at=newer.created_at - timedelta(hours=1))
+        older.refresh_from_db()
+
+        record_finished([newer, older])
+        self.assertEqual(TestCaseLatestStatus.objects.get(testcase=self.testcase).execution_id, newer.pk)
+        TestCaseLatestStatus.objects.all().delete()
+        refresh_latest_status([self.testcase.id])
+        self.assertEqual(TestCaseLatestStatus.objects.get(testcase=self.testcase).execution_id, newer.pk)
+
+        Execution.objects.filter(testcase=self.testcase).delete()
+        refresh_latest_status([self.testcase.id])
+        self.assertFalse(TestCaseLatestStatus.objects.exists())
+
+
+class EnqueueTests(TestCase):
+    """后台任务在事务提交后才提交，任务能读到刚创建的执行记录"""
+
+    @override_settings(EXECUTION_QUEUE_BACKEND='celery')
+    def test_celery_submit_waits_for_commit(self):
+        with mock.patch('apps.executions.tasks.run_testcase_job.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                job_id = enqueue('run_testcase_job', 1, None)
+                apply_async.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        apply_async.assert_called_once_with(args=(1, None), task_id=job_id, retry=False)
+
+    @override_settings(EXECUTION_QUEUE_BACKEND='celery')
+    def test_broker_failure_falls_back_to_local_queue(self):
+        with mock.patch('apps.executions.tasks.run_testcase_job.apply_async', side_effect=OSError('down')), \
+                mock.patch('apps.executions.jobs._get_local_pool') as get_pool:
+            with self.captureOnCommitCallbacks(execute=True):
+                job_id = enqueue('run_testcase_job', 1, None)
+        get_pool.return_value.submit.assert_called_once()
+        self.assertEqual(get_pool.return_value.submit.call_args.args[1], job_id)
+
+
+class ExecutionRecorderTests(TransactionTestCase):
+    """子执行记录批量写入：主键回填与按时间阈值写入"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='recorder-tester', password='recorder-tester')
+        self.project = Project.objects.create(name='recorder', owner=user)
+        api = API.objects.create(name='recorder', url='/recorder', project=self.project)
+        self.testcase = CaseModel.objects.create(name='recorder', project=self.project, api=api)
+        self.parent = Execution.objects.create(name='parent', project=self.project, status='running',
+                                               execution_type='parameterized')
+
+    def record_all(self, recorder, count):
+        items = []
+        for index in range(count):
+            # 同名记录（参数化执行的名称可能相同）
+            execution = recorder.new(name='same', project=self.project, testcase=self.testcase,
+                                     status='passed' if index % 2 else 'failed', result={'index': index},
+                                     execution_type='parameterized')
+            item = {'index': index}
+            recorder.record(execution, item)
+            items.append(item)
+        return items
+
+    def test_ids_backfilled_without_returning_rows(self):
+        """数据库不返回自增主键（MySQL）时按写入顺序回填，同名记录不会错位"""
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            recorder = ExecutionRecorder(self.parent, total=7, batch_size=3, flush_interval=60)
+            items = self.record_all(recorder, 7)
+            recorder.close()
+        for item in items:
+            self.assertEqual(Execution.objects.get(pk=item['execution_id']).result['index'], item['index'])
+
+    def test_pending_records_flushed_on_timeout(self):
+        recorder = ExecutionRecorder(self.parent, total=2, batch_size=100, flush_interval=0.2)
+        self.addCleanup(recorder.close)
+        items = self.record_all(recorder, 2)
+        self.assertFalse(Execution.objects.filter(parent=self.parent).exists())
+        deadline = time.monotonic() + 5
+        while not all(item.get('execution_id') for item in items) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # 没有新的子记录时由定时器写入
+        self.assertTrue(all(item.get('execution_id') for item in items))
+        self.assertEqual(Execution.objects.filter(parent=self.parent).count(), 2)
+        self.assertEqual(Execution.objects.get(pk=self.parent.pk).result['progress']['completed'], 2)
@@ -5,22 +5,29 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
 from django.utils import timezone
-from django.db.models import Q, Count, Avg, Max, Min, Prefetch
-from django.db.models.functions import TruncHour, TruncDay
-from datetime import datetime, timedelta
-from collections import defaultdict
-from .models import Execution
-from .serializers import ExecutionSerializer
-from apps.testsuites.models import TestSuite
-from apps.testcases.models import TestCase
+from django.db.models import Count, Sum, Prefetch, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from datetime import timedelta
+from .models import Execution, ProjectHourlyStat, TestCaseHourlyStat
+from .rollups import remove_executions, refresh_latest_status
+from .blobs import hydrate_results, referenced_digests, release_blobs
+from .serializers import ExecutionSerializer, build_serializer_context
+from apps.testsuites.models import TestSuite, TestSuiteTestCase
 from .report_template import HTML_REPORT_TEMPLATE, generate_testcase_html
 
 
+# 嵌套用例序列化（项目、接口、环境）所需的关联
+TESTCASE_RELATED = ('testcase__project__owner', 'testcase__api__project__owner', 'testcase__environment__project__owner')
+TESTCASE_MEMBERS = ('testcase__project__members', 'testcase__api__project__members', 'testcase__environment__project__members')
+
+
 class ExecutionViewSet(viewsets.ModelViewSet):
     """测试执行视图集"""
     queryset = Execution.objects.all()
     serializer_class = ExecutionSerializer
     permission_classes = [IsAuthenticated]
+    # 序列化器额外上下文（list/retrieve 中按当前页批量准备）
+    _extra_context = {}
 
     def get_permissions(self):
         """导出报告不需要认证"""
@@ -30,7 +37,7 @@ class ExecutionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         project_id = self.request.query_params.get('project_id')
-        type_filter = self.request.query_params.get('type')  # suite/testcase/parameterized
+        type_filter = self.request.query_params.get('type')  # suite/testcase/parameterized/performance
         status_filter = self.request.query_params.get('status')
         search = self.request.query_params.get('search')
         
@@ -51,6 +58,9 @@ class ExecutionViewSet(viewsets.ModelViewSet):
             elif type_filter == 'parameterized':
                 # 参数化执行：execution_type='parameterized'
                 queryset = queryset.filter(execution_type='parameterized')
+            elif type_filter == 'performance':
+                # 性能回归检测：execution_type='performance'
+                queryset = queryset.filter(execution_type='performance')
         
         # 如果status存在，过滤状态
         if status_filter:
@@ -65,10 +75,46 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         if self.action != 'retrieve':
             queryset = queryset.filter(parent__isnull=True)  # 只显示父记录
         
-        # 预加载子记录（用于展开显示）
-        queryset = queryset.prefetch_related('children')
+        if self.action in ('list', 'retrieve'):
+            # 批量预加载序列化所需的关联数据，查询次数与记录数和子记录数无关
+            queryset = self._with_related(queryset)
+        else:
+            queryset = queryset.prefetch_related('children')
         
         return queryset
+    
+    def _with_related(self, queryset):
+        """预加载执行记录列表序列化所需的关联数据（子记录、套件用例顺序、嵌套的项目/接口/环境）"""
+        children_total = (Execution.objects.filter(parent=OuterRef('pk')).order_by()
+                          .values('parent').annotate(total=Count('id')).values('total'))
+        return queryset.select_related(
+            'project__owner', 'executor', 'testsuite__project__owner', 'testsuite__environment__project__owner',
+            *TESTCASE_RELATED
+        ).prefetch_related(
+            'project__members', 'testsuite__project__members', 'testsuite__environment__project__members',
+            *TESTCASE_MEMBERS,
+            Prefetch('children', queryset=Execution.objects.select_related(*TESTCASE_RELATED)
+                     .prefetch_related(*TESTCASE_MEMBERS).order_by('created_at', 'id')),
+            Prefetch('testsuite__testsuitetestcase_set', queryset=TestSuiteTestCase.objects
+                     .select_related(*TESTCASE_RELATED).prefetch_related(*TESTCASE_MEMBERS)
+                     .order_by('order', 'id')),
+        ).annotate(children_total=Coalesce(Subquery(children_total), 0))
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(self._extra_context)
+        return context
+    
+    def list(self, request, *args, **kwargs):
+        """执行记录列表（按页批量查询用例最新状态）"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        executions = list(page) if page is not None else list(queryset)
+        self._extra_context = build_serializer_context(executions)
+        serializer = self.get_serializer(executions, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
@@ -91,60 +137,73 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         total_suites = TestSuite.objects.filter(is_active=True).count()
         running_executions = Execution.objects.filter(status='running', parent__isnull=True).count()
         
-        # 今日统计（只统计父记录）
-        today_executions = Execution.objects.filter(created_at__gte=today_start, parent__isnull=True)
-        passed_today = today_executions.filter(status='passed').count()
-        failed_today = today_executions.filter(status='failed').count()
-        skipped_today = today_executions.filter(status='skipped').count()
+        # 今日统计（只统计已结束的父记录，读取项目小时汇总表）
+        today_stats = ProjectHourlyStat.objects.filter(hour__gte=today_start).aggregate(
+            passed=Sum('passed'),
+            failed=Sum('failed'),
+            skipped=Sum('skipped'),
+            duration_sum=Sum('duration_sum'),
+            duration_count=Sum('duration_count')
+        )
+        passed_today = today_stats['passed'] or 0
+        failed_today = today_stats['failed'] or 0
+        skipped_today = today_stats['skipped'] or 0
         
         total_today = passed_today + failed_today + skipped_today
         pass_rate = round((passed_today / total_today * 100), 2) if total_today > 0 else 0
         
-        # 平均耗时（今日已完成的执行，只统计父记录）
-        avg_duration = today_executions.filter(
-            status__in=['passed', 'failed'],
-            duration__isnull=False
-        ).aggregate(avg=Avg('duration'))['avg']
+        # 平均耗时（今日已完成的执行）
+        avg_duration = (today_stats['duration_sum'] / today_stats['duration_count']) if today_stats['duration_count'] else None
         avg_duration_sec = round(avg_duration, 2) if avg_duration else 0
 
-        # 2. 趋势数据（按小时聚合，只统计父记录）
+        # 2. 趋势数据（按小时聚合，只统计父记录，读取项目小时汇总表）
+        # 按整点分桶（UTC），最后一个桶为当前小时
+        current_hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        trend_start = current_hour - timedelta(hours=hours - 1)
+        hourly_stats = ProjectHourlyStat.objects.filter(
+            hour__gte=trend_start
+        ).values('hour').annotate(
+            runs=Sum('total'),
+            failures=Sum('failed')
+        ).order_by()
+        hourly_map = {item['hour']: item for item in hourly_stats}
+        
         trend_data = []
         for i in range(hours):
-            hour_start = time_start + timedelta(hours=i)
-            hour_end = hour_start + timedelta(hours=1)
-            
-            hour_executions = Execution.objects.filter(
-                created_at__gte=hour_start,
-                created_at__lt=hour_end,
-                parent__isnull=True
-            )
-            
+            hour_start = trend_start + timedelta(hours=i)
+            item = hourly_map.get(hour_start, {})
             trend_data.append({
                 'name': f'{hour_start.hour}h',
-                'runs': hour_executions.count(),
-                'failures': hour_executions.filter(status='failed').count()
+                'runs': item.get('runs') or 0,
+                'failures': item.get('failures') or 0
             })
 
-        # 3. 通过/失败/跳过统计（指定时间段，只统计父记录）
-        period_executions = Execution.objects.filter(created_at__gte=time_start, parent__isnull=True)
+        # 3. 通过/失败/跳过统计（指定时间段，只统计父记录，读取项目小时汇总表）
+        period_stats = ProjectHourlyStat.objects.filter(hour__gte=trend_start).aggregate(
+            passed=Sum('passed'),
+            failed=Sum('failed'),
+            skipped=Sum('skipped')
+        )
         pass_fail_data = [
             {
                 'name': '通过',
-                'value': period_executions.filter(status='passed').count()
+                'value': period_stats['passed'] or 0
             },
             {
                 'name': '失败',
-                'value': period_executions.filter(status='failed').count()
+                'value': period_stats['failed'] or 0
             },
             {
                 'name': '跳过',
-                'value': period_executions.filter(status='skipped').count()
+                'value': period_stats['skipped'] or 0
             }
         ]
 
         # 4. 最近运行列表（最近10条，优先显示父记录）
         recent_runs = Execution.objects.filter(
             created_at__gte=time_start
+        ).select_related(
+            'testsuite__environment', 'testcase__project'
         ).order_by('-created_at')[:10]
         
         recent_runs_data = []
@@ -159,14 +218,13 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                 'status': self._get_status_text(run.status)
             })
 
-        # 5. 失败趋势（按用例统计）
+        # 5. 失败趋势（按用例统计，读取用例小时汇总表）
         # 统计所有有执行记录的用例，包括有失败和没有失败的
-        case_stats = Execution.objects.filter(
-            created_at__gte=time_start,
-            testcase__isnull=False
+        case_stats = TestCaseHourlyStat.objects.filter(
+            hour__gte=trend_start
         ).values('testcase__name').annotate(
-            total=Count('id'),
-            failures=Count('id', filter=Q(status='failed'))
+            total=Sum('total'),
+            failures=Sum('failed')
         ).order_by('-failures', '-total')[:10]
 
         failure_trend = []
@@ -178,29 +236,32 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                 'failures': item['failures']
             })
 
-        # 6. Flaky用例（最近7天，失败率>20%的用例）
-        seven_days_ago = timezone.now() - timedelta(days=7)
+        # 6. Flaky用例（最近7天，失败率>20%的用例，读取用例小时汇总表）
+        seven_days_ago = current_hour - timedelta(days=7)
         flaky_cases = []
         
-        testcases_with_executions = TestCase.objects.filter(
-            executions__created_at__gte=seven_days_ago
-        ).distinct()
+        flaky_stats = TestCaseHourlyStat.objects.filter(
+            hour__gte=seven_days_ago
+        ).values('testcase_id', 'testcase__name').annotate(
+            total=Sum('total'),
+            failed=Sum('failed'),
+            duration_sum=Sum('duration_sum'),
+            duration_count=Sum('duration_count')
+        ).filter(total__gte=3).order_by()  # 至少执行3次
         
-        for testcase in testcases_with_executions:
-            recent_executions = testcase.executions.filter(created_at__gte=seven_days_ago)
-            if recent_executions.count() >= 3:  # 至少执行3次
-                total_count = recent_executions.count()
-                failed_count = recent_executions.filter(status='failed').count()
-                failure_rate = (failed_count / total_count) * 100
-                avg_dur = recent_executions.filter(duration__isnull=False).aggregate(avg=Avg('duration'))['avg']
-                
-                if failure_rate > 20:  # 失败率超过20%认为是flaky
-                    flaky_cases.append({
-                        'name': testcase.name,
-                        'desc': f'最近 {total_count} 次：失败 {failed_count} 次 · 平均耗时 {round(avg_dur or 0, 1)}s',
-                        'risk': '高风险' if failure_rate > 50 else '中等',
-                        'type': 'danger' if failure_rate > 50 else 'warning'
-                    })
+        for item in flaky_stats:
+            total_count = item['total']
+            failed_count = item['failed']
+            failure_rate = (failed_count / total_count) * 100
+            avg_dur = (item['duration_sum'] / item['duration_count']) if item['duration_count'] else 0
+            
+            if failure_rate > 20:  # 失败率超过20%认为是flaky
+                flaky_cases.append({
+                    'name': item['testcase__name'],
+                    'desc': f'最近 {total_count} 次：失败 {failed_count} 次 · 平均耗时 {round(avg_dur or 0, 1)}s',
+                    'risk': '高风险' if failure_rate > 50 else '中等',
+                    'type': 'danger' if failure_rate > 50 else 'warning'
+                })
         
         # 取前5个
         flaky_cases = sorted(flaky_cases, key=lambda x: x.get('risk', ''), reverse=True)[:5]
@@ -232,10 +293,19 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         }
         return status_map.get(status, status)
     
+    def retrieve(self, request, *args, **kwargs):
+        """获取执行记录（加载单独存储的响应体等大字段，包括预加载的子记录）"""
+        instance = self.get_object()
+        hydrate_results([instance, *instance.children.all()])
+        self._extra_context = build_serializer_context([instance])
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def details(self, request, pk=None):
         """获取执行详情（包含断言结果、错误信息等）"""
         execution = self.get_object()
+        hydrate_results([execution])
         
         result = execution.result or {}
         
@@ -301,7 +371,14 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         """删除执行记录"""
         # 如果是套件执行记录，可以选择是否同时删除子用例执行记录
         # 这里先简单删除，后续可以根据需求添加选项
+        # 同步扣除统计汇总表
+        # 同时清理不再被引用的响应体等大字段
+        queryset = Execution.objects.filter(pk=instance.pk)
+        testcase_ids = remove_executions(queryset)
+        digests = referenced_digests(queryset)
         instance.delete()
+        refresh_latest_status(testcase_ids)
+        release_blobs(digests)
     
     @action(detail=False, methods=['post'])
     def batch_delete(self, request):
@@ -333,8 +410,12 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         executions = Execution.objects.filter(id__in=execution_ids)
         deleted_count = executions.count()
         
-        # 执行删除
+        # 执行删除（同步扣除统计汇总表，清理不再被引用的响应体等大字段）
+        testcase_ids = remove_executions(executions)
+        digests = referenced_digests(executions)
         executions.delete()
+        refresh_latest_status(testcase_ids)
+        release_blobs(digests)
         
         return Response({
             'message': f'成功删除 {deleted_count} 条执行记录',
@@ -347,7 +428,8 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         execution = self.get_object()
         
         try:
-            # 准备报告数据
+            # 准备报告数据（加载单独存储的响应体等大字段）
+            hydrate_results([execution])
             result = execution.result or {}
             
             # 基本信息
@@ -368,11 +450,15 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                 # 生成测试用例HTML
                 testcases_html = ''
                 case_results = result.get('case_results', [])
+                # 父记录中只有结果摘要，完整结果从子执行记录批量加载
+                children = list(execution.children.all())
+                hydrate_results(children)
+                child_results = {child.id: child.result for child in children}
                 for case_result in case_results:
                     testcase_data = {
                         'name': case_result.get('testcase_name', 'Unknown'),
                         'status': case_result.get('status', 'unknown'),
-                        'result': case_result.get('result', {}),
+                        'result': child_results.get(case_result.get('execution_id')) or case_result.get('result', {}),
                         'method': 'GET'  # 默认
                     }
                     testcases_html += generate_testcase_html(testcase_data)
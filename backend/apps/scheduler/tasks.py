@@ -6,7 +6,6 @@ from apscheduler.triggers.cron import CronTrigger
 from django.utils import timezone
 import logging
 from .models import ScheduleTask
-from apps.executions.models import Execution
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -25,8 +24,8 @@ def execute_scheduled_task(task_id):
         task = ScheduleTask.objects.get(id=task_id, status='active')
         testsuite = task.testsuite
         
-        # 手动执行测试套件
-        testcases = testsuite.testcases.filter(is_active=True)
+        # 获取套件中的所有测试用例（按order字段排序）
+        testcases = testsuite.get_ordered_testcases()
         
         if not testcases.exists():
             logger.warning(f"定时任务 {task.name} 的测试套件中没有可执行的测试用例")
@@ -35,121 +34,14 @@ def execute_scheduled_task(task_id):
             return
         
         # 创建套件执行记录
-        suite_execution = Execution.objects.create(
-            # 定时任务父级执行记录，名称固定前缀，避免列表出现多条
-            name=f"[定时任务] {testsuite.name}",
-            project=testsuite.project,
-            testsuite=testsuite,
-            executor=None,
-            status='running',
-            start_time=timezone.now(),
-            execution_type='suite',
-            parent=None
-        )
-        
-        # 执行测试套件（复用TestSuiteViewSet的逻辑）
-        from apps.testcases.executor import TestCaseExecutor
-        from django.utils import timezone as tz
-        
-        suite_start_time = tz.now()
-        case_results = []
-        passed_count = 0
-        failed_count = 0
-        
-        # 共享变量
-        shared_variables = {}
-        if testsuite.environment and testsuite.environment.variables:
-            shared_variables.update(testsuite.environment.variables)
-        
-        # 批量执行测试用例
-        for testcase in testcases:
-            case_execution = Execution.objects.create(
-                name=f"{testcase.name} - {tz.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                project=testcase.project,
-                testsuite=testsuite,
-                testcase=testcase,
-                executor=None,
-                status='running',
-                start_time=tz.now(),
-                execution_type='suite',
-                parent=suite_execution  # 绑定父级，前端只展示父记录
-            )
-            
-            try:
-                executor = TestCaseExecutor(testcase, testsuite.environment or testcase.environment)
-                executor.variables.update(shared_variables)
-                
-                result = executor.execute()
-                
-                extracted_vars = result.get('extracted_variables', {})
-                if extracted_vars:
-                    shared_variables.update(extracted_vars)
-                
-                case_end_time = tz.now()
-                http_time = result.get('time')
-                if http_time:
-                    case_duration = http_time / 1000.0
-                else:
-                    case_duration = (case_end_time - case_execution.start_time).total_seconds()
-                
-                case_execution.status = 'passed' if result.get('success', False) else 'failed'
-                case_execution.result = result
-                case_execution.end_time = case_end_time
-                case_execution.duration = case_duration
-                case_execution.save()
-                
-                case_results.append({
-                    'testcase_id': testcase.id,
-                    'testcase_name': testcase.name,
-                    'execution_id': case_execution.id,
-                    'status': case_execution.status,
-                    'duration': case_duration,
-                    'result': result
-                })
-                
-                if case_execution.status == 'passed':
-                    passed_count += 1
-                else:
-                    failed_count += 1
-                    
-            except Exception as e:
-                case_end_time = tz.now()
-                case_duration = (case_end_time - case_execution.start_time).total_seconds()
-                
-                case_execution.status = 'failed'
-                case_execution.result = {
-                    'error': str(e),
-                    'success': False
-                }
-                case_execution.end_time = case_end_time
-                case_execution.duration = case_duration
-                case_execution.save()
-                
-                case_results.append({
-                    'testcase_id': testcase.id,
-                    'testcase_name': testcase.name,
-                    'execution_id': case_execution.id,
-                    'status': 'failed',
-                    'duration': case_duration,
-                    'error': str(e)
-                })
-                failed_count += 1
-        
-        # 更新套件执行记录
-        suite_end_time = tz.now()
-        suite_duration = (suite_end_time - suite_start_time).total_seconds()
-        
-        suite_execution.status = 'passed' if failed_count == 0 else 'failed'
-        suite_execution.result = {
-            'total': len(testcases),
-            'passed': passed_count,
-            'failed': failed_count,
-            'pass_rate': round(passed_count / len(testcases) * 100, 2) if len(testcases) > 0 else 0,
-            'case_results': case_results
-        }
-        suite_execution.end_time = suite_end_time
-        suite_execution.duration = suite_duration
-        suite_execution.save()
+        # 定时任务父级执行记录，名称固定前缀，避免列表出现多条
+        from apps.testsuites.runner import SuiteRunner, create_suite_execution
+        suite_execution = create_suite_execution(testsuite, user=None, name=f"[定时任务] {testsuite.name}")
+        
+        # 执行测试套件（与TestSuiteViewSet共用套件执行引擎）
+        summary = SuiteRunner(testsuite).run(suite_execution)
+        passed_count = summary['passed']
+        failed_count = summary['failed']
         
         # 更新任务最后执行时间和下次执行时间
         task.last_run_time = timezone.now()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TestCase, PerformanceTest
+from .models import TestCase, PerformanceTest, PerformanceRun
 
 
 @admin.register(TestCase)
@@ -40,17 +40,26 @@ class TestCaseAdmin(admin.ModelAdmin):
 @admin.register(PerformanceTest)
 class PerformanceTestAdmin(admin.ModelAdmin):
     """性能测试管理"""
-    list_display = ('name', 'project', 'api', 'threads', 'duration', 'is_active', 'last_execution_time')
+    list_display = ('name', 'project', 'api', 'testsuite', 'threads', 'duration', 'is_active', 'last_execution_time')
     list_filter = ('is_active', 'project', 'created_at')
     search_fields = ('name', 'description')
     readonly_fields = ('last_execution_time', 'created_at', 'updated_at')
+    raw_id_fields = ('baseline_run',)
     
     fieldsets = (
         ('基本信息', {
-            'fields': ('name', 'project', 'api', 'environment', 'description', 'is_active')
+            'fields': ('name', 'project', 'api', 'testsuite', 'environment', 'description', 'is_active')
+        }),
+        ('场景配置', {
+            'fields': ('scenario',),
+            'classes': ('collapse',)
         }),
         ('性能参数', {
-            'fields': ('threads', 'ramp_up', 'duration', 'loops')
+            'fields': ('threads', 'ramp_up', 'duration', 'loops', 'workers', 'load_profile')
+        }),
+        ('回归检测', {
+            'fields': ('baseline_run', 'regression_tolerances'),
+            'classes': ('collapse',)
         }),
         ('JMeter 配置', {
             'fields': ('jmx_file',),
@@ -66,3 +75,13 @@ class PerformanceTestAdmin(admin.ModelAdmin):
         }),
     )
 
+
+@admin.register(PerformanceRun)
+class PerformanceRunAdmin(admin.ModelAdmin):
+    """性能测试运行记录管理"""
+    list_display = ('id', 'performance_test', 'status', 'verdict', 'start_time', 'duration', 'threads', 'workers', 'point_count')
+    list_filter = ('status', 'verdict', 'created_at')
+    search_fields = ('performance_test__name',)
+    exclude = ('series',)
+    readonly_fields = ('performance_test', 'status', 'start_time', 'end_time', 'duration', 'threads', 'workers',
+                       'summary', 'error', 'series_names', 'point_count', 'verdict', 'regression', 'created_at')
@@ -8,3 +8,12 @@ class TestcasesConfig(AppConfig):
 
 
 
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from .models import TestCase
+        from .scripts import invalidate_scripts
+
+        # 测试用例更新/删除时清除其脚本的编译缓存
+        post_save.connect(invalidate_scripts, sender=TestCase, dispatch_uid='testcase_scripts_post_save')
+        post_delete.connect(invalidate_scripts, sender=TestCase, dispatch_uid='testcase_scripts_post_delete')
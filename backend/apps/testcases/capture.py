@@ -0,0 +1,190 @@
+"""
+HTTP响应读取
+
+响应体以流式分块读取：内存中最多保留 RESPONSE_CAPTURE_MAX_BYTES 字节供断言、变量提取和脚本使用，
+超出部分只参与计算大小和 SHA-256 后丢弃，导出文件等大响应不会占满 worker 内存。
+响应体文本和JSON在首次使用时解析一次并缓存，所有使用方共用同一个 CapturedResponse。
+执行结果中只保存响应体的前 RESPONSE_PERSIST_MAX_BYTES 字节（以及完整响应体的大小和摘要）。
+文本编码与 requests 一致：优先使用 Content-Type 中的字符集（text/* 默认 ISO-8859-1，JSON 默认 UTF-8），
+否则按内容检测（合法的 UTF-8 直接使用，不再检测）。
+"""
+import json
+import hashlib
+from typing import Any, Dict, Optional
+from django.conf import settings
+from requests.compat import chardet
+from requests.utils import get_encoding_from_headers
+
+# 未解析标记（JSON解析结果可能为 None）
+_UNSET = object()
+
+
+def _capture_max_bytes() -> int:
+    return getattr(settings, 'RESPONSE_CAPTURE_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def _persist_max_bytes() -> int:
+    return getattr(settings, 'RESPONSE_PERSIST_MAX_BYTES', 1024 * 1024)
+
+
+def _chunk_size() -> int:
+    return getattr(settings, 'RESPONSE_CHUNK_SIZE', 64 * 1024)
+
+
+def _charset(headers) -> Optional[str]:
+    """从 Content-Type 中获取字符集（与 requests 相同的默认值），无法确定时返回 None"""
+    return get_encoding_from_headers({'content-type': headers.get('content-type') or ''})
+
+
+def _detect_encoding(content: bytes) -> str:
+    """按内容检测编码（与 requests 的 apparent_encoding 相同），合法的 UTF-8 直接返回"""
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    if chardet is None:
+        return 'utf-8'
+    return chardet.detect(content)['encoding'] or 'utf-8'
+
+
+class _BodyReader:
+    """分块累积响应体（超过上限的部分只计算大小和摘要）"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = _capture_max_bytes() if max_bytes is None else max_bytes
+        self.chunks = []
+        self.kept = 0
+        self.size = 0
+        self.truncated = False
+        self.hasher = hashlib.sha256()
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        self.hasher.update(chunk)
+        remaining = self.max_bytes - self.kept
+        if remaining <= 0:
+            self.truncated = True
+            return
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+            self.truncated = True
+        self.chunks.append(chunk)
+        self.kept += len(chunk)
+
+    def build(self, status_code: int, headers, url: str = '') -> 'CapturedResponse':
+        return CapturedResponse(
+            status_code=status_code,
+            headers=headers,
+            content=b''.join(self.chunks),
+            size=self.size,
+            sha256=self.hasher.hexdigest(),
+            truncated=self.truncated,
+            url=url,
+        )
+
+
+class CapturedResponse:
+    """
+    已读取的HTTP响应
+
+    提供与 requests.Response 相同的常用属性（status_code、headers、content、text、json()），
+    前置/后置脚本中的 response 对象可以照常使用。
+    """
+
+    def __init__(self, status_code: int, headers, content: bytes, size: int = None,
+                 sha256: str = '', truncated: bool = False, url: str = ''):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.size = len(content) if size is None else size
+        self.sha256 = sha256
+        self.truncated = truncated
+        self.url = url
+        self._encoding = _charset(headers)
+        self._text = None
+        self._json = _UNSET
+        self._json_error = None
+
+    @property
+    def encoding(self) -> str:
+        """文本编码（响应头中没有字符集时首次访问按内容检测）"""
+        if self._encoding is None:
+            self._encoding = _detect_encoding(self.content)
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, value: str) -> None:
+        # 与 requests 一致，脚本中可以指定编码后重新读取 text
+        self._encoding = value
+        self._text = None
+        self._json = _UNSET
+        self._json_error = None
+
+    @property
+    def text(self) -> str:
+        """响应文本（首次访问时解码）"""
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.encoding, errors='replace')
+            except LookupError:
+                self._text = self.content.decode('utf-8', errors='replace')
+        return self._text
+
+    def json(self) -> Any:
+        """解析后的JSON（只解析一次），不是合法JSON时抛出 ValueError"""
+        if self._json is _UNSET:
+            try:
+                if self.truncated:
+                    raise ValueError('响应体超过读取上限，无法解析JSON')
+                self._json = json.loads(self.text)
+            except ValueError as e:
+                self._json = None
+                self._json_error = e
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    @property
+    def json_data(self) -> Any:
+        """解析后的JSON，不是合法JSON时为 None"""
+        try:
+            return self.json()
+        except ValueError:
+            return None
+
+    def persisted_body(self) -> Dict[str, Any]:
+        """执行结果中保存的响应体信息（超过上限时只保存前缀）"""
+        limit = _persist_max_bytes()
+        truncated = self.truncated or len(self.content) > limit
+        body = self.content[:limit].decode(self.encoding, errors='ignore') if truncated else self.text
+        return {
+            'body': body,
+            'body_size': self.size,
+            'body_sha256': self.sha256,
+            'body_truncated': truncated,
+        }
+
+
+def capture_response(response, max_bytes: Optional[int] = None) -> CapturedResponse:
+    """流式读取 requests 响应（需以 stream=True 发送），读取完成后释放连接"""
+    reader = _BodyReader(max_bytes)
+    try:
+        for chunk in response.iter_content(chunk_size=_chunk_size()):
+            reader.feed(chunk)
+    finally:
+        response.close()
+    return reader.build(response.status_code, response.headers, response.url)
+
+
+async def capture_async_response(response, max_bytes: Optional[int] = None) -> CapturedResponse:
+    """流式读取 httpx 响应（client.stream），读取完成后释放连接"""
+    reader = _BodyReader(max_bytes)
+    try:
+        async for chunk in response.aiter_bytes(chunk_size=_chunk_size()):
+            reader.feed(chunk)
+    finally:
+        await response.aclose()
+    return reader.build(response.status_code, response.headers, str(response.url))
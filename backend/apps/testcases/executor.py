@@ -1,27 +1,42 @@
 """
 测试用例执行引擎
 """
+import asyncio
 import requests
+import httpx
 import json
 import re
+import threading
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
 from apps.environments.models import GlobalToken
+from apps.environments.tokens import GlobalTokenResolver
+from .templating import TrackedDict, VariableScope, compile_template, render, render_field
+from .capture import capture_response, capture_async_response
+from .jsonpath import compile_path
+from .scripts import CompiledScript, compile_script
+from .sandbox import ScriptAssertionError, ScriptError, ScriptTimeout, run_script, snapshot
+
+# 单次HTTP请求超时时间（秒）
+REQUEST_TIMEOUT = 30
 
 # 禁用SSL警告（开发环境）
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# 创建全局Session用于连接复用（减少连接建立时间）
-_global_session = None
+# 每个线程一个 Session 用于连接复用（减少连接建立时间）
+# requests.Session 不是线程安全的，套件并行执行时各工作线程使用自己的 Session
+_thread_local = threading.local()
 
 def get_session():
-    """获取全局Session实例（连接复用）"""
-    global _global_session
-    if _global_session is None:
-        _global_session = requests.Session()
+    """获取当前线程的 Session 实例（连接复用）"""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
         # 配置重试策略
         from requests.adapters import HTTPAdapter
         from requests.packages.urllib3.util.retry import Retry
@@ -31,28 +46,36 @@ def get_session():
             status_forcelist=[]
         )
         adapter = HTTPAdapter(max_retries=retry_strategy)
-        _global_session.mount("http://", adapter)
-        _global_session.mount("https://", adapter)
-    return _global_session
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _thread_local.session = session
+    return session
 
 
 class TestCaseExecutor:
     """测试用例执行器"""
     
-    def __init__(self, testcase, environment=None):
+    def __init__(self, testcase, environment=None, token_resolver: Optional[GlobalTokenResolver] = None):
         """
         初始化执行器
         :param testcase: TestCase 实例
         :param environment: Environment 实例（可选）
+        :param token_resolver: 全局Token解析器（可选，同一次执行的多个执行器共用以避免重复查询）
         """
         self.testcase = testcase
+        self.token_resolver = token_resolver or GlobalTokenResolver()
         self.api = testcase.api
         self.environment = environment or testcase.environment
-        self.variables = {}
+        # 运行时变量（记录修改版本，变量作用域据此判断是否需要重建）
+        self.variables = TrackedDict()
+        self._scope = None
+        
+        # 本次用例执行使用的全局Token（执行过程中保持一致，执行期间不再查询数据库）
+        self._global_token = self.token_resolver.get()
         
         # 【修复】立即注入全局Token的variables和token值，无论接口是否配置认证
         # 这样单独执行测试用例时，${token}等变量可以从全局Token获取
-        global_token = self._get_global_token()
+        global_token = self._global_token
         if global_token:
             # 1. 注入全局Token的variables字段（如果有配置）
             if global_token.variables:
@@ -63,6 +86,9 @@ class TestCaseExecutor:
                 self.variables['_global_token_static'] = global_token.token
         
         self.response = None
+        self._request_url = None
+        # 脚本上下文中用例/接口/环境的字段快照（首次执行脚本时生成）
+        self._snapshots = None
         self.execution_result = {
             'status_code': None,
             'headers': {},
@@ -73,35 +99,28 @@ class TestCaseExecutor:
             'error': None
         }
     
+    @property
+    def scope(self) -> VariableScope:
+        """变量作用域：环境变量 < 测试用例变量 < 运行时变量"""
+        if not isinstance(self.variables, TrackedDict):
+            self.variables = TrackedDict(self.variables or {})
+        if self._scope is None or self._scope.layers[-1] is not self.variables:
+            self._scope = VariableScope(
+                (self.environment.variables or {}) if self.environment else {},
+                self.testcase.variables or {},
+                self.variables
+            )
+        return self._scope
+    
     def _replace_variables(self, text: str) -> str:
         """替换变量 ${variable}"""
         if not text or not isinstance(text, str):
             return text
-        
-        # 合并环境变量和测试用例变量
-        all_vars = {}
-        if self.environment:
-            all_vars.update(self.environment.variables or {})
-        all_vars.update(self.testcase.variables or {})
-        all_vars.update(self.variables or {})
-        
-        # 替换 ${variable} 格式的变量
-        def replace_match(match):
-            var_name = match.group(1)
-            return str(all_vars.get(var_name, match.group(0)))
-        
-        return re.sub(r'\$\{(\w+)\}', replace_match, text)
+        return compile_template(text).render(self.scope)
     
     def _replace_variables_in_dict(self, data: Dict) -> Dict:
         """递归替换字典中的变量"""
-        if isinstance(data, dict):
-            return {k: self._replace_variables_in_dict(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._replace_variables_in_dict(item) for item in data]
-        elif isinstance(data, str):
-            return self._replace_variables(data)
-        else:
-            return data
+        return render(data, self.scope)
     
     def _build_url(self) -> str:
         """构建完整的请求URL（支持用例级别的URL覆盖）"""
@@ -146,26 +165,17 @@ class TestCaseExecutor:
             headers.update(self.testcase.headers_override)
         
         # 替换变量
-        headers = {k: self._replace_variables(str(v)) for k, v in headers.items()}
+        scope = self.scope
+        headers = {k: compile_template(str(v)).render(scope) for k, v in headers.items()}
         
         return headers
     
     def _get_global_token(self) -> Optional[GlobalToken]:
         """
         获取全局 Token
-        优先级：默认 Token > 启用的第一个 Token
+        优先级：默认 Token > 启用的第一个 Token（初始化时由解析器加载）
         """
-        try:
-            # 优先获取默认 Token
-            default_token = GlobalToken.objects.filter(is_active=True, is_default=True).first()
-            if default_token:
-                return default_token
-            
-            # 如果没有默认 Token，获取第一个启用的 Token
-            active_token = GlobalToken.objects.filter(is_active=True).first()
-            return active_token
-        except Exception:
-            return None
+        return self._global_token
     
     def _build_auth(self) -> Optional[Any]:
         """
@@ -270,7 +280,7 @@ class TestCaseExecutor:
     
     def _extract_variables(self) -> None:
         """从响应中提取变量到self.variables"""
-        if not self.response:
+        if self.response is None:
             return
         
         # 从testcase.variables中获取extractors配置
@@ -278,47 +288,13 @@ class TestCaseExecutor:
         if not extractors_config:
             return
         
-        # 尝试解析JSON响应
-        response_json = None
-        try:
-            response_json = self.response.json()
-        except:
-            response_json = None
+        # 解析后的JSON响应（与断言共用，只解析一次）
+        response_json = self.response.json_data
         
         # 遍历extractors配置，提取变量
         for var_name, json_path in extractors_config.items():
             try:
-                if json_path.startswith('$.'):
-                    # JSON路径提取（去掉$.前缀）
-                    if response_json:
-                        value = self._get_json_value(json_path[2:])  # 去掉$.前缀
-                        if value is not None:
-                            self.variables[var_name] = value
-                elif json_path.startswith('$[') or (json_path.startswith('[') and isinstance(response_json, list)):
-                    # JSON路径数组提取（简化处理）
-                    if response_json:
-                        # 简化处理：去掉$前缀，尝试解析
-                        clean_path = json_path[1:] if json_path.startswith('$') else json_path
-                        # 尝试简单解析数组路径（如[0].id或0.id）
-                        try:
-                            # 去掉开头的[和]
-                            path_parts = clean_path.replace('[', '').replace(']', '.').strip('.').split('.')
-                            value = response_json
-                            for part in path_parts:
-                                if part:
-                                    if isinstance(value, list):
-                                        value = value[int(part)] if part.isdigit() and int(part) < len(value) else None
-                                    elif isinstance(value, dict):
-                                        value = value.get(part)
-                                    else:
-                                        value = None
-                                    if value is None:
-                                        break
-                            if value is not None:
-                                self.variables[var_name] = value
-                        except (ValueError, IndexError, TypeError):
-                            pass
-                elif json_path.startswith('header.'):
+                if json_path.startswith('header.'):
                     # 从响应头提取
                     header_name = json_path[7:]  # 去掉header.前缀
                     if header_name in self.response.headers:
@@ -330,8 +306,8 @@ class TestCaseExecutor:
                     # 提取整个响应体
                     self.variables[var_name] = self._get_response_text()
                 else:
-                    # 尝试直接作为JSON路径
-                    if response_json:
+                    # JSONPath 提取（如 $.data.token、$[0].id、$..items[?(@.status == 'ok')].id）
+                    if response_json is not None:
                         value = self._get_json_value(json_path)
                         if value is not None:
                             self.variables[var_name] = value
@@ -339,161 +315,59 @@ class TestCaseExecutor:
                 # 提取失败，记录但不影响执行
                 print(f"变量提取失败 {var_name}: {str(e)}")
     
-    def _validate_script(self, script: str) -> bool:
-        """验证脚本是否安全"""
-        import ast
-        # 禁止的危险操作
-        FORBIDDEN_NODES = (
-            ast.Import, ast.ImportFrom,  # 禁止导入
-        )
-        FORBIDDEN_FUNCTIONS = {
-            'open', 'file', '__import__', 'exec', 'eval', 'compile',
-            'reload', 'input', 'raw_input', 'execfile', 'exit', 'quit',
-        }
-        
+    def _script_payload(self, with_response: bool = False, **extra) -> Dict[str, Any]:
+        """
+        脚本上下文数据（发送到脚本进程）：用例、接口、环境的字段快照，以及响应（后置脚本、钩子和手动断言）
+        set_variable/get_variable/get_json_value 等辅助函数在脚本进程中创建
+        """
+        if self._snapshots is None:
+            self._snapshots = {
+                'testcase': snapshot(self.testcase),
+                'api': snapshot(self.api),
+                'environment': snapshot(self.environment),
+            }
+        payload = {**self._snapshots, **extra}
+        if with_response:
+            payload['response'] = self.response
+            payload['time'] = self.execution_result.get('time', 0)
+        return payload
+    
+    def _compile_script(self, script: str, owner) -> CompiledScript:
+        """获取脚本的安全校验结果和编译后的代码（按内容缓存，见 scripts.py）"""
+        return compile_script(script, owner=owner)
+    
+    def _run_script(self, label: str, script: str, owner, profile: str, payload: Dict[str, Any]) -> None:
+        """
+        在沙箱进程池中执行脚本（见 sandbox.py），脚本修改的变量同步到 self.variables
+        脚本被拒绝、超时或执行错误时只记录，不中断测试
+        """
+        # 验证脚本安全性和长度（校验结果和编译后的代码按脚本内容缓存）
+        compiled = self._compile_script(script, owner)
+        if not compiled.valid:
+            print(f"{label}{compiled.error}")
+            return
         try:
-            tree = ast.parse(script)
-            for node in ast.walk(tree):
-                # 检查禁止的节点类型
-                if isinstance(node, FORBIDDEN_NODES):
-                    return False
-                # 检查禁止的函数调用
-                if isinstance(node, ast.Call):
-                    if isinstance(node.func, ast.Name):
-                        if node.func.id in FORBIDDEN_FUNCTIONS:
-                            return False
-                    # 检查属性访问（如 __import__）
-                    if isinstance(node.func, ast.Attribute):
-                        if node.func.attr in FORBIDDEN_FUNCTIONS:
-                            return False
-            return True
-        except SyntaxError:
-            return False
-        except Exception:
-            # 如果解析失败，拒绝执行
-            return False
+            output = run_script(compiled, script, profile, payload, self.variables)
+        except (ScriptAssertionError, ScriptTimeout, ScriptError) as e:
+            # 脚本执行错误，记录但不中断测试
+            print(f"{label}执行错误: {str(e)}")
+            return
+        for line in output:
+            print(line)
     
     def _execute_pre_script(self) -> None:
         """执行前置脚本（Python脚本）"""
         if not self.testcase.pre_script:
             return
-        
-        script = self.testcase.pre_script
-        
-        # 验证脚本安全性
-        if not self._validate_script(script):
-            print(f"前置脚本包含不安全操作，已拒绝执行")
-            return
-        
-        # 限制脚本长度，防止资源耗尽
-        if len(script) > 10000:  # 10KB限制
-            print(f"前置脚本过长（{len(script)}字符），已拒绝执行")
-            return
-        
-        # 准备脚本执行上下文
-        context = {
-            'variables': self.variables,
-            'testcase': self.testcase,
-            'api': self.api,
-            'environment': self.environment,
-            # 提供一些常用函数
-            'set_variable': lambda name, value: self.variables.update({name: value}),
-            'get_variable': lambda name: self.variables.get(name),
-            'print': print,
-        }
-        
-        try:
-            # 执行脚本（注意：生产环境应该使用更安全的方式）
-            # 限制内置函数，只允许安全操作
-            safe_builtins = {
-                'len': len,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-                'list': list,
-                'dict': dict,
-                'tuple': tuple,
-                'range': range,
-            }
-            
-            # 移除setattr等可能被滥用的函数
-            exec(script, {'__builtins__': safe_builtins}, context)
-        except Exception as e:
-            # 脚本执行错误，记录但不中断测试
-            print(f"前置脚本执行错误: {str(e)}")
+        self._run_script('前置脚本', self.testcase.pre_script, self.testcase, 'pre_script',
+                         self._script_payload())
     
     def _execute_post_script(self) -> None:
         """执行后置脚本（Python脚本）"""
         if not self.testcase.post_script:
             return
-        
-        script = self.testcase.post_script
-        
-        # 验证脚本安全性
-        if not self._validate_script(script):
-            print(f"后置脚本包含不安全操作，已拒绝执行")
-            return
-        
-        # 限制脚本长度，防止资源耗尽
-        if len(script) > 10000:  # 10KB限制
-            print(f"后置脚本过长（{len(script)}字符），已拒绝执行")
-            return
-        
-        # 准备脚本执行上下文
-        context = {
-            'status_code': self.response.status_code if self.response else None,
-            'headers': dict(self.response.headers) if self.response else {},
-            'body': self._get_response_text() if self.response else '',
-            'json': None,
-            'time': self.execution_result.get('time', 0),
-            'response': self.response,
-            'variables': self.variables,
-            'testcase': self.testcase,
-            'api': self.api,
-            'environment': self.environment,
-            # 提供一些常用函数
-            'set_variable': lambda name, value: self.variables.update({name: value}),
-            'get_variable': lambda name: self.variables.get(name),
-            'get_json_value': lambda path: self._get_json_value(path) if self.response else None,
-            'print': print,
-        }
-        
-        # 尝试解析JSON响应
-        if self.response:
-            try:
-                context['json'] = self.response.json()
-            except:
-                pass
-        
-        try:
-            # 执行脚本（注意：生产环境应该使用更安全的方式）
-            safe_builtins = {
-                'len': len,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-                'list': list,
-                'dict': dict,
-                'tuple': tuple,
-                'range': range,
-                'type': type,
-                'isinstance': isinstance,
-                'hasattr': hasattr,
-                'getattr': getattr,
-                'setattr': setattr,
-                'round': round,
-                'abs': abs,
-                'min': min,
-                'max': max,
-                'sum': sum,
-            }
-            
-            exec(script, {'__builtins__': safe_builtins}, context)
-        except Exception as e:
-            # 脚本执行错误，记录但不中断测试
-            print(f"后置脚本执行错误: {str(e)}")
+        self._run_script('后置脚本', self.testcase.post_script, self.testcase, 'post_script',
+                         self._script_payload(with_response=True))
     
     def _execute_environment_pre_hook(self, request_info: dict = None) -> None:
         """执行环境前置钩子函数
@@ -503,106 +377,23 @@ class TestCaseExecutor:
         """
         if not self.environment or not self.environment.pre_hook:
             return
-        
-        script = self.environment.pre_hook
-        
-        # 验证脚本安全性
-        if not self._validate_script(script):
-            print(f"环境前置钩子包含不安全操作，已拒绝执行")
-            return
-        
-        # 限制脚本长度，防止资源耗尽
-        if len(script) > 10000:  # 10KB限制
-            print(f"环境前置钩子过长（{len(script)}字符），已拒绝执行")
-            return
-        
-        # 准备脚本执行上下文
-        context = {
-            'variables': self.variables,
-            'testcase': self.testcase,
-            'api': self.api,
-            'environment': self.environment,
-            'request_info': request_info or {},  # 传入请求信息
-            'set_variable': lambda name, value: self.variables.update({name: value}),
-            'get_variable': lambda name: self.variables.get(name),
-            'print': print,
-        }
-        
-        try:
-            safe_builtins = {
-                'len': len, 'str': str, 'int': int, 'float': float, 'bool': bool,
-                'list': list, 'dict': dict, 'tuple': tuple, 'range': range,
-                'type': type, 'isinstance': isinstance, 'hasattr': hasattr,
-                'getattr': getattr, 'setattr': setattr, 'round': round,
-                'abs': abs, 'min': min, 'max': max, 'sum': sum,
-                # 添加签名所需的模块
-                'hmac': __import__('hmac'),
-                'hashlib': __import__('hashlib'),
-                'base64': __import__('base64'),
-                'time': __import__('time'),
-                'json': __import__('json'),
-                'uuid': __import__('uuid'),
-            }
-            exec(script, {'__builtins__': safe_builtins}, context)
-        except Exception as e:
-            print(f"环境前置钩子执行错误: {str(e)}")
+        # 传入请求信息（接口和用例以字段快照传入）
+        request_info = dict(request_info or {})
+        for key in ('api', 'testcase'):
+            if key in request_info:
+                request_info[key] = snapshot(request_info[key])
+        self._run_script('环境前置钩子', self.environment.pre_hook, self.environment, 'pre_hook',
+                         self._script_payload(request_info=request_info))
     
     def _execute_environment_post_hook(self) -> None:
         """执行环境后置钩子函数"""
         if not self.environment or not self.environment.post_hook:
             return
-        
-        script = self.environment.post_hook
-        
-        # 验证脚本安全性
-        if not self._validate_script(script):
-            print(f"环境后置钩子包含不安全操作，已拒绝执行")
-            return
-        
-        # 限制脚本长度，防止资源耗尽
-        if len(script) > 10000:  # 10KB限制
-            print(f"环境后置钩子过长（{len(script)}字符），已拒绝执行")
-            return
-        
-        # 准备脚本执行上下文
-        context = {
-            'status_code': self.response.status_code if self.response else None,
-            'headers': dict(self.response.headers) if self.response else {},
-            'body': self._get_response_text() if self.response else '',
-            'json': None,
-            'time': self.execution_result.get('time', 0),
-            'response': self.response,
-            'variables': self.variables,
-            'testcase': self.testcase,
-            'api': self.api,
-            'environment': self.environment,
-            'set_variable': lambda name, value: self.variables.update({name: value}),
-            'get_variable': lambda name: self.variables.get(name),
-            'get_json_value': lambda path: self._get_json_value(path) if self.response else None,
-            'print': print,
-        }
-        
-        # 尝试解析JSON响应
-        if self.response:
-            try:
-                context['json'] = self.response.json()
-            except:
-                pass
-        
-        try:
-            safe_builtins = {
-                'len': len, 'str': str, 'int': int, 'float': float, 'bool': bool,
-                'list': list, 'dict': dict, 'tuple': tuple, 'range': range,
-                'type': type, 'isinstance': isinstance, 'hasattr': hasattr,
-                'getattr': getattr, 'setattr': setattr, 'round': round,
-                'abs': abs, 'min': min, 'max': max, 'sum': sum,
-            }
-            exec(script, {'__builtins__': safe_builtins}, context)
-        except Exception as e:
-            print(f"环境后置钩子执行错误: {str(e)}")
+        self._run_script('环境后置钩子', self.environment.post_hook, self.environment, 'post_hook',
+                         self._script_payload(with_response=True))
     
     def _execute_manual_assertions(self) -> list:
-        """执行手动断言脚本（Python脚本）"""
+        """执行手动断言脚本（Python脚本，在沙箱进程池中执行）"""
         manual_assertions = []
         
         # 查找手动断言（type为'manual'或'script'）
@@ -612,25 +403,8 @@ class TestCaseExecutor:
         if not manual_scripts:
             return manual_assertions
         
-        # 准备断言上下文
-        context = {
-            'status_code': self.response.status_code if self.response else None,
-            'headers': dict(self.response.headers) if self.response else {},
-            'body': self._get_response_text() if self.response else '',
-            'json': None,
-            'time': self.execution_result.get('time', 0),
-            'response': self.response,
-            'variables': self.variables,
-            'testcase': self.testcase,
-            'api': self.api,
-        }
-        
-        # 尝试解析JSON响应
-        if self.response:
-            try:
-                context['json'] = self.response.json()
-            except:
-                pass
+        # 准备断言上下文（断言辅助函数 assert_equal 等在脚本进程中提供）
+        payload = self._script_payload(with_response=True)
         
         # 执行每个手动断言脚本
         for idx, assertion in enumerate(manual_scripts):
@@ -640,80 +414,20 @@ class TestCaseExecutor:
             if not script:
                 continue
             
-            # 验证脚本安全性
-            if not self._validate_script(script):
-                manual_assertions.append({
-                    'type': assertion.get('type', 'manual'),
-                    'description': description,
-                    'success': False,
-                    'message': '脚本包含不安全操作，已拒绝执行'
-                })
-                continue
-            
-            # 限制脚本长度，防止资源耗尽
-            if len(script) > 10000:  # 10KB限制
+            # 验证脚本安全性和长度（校验结果和编译后的代码按脚本内容缓存）
+            compiled = self._compile_script(script, self.testcase)
+            if not compiled.valid:
                 manual_assertions.append({
                     'type': assertion.get('type', 'manual'),
                     'description': description,
                     'success': False,
-                    'message': f'脚本过长（{len(script)}字符），已拒绝执行'
+                    'message': f'脚本{compiled.error}'
                 })
                 continue
             
             try:
-                # 使用受限的执行环境（安全的脚本执行）
-                # 注意：实际生产环境应该使用更安全的脚本执行方式（如沙箱）
-                # 这里提供一个基础实现
-                
-                # 定义断言辅助函数
-                def assert_equal(actual, expected, message=''):
-                    if actual != expected:
-                        raise AssertionError(f"{message} 期望: {expected}, 实际: {actual}")
-                    return True
-                
-                def assert_not_equal(actual, expected, message=''):
-                    if actual == expected:
-                        raise AssertionError(f"{message} 不应等于: {expected}, 实际: {actual}")
-                    return True
-                
-                def assert_contains(container, item, message=''):
-                    if item not in container:
-                        raise AssertionError(f"{message} 期望包含: {item}, 实际: {container}")
-                    return True
-                
-                def assert_greater_than(actual, expected, message=''):
-                    if actual <= expected:
-                        raise AssertionError(f"{message} 期望 > {expected}, 实际: {actual}")
-                    return True
-                
-                def assert_less_than(actual, expected, message=''):
-                    if actual >= expected:
-                        raise AssertionError(f"{message} 期望 < {expected}, 实际: {actual}")
-                    return True
-                
-                def assert_true(condition, message=''):
-                    if not condition:
-                        raise AssertionError(f"{message} 期望为True, 实际为False")
-                    return True
-                
-                def assert_false(condition, message=''):
-                    if condition:
-                        raise AssertionError(f"{message} 期望为False, 实际为True")
-                    return True
-                
-                # 扩展上下文
-                context.update({
-                    'assert_equal': assert_equal,
-                    'assert_not_equal': assert_not_equal,
-                    'assert_contains': assert_contains,
-                    'assert_greater_than': assert_greater_than,
-                    'assert_less_than': assert_less_than,
-                    'assert_true': assert_true,
-                    'assert_false': assert_false,
-                })
-                
-                # 执行脚本（注意：生产环境应该使用更安全的方式）
-                exec(script, {'__builtins__': {}}, context)
+                for line in run_script(compiled, script, 'assertion', payload, self.variables):
+                    print(line)
                 
                 manual_assertions.append({
                     'type': 'manual',
@@ -722,14 +436,14 @@ class TestCaseExecutor:
                     'message': '手动断言通过'
                 })
                 
-            except AssertionError as e:
+            except ScriptAssertionError as e:
                 manual_assertions.append({
                     'type': 'manual',
                     'description': description,
                     'success': False,
                     'message': str(e)
                 })
-            except Exception as e:
+            except (ScriptTimeout, ScriptError) as e:
                 manual_assertions.append({
                     'type': 'manual',
                     'description': description,
@@ -747,7 +461,7 @@ class TestCaseExecutor:
         # 过滤掉手动断言类型
         regular_assertions = [a for a in assertions if a.get('type') not in ['manual', 'script']]
         
-        if not self.response:
+        if self.response is None:
             return assertions_result
         
         for assertion in regular_assertions:
@@ -784,12 +498,10 @@ class TestCaseExecutor:
                 elif assertion_type == 'json_path':
                     # JSON 路径断言
                     json_path = assertion.get('path') or assertion.get('json_path', '')
-                    # 去掉$.前缀（如果有）
-                    clean_path = json_path[2:] if json_path.startswith('$.') else json_path
                     # 支持expected或value字段
                     expected_value = assertion.get('expected') or assertion.get('value')
                     operator = assertion.get('operator', 'equals')
-                    actual = self._get_json_value(clean_path)
+                    actual = self._get_json_value(json_path)
                     
                     if operator == 'exists':
                         # 检查字段是否存在
@@ -832,147 +544,219 @@ class TestCaseExecutor:
     
     def _get_response_text(self) -> str:
         """获取响应文本"""
-        if not self.response:
-            return ''
-        
-        try:
-            return self.response.text
-        except:
+        if self.response is None:
             return ''
+        return self.response.text
     
     def _get_json_value(self, json_path: str) -> Any:
-        """根据JSON路径获取值"""
-        try:
-            data = self.response.json()
-            # 简单的 JSON 路径实现，支持 . 分隔
-            keys = json_path.split('.')
-            value = data
-            for key in keys:
-                if isinstance(value, dict):
-                    value = value.get(key)
-                elif isinstance(value, list):
-                    try:
-                        value = value[int(key)]
-                    except (ValueError, IndexError):
-                        return None
-                else:
-                    return None
-            return value
-        except:
+        """
+        根据JSONPath获取值（使用已解析的JSON，表达式编译结果按字符串缓存）
+        包含通配符、过滤或递归查找的路径返回所有匹配值的列表
+        """
+        data = self.response.json_data if self.response is not None else None
+        if data is None:
             return None
+        return compile_path(json_path).value(data)
+    
+    def _render_body(self) -> Any:
+        """渲染请求体（使用按字段缓存的编译计划）"""
+        # 方案A：优先级：用例覆盖 > 接口定义
+        if self.testcase.body_override:
+            return render_field(self.testcase, 'body_override', self.scope)
+        return render_field(self.api, 'body', self.scope, {})
+    
+    def _prepare_request(self) -> Dict[str, Any]:
+        """准备请求参数（执行环境前置钩子和前置脚本后构建完整请求）"""
+        # 先构建基础请求参数（环境钩子可能需要这些信息）
+        url = self._build_url()
+        self._request_url = url
+        
+        body = self._render_body()
+        
+        # 提取path（去掉域名和context-path）
+        from urllib.parse import urlparse
+        parsed_url = urlparse(url)
+        path = parsed_url.path
+        # 去掉常见的context-path
+        path = re.sub(r'^/crex-java', '', path)
+        
+        # 准备请求信息供环境钩子使用
+        request_info = {
+            'method': self.api.method,
+            'url': url,
+            'path': path,
+            'body': body,
+            'api': self.api,
+            'testcase': self.testcase
+        }
+        
+        # 执行环境前置钩子（传入请求信息）
+        self._execute_environment_pre_hook(request_info)
+        
+        # 执行前置脚本
+        self._execute_pre_script()
+        
+        # 重新构建headers（因为环境钩子可能设置了签名变量）
+        headers = self._build_headers()
+        
+        # 方案A：优先级：用例覆盖 > 接口定义
+        if self.testcase.params_override:
+            params = render_field(self.testcase, 'params_override', self.scope)
+        else:
+            params = render_field(self.api, 'params', self.scope, {})
+        
+        body = self._render_body()
+        
+        auth = self._build_auth()
+        
+        # 准备请求数据
+        request_kwargs = {
+            'method': self.api.method,
+            'url': url,
+            'headers': headers,
+            'params': params,
+            'timeout': REQUEST_TIMEOUT,
+            'verify': False  # 禁用SSL验证（开发环境，生产环境建议启用）
+        }
+        
+        # 添加认证
+        if auth:
+            if isinstance(auth, tuple) and len(auth) == 2:
+                if auth[0] == 'Bearer':
+                    # Bearer Token: Authorization: Bearer <token>
+                    headers['Authorization'] = f'Bearer {auth[1]}'
+                elif auth[0] == 'Token':
+                    # Django REST Framework Token: Authorization: Token <token>
+                    headers['Authorization'] = f'Token {auth[1]}'
+                else:
+                    # Basic Auth 使用 HTTP 客户端的 auth 参数
+                    request_kwargs['auth'] = auth
+        
+        # 处理自定义 Header Token (auth_type='header')
+        if self.api.auth_type and self.api.auth_type.lower() == 'header':
+            auth_config = self.api.auth_config or {}
+            header_name = auth_config.get('header_name', 'Authorization')
+            token = auth_config.get('token', '')
+            if not token:
+                token = self.variables.get('token') or self.variables.get('access_token')
+            if token:
+                token = self._replace_variables(str(token))
+                token_format = auth_config.get('format', 'Bearer')  # 默认 Bearer 格式
+                headers[header_name] = f'{token_format} {token}' if token_format else token
+        
+        # 处理全局 Token 的 Header 类型（优先使用动态Token）
+        # 注意：全局Token的variables已在__init__中注入，这里只处理认证Header
+        if not self.api.auth_type or (self.api.auth_type and self.api.auth_type.lower() != 'header'):
+            global_token = self._get_global_token()
+            if global_token and global_token.auth_type == 'header':
+                # 【优化】优先使用动态Token
+                dynamic_token = self.variables.get('token')
+                global_token_static = self.variables.get('_global_token_static')
+                
+                if dynamic_token and dynamic_token != global_token_static:
+                    # 使用动态Token
+                    token_value = self._replace_variables(str(dynamic_token))
+                else:
+                    # 使用全局Token的静态值
+                    token_value = global_token.token
+                    token_value = self._replace_variables(token_value)
+                
+                token_format = global_token.token_format or 'Bearer'
+                header_name = global_token.header_name or 'Authorization'
+                headers[header_name] = f'{token_format} {token_value}' if token_format else token_value
+        
+        # 添加请求体
+        if self.api.method in ['POST', 'PUT', 'PATCH']:
+            if body:
+                request_kwargs['json'] = body
+        
+        return request_kwargs
+    
+    def _process_response(self, url: str, http_request_time_ms: float) -> None:
+        """处理响应：保存响应信息、提取变量、验证断言并执行后置脚本"""
+        # 保存响应信息（响应体超过 RESPONSE_PERSIST_MAX_BYTES 时只保存前缀、大小和摘要）
+        body_info = self.response.persisted_body()
+        self.execution_result.update({
+            'status_code': self.response.status_code,
+            'headers': dict(self.response.headers),
+            **body_info,
+            # 保存解析后的JSON对象（响应体被截断时不保存）
+            'json': None if body_info['body_truncated'] else self.response.json_data,
+            'time': round(http_request_time_ms, 2),  # 只记录HTTP请求的实际时间
+            'url': url
+        })
+        
+        # 从响应中提取变量
+        self._extract_variables()
+        
+        # 验证断言
+        assertions_result = self._validate_assertions()
+        
+        # 执行手动断言脚本
+        manual_assertions = self._execute_manual_assertions()
+        
+        # 合并所有断言结果
+        all_assertions = assertions_result + manual_assertions
+        self.execution_result['assertions'] = all_assertions
+        
+        # 判断是否通过（所有断言都通过且状态码为2xx）
+        all_assertions_passed = all(a['success'] for a in all_assertions) if all_assertions else True
+        status_code_ok = 200 <= self.response.status_code < 300
+        
+        self.execution_result['success'] = all_assertions_passed and status_code_ok
+        
+        # 执行后置脚本
+        self._execute_post_script()
+        
+        # 执行环境后置钩子
+        self._execute_environment_post_hook()
+        
+        # 将提取的变量保存到执行结果中，供后续测试用例使用
+        self.execution_result['extracted_variables'] = self.variables.copy()
+    
+    def _record_timeout(self, error: Exception) -> None:
+        """记录请求超时"""
+        self.execution_result['error'] = f'请求超时: {str(error)}'
+        # 超时情况无法获取准确时间，记录超时时间
+        self.execution_result['time'] = REQUEST_TIMEOUT * 1000
+        self.execution_result['url'] = self._request_url or '未知'
+    
+    def _record_connection_error(self, error: Exception) -> None:
+        """记录连接错误"""
+        error_msg = str(error)
+        # 提供更友好的错误信息
+        if 'SSLError' in error_msg or 'CERTIFICATE' in error_msg:
+            error_msg = 'SSL证书验证失败，请检查证书或禁用SSL验证'
+        elif 'Name or service not known' in error_msg:
+            error_msg = '无法解析域名，请检查URL是否正确'
+        else:
+            error_msg = f'连接错误: {error_msg}'
+        self.execution_result['error'] = error_msg
+        # 连接错误时无法获取准确时间，设为0
+        self.execution_result['time'] = 0
+        self.execution_result['url'] = self._request_url or '未知'
+    
+    def _record_request_error(self, error: Exception) -> None:
+        """记录其他请求异常"""
+        self.execution_result['error'] = f'请求异常: {str(error)}'
+        # 请求异常时无法获取准确时间，设为0
+        self.execution_result['time'] = 0
+        self.execution_result['url'] = self._request_url or '未知'
+    
+    def _record_execution_error(self, error: Exception) -> None:
+        """记录平台执行错误"""
+        import traceback
+        self.execution_result['error'] = f'执行错误: {str(error)}'
+        self.execution_result['traceback'] = traceback.format_exc()
+        # 其他异常时无法获取准确时间，设为0
+        self.execution_result['time'] = 0
+        self.execution_result['url'] = self._request_url or '未知'
     
     def execute(self) -> Dict[str, Any]:
         """执行测试用例"""
         try:
-            # 先构建基础请求参数（环境钩子可能需要这些信息）
-            url = self._build_url()
-            
-            # 方案A：优先级：用例覆盖 > 接口定义
-            if self.testcase.body_override:
-                body = self._replace_variables_in_dict(self.testcase.body_override)
-            else:
-                body = self._replace_variables_in_dict(self.api.body or {})
-            
-            # 提取path（去掉域名和context-path）
-            import re
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            path = parsed_url.path
-            # 去掉常见的context-path
-            path = re.sub(r'^/crex-java', '', path)
-            
-            # 准备请求信息供环境钩子使用
-            request_info = {
-                'method': self.api.method,
-                'url': url,
-                'path': path,
-                'body': body,
-                'api': self.api,
-                'testcase': self.testcase
-            }
-            
-            # 执行环境前置钩子（传入请求信息）
-            self._execute_environment_pre_hook(request_info)
-            
-            # 执行前置脚本
-            self._execute_pre_script()
-            
-            # 重新构建headers（因为环境钩子可能设置了签名变量）
-            headers = self._build_headers()
-            
-            # 方案A：优先级：用例覆盖 > 接口定义
-            if self.testcase.params_override:
-                params = self._replace_variables_in_dict(self.testcase.params_override)
-            else:
-                params = self._replace_variables_in_dict(self.api.params or {})
-            
-            if self.testcase.body_override:
-                body = self._replace_variables_in_dict(self.testcase.body_override)
-            else:
-                body = self._replace_variables_in_dict(self.api.body or {})
-            
-            auth = self._build_auth()
-            
-            # 准备请求数据
-            request_kwargs = {
-                'method': self.api.method,
-                'url': url,
-                'headers': headers,
-                'params': params,
-                'timeout': 30,
-                'verify': False  # 禁用SSL验证（开发环境，生产环境建议启用）
-            }
-            
-            # 添加认证
-            if auth:
-                if isinstance(auth, tuple) and len(auth) == 2:
-                    if auth[0] == 'Bearer':
-                        # Bearer Token: Authorization: Bearer <token>
-                        headers['Authorization'] = f'Bearer {auth[1]}'
-                    elif auth[0] == 'Token':
-                        # Django REST Framework Token: Authorization: Token <token>
-                        headers['Authorization'] = f'Token {auth[1]}'
-                    else:
-                        # Basic Auth 使用 requests 的 auth 参数
-                        request_kwargs['auth'] = auth
-            
-            # 处理自定义 Header Token (auth_type='header')
-            if self.api.auth_type and self.api.auth_type.lower() == 'header':
-                auth_config = self.api.auth_config or {}
-                header_name = auth_config.get('header_name', 'Authorization')
-                token = auth_config.get('token', '')
-                if not token:
-                    token = self.variables.get('token') or self.variables.get('access_token')
-                if token:
-                    token = self._replace_variables(str(token))
-                    token_format = auth_config.get('format', 'Bearer')  # 默认 Bearer 格式
-                    headers[header_name] = f'{token_format} {token}' if token_format else token
-            
-            # 处理全局 Token 的 Header 类型（优先使用动态Token）
-            # 注意：全局Token的variables已在__init__中注入，这里只处理认证Header
-            if not self.api.auth_type or (self.api.auth_type and self.api.auth_type.lower() != 'header'):
-                global_token = self._get_global_token()
-                if global_token and global_token.auth_type == 'header':
-                    # 【优化】优先使用动态Token
-                    dynamic_token = self.variables.get('token')
-                    global_token_static = self.variables.get('_global_token_static')
-                    
-                    if dynamic_token and dynamic_token != global_token_static:
-                        # 使用动态Token
-                        token_value = self._replace_variables(str(dynamic_token))
-                    else:
-                        # 使用全局Token的静态值
-                        token_value = global_token.token
-                        token_value = self._replace_variables(token_value)
-                    
-                    token_format = global_token.token_format or 'Bearer'
-                    header_name = global_token.header_name or 'Authorization'
-                    headers[header_name] = f'{token_format} {token_value}' if token_format else token_value
-            
-            # 添加请求体
-            if self.api.method in ['POST', 'PUT', 'PATCH']:
-                if body:
-                    request_kwargs['json'] = body
+            request_kwargs = self._prepare_request()
+            url = request_kwargs['url']
             
             # 发送请求（只计算HTTP请求的实际时间）
             # 使用Session来复用连接，减少连接建立时间
@@ -981,88 +765,130 @@ class TestCaseExecutor:
             # 但不包括：前置脚本、后置脚本、变量提取、断言验证等平台处理时间
             session = get_session()
             method = request_kwargs.pop('method')
-            self.response = session.request(method=method, **request_kwargs)
+            raw_response = session.request(method=method, stream=True, **request_kwargs)
             
             # 使用response.elapsed获取真实的HTTP请求时间（不包括平台处理时间）
             # response.elapsed是timedelta对象，表示从开始发送请求到收到响应的时间
             # 对于复用连接的情况，不包含连接建立时间，更准确地反映API响应时间
-            http_request_time_ms = self.response.elapsed.total_seconds() * 1000  # 转换为毫秒
+            http_request_time_ms = raw_response.elapsed.total_seconds() * 1000  # 转换为毫秒
             
-            # 保存响应信息
-            response_json = None
-            try:
-                # 尝试解析JSON响应
-                response_json = self.response.json()
-            except:
-                pass
-            
-            self.execution_result.update({
-                'status_code': self.response.status_code,
-                'headers': dict(self.response.headers),
-                'body': self._get_response_text(),
-                'json': response_json,  # 保存解析后的JSON对象
-                'time': round(http_request_time_ms, 2),  # 只记录HTTP请求的实际时间
-                'url': url
-            })
-            
-            # 从响应中提取变量
-            self._extract_variables()
-            
-            # 验证断言
-            assertions_result = self._validate_assertions()
-            
-            # 执行手动断言脚本
-            manual_assertions = self._execute_manual_assertions()
-            
-            # 合并所有断言结果
-            all_assertions = assertions_result + manual_assertions
-            self.execution_result['assertions'] = all_assertions
+            # 流式读取响应体（超过 RESPONSE_CAPTURE_MAX_BYTES 的部分不保留在内存中）
+            self.response = capture_response(raw_response)
             
-            # 判断是否通过（所有断言都通过且状态码为2xx）
-            all_assertions_passed = all(a['success'] for a in all_assertions) if all_assertions else True
-            status_code_ok = 200 <= self.response.status_code < 300
+            self._process_response(url, http_request_time_ms)
             
-            self.execution_result['success'] = all_assertions_passed and status_code_ok
+        except requests.exceptions.Timeout as e:
+            self._record_timeout(e)
+        except requests.exceptions.ConnectionError as e:
+            self._record_connection_error(e)
+        except requests.exceptions.RequestException as e:
+            self._record_request_error(e)
+        except Exception as e:
+            self._record_execution_error(e)
+        
+        return self.execution_result
+
+
+class AsyncTestCaseExecutor(TestCaseExecutor):
+    """
+    异步测试用例执行器（基于 httpx）
+    
+    与 TestCaseExecutor 共用变量替换、认证、断言和变量提取逻辑，只有发送请求的方式不同。
+    注意：执行器需要在事件循环之外创建（初始化时可能通过解析器查询全局Token），
+    execute() 在事件循环中只做HTTP请求和内存计算，不再访问数据库。
+    脚本在沙箱进程中同步执行（等待脚本进程返回），用例带脚本时请求前后的处理放到线程中执行，不阻塞事件循环。
+    """
+    
+    def _has_scripts(self) -> bool:
+        """是否需要执行脚本（前置/后置脚本、手动断言、环境钩子）"""
+        if self.testcase.pre_script or self.testcase.post_script:
+            return True
+        if self.environment and (self.environment.pre_hook or self.environment.post_hook):
+            return True
+        return any(a.get('type') in ['manual', 'script'] for a in (self.testcase.assertions or []))
+    
+    async def _run_blocking(self, func, *args):
+        """执行可能运行脚本的步骤：带脚本时在线程中执行"""
+        if self._has_scripts():
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+    
+    async def execute(self, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
+        """
+        异步执行测试用例
+        :param client: 共享的 httpx.AsyncClient（可选，未传入时临时创建）
+        """
+        if client is None:
+            async with create_async_client() as own_client:
+                return await self.execute(client=own_client)
+        
+        try:
+            request_kwargs = await self._run_blocking(self._prepare_request)
+            url = request_kwargs['url']
             
-            # 执行后置脚本
-            self._execute_post_script()
+            # httpx 的SSL验证在客户端级别配置
+            request_kwargs.pop('verify', None)
+            method = request_kwargs.pop('method')
+            # 流式读取响应体（超过 RESPONSE_CAPTURE_MAX_BYTES 的部分不保留在内存中）
+            async with client.stream(method=method, **request_kwargs) as raw_response:
+                self.response = await capture_async_response(raw_response)
             
-            # 执行环境后置钩子
-            self._execute_environment_post_hook()
+            # response.elapsed 表示从发送请求到读取完响应的时间（响应关闭后可用）
+            http_request_time_ms = raw_response.elapsed.total_seconds() * 1000  # 转换为毫秒
             
-            # 将提取的变量保存到执行结果中，供后续测试用例使用
-            self.execution_result['extracted_variables'] = self.variables.copy()
+            await self._run_blocking(self._process_response, url, http_request_time_ms)
             
-        except requests.exceptions.Timeout as e:
-            self.execution_result['error'] = f'请求超时: {str(e)}'
-            # 超时情况无法获取准确时间，记录超时时间（30秒）
-            self.execution_result['time'] = 30000  # 30秒超时
-            self.execution_result['url'] = url if 'url' in locals() else '未知'
-        except requests.exceptions.ConnectionError as e:
-            error_msg = str(e)
-            # 提供更友好的错误信息
-            if 'SSLError' in error_msg or 'CERTIFICATE' in error_msg:
-                error_msg = 'SSL证书验证失败，请检查证书或禁用SSL验证'
-            elif 'Name or service not known' in error_msg:
-                error_msg = '无法解析域名，请检查URL是否正确'
-            else:
-                error_msg = f'连接错误: {error_msg}'
-            self.execution_result['error'] = error_msg
-            # 连接错误时无法获取准确时间，设为0
-            self.execution_result['time'] = 0
-            self.execution_result['url'] = url if 'url' in locals() else '未知'
-        except requests.exceptions.RequestException as e:
-            self.execution_result['error'] = f'请求异常: {str(e)}'
-            # 请求异常时无法获取准确时间，设为0
-            self.execution_result['time'] = 0
-            self.execution_result['url'] = url if 'url' in locals() else '未知'
+        except httpx.TimeoutException as e:
+            self._record_timeout(e)
+        except httpx.NetworkError as e:
+            self._record_connection_error(e)
+        except httpx.HTTPError as e:
+            self._record_request_error(e)
         except Exception as e:
-            import traceback
-            self.execution_result['error'] = f'执行错误: {str(e)}'
-            self.execution_result['traceback'] = traceback.format_exc()
-            # 其他异常时无法获取准确时间，设为0
-            self.execution_result['time'] = 0
-            self.execution_result['url'] = url if 'url' in locals() else '未知'
+            self._record_execution_error(e)
         
         return self.execution_result
 
+
+def create_async_client() -> httpx.AsyncClient:
+    """创建异步HTTP客户端（连接池大小与异步并发数一致）"""
+    concurrency = get_async_concurrency()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(verify=False, limits=limits, timeout=REQUEST_TIMEOUT)
+
+
+def get_async_concurrency(concurrency: Optional[int] = None) -> int:
+    """获取异步执行的最大并发请求数"""
+    if concurrency:
+        return max(1, int(concurrency))
+    return max(1, int(getattr(settings, 'ASYNC_EXECUTION_CONCURRENCY', 100)))
+
+
+def is_async_execution_enabled() -> bool:
+    """是否启用异步执行模式（TESTCASE_EXECUTION_MODE=async）"""
+    return getattr(settings, 'TESTCASE_EXECUTION_MODE', 'sync') == 'async'
+
+
+def execute_concurrently(executors, concurrency: Optional[int] = None,
+                         on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> list:
+    """
+    在同一个事件循环中并发执行多个异步执行器
+    :param executors: AsyncTestCaseExecutor 列表（需在调用前创建好）
+    :param concurrency: 最大并发请求数（可选）
+    :param on_result: 每个执行器完成时回调 on_result(序号, 结果)（可选，通过 sync_to_async 依次调用，与调用方使用同一数据库连接）
+    :return: 执行结果列表，顺序与传入的执行器一致
+    """
+    callback = sync_to_async(on_result) if on_result is not None else None
+
+    async def _run():
+        semaphore = asyncio.Semaphore(get_async_concurrency(concurrency))
+        async with create_async_client() as client:
+            async def _execute(index, executor):
+                async with semaphore:
+                    result = await executor.execute(client=client)
+                if callback is not None:
+                    await callback(index, result)
+                return result
+            return await asyncio.gather(*(_execute(index, executor) for index, executor in enumerate(executors)))
+    
+    return asyncio.run(_run())
@@ -0,0 +1,199 @@
+"""
+响应时间直方图（HDR 风格的对数线性分桶，不依赖 Django）
+
+以微秒记录，小于 2^SUB_BUCKET_BITS 微秒的值精确计数，更大的值在每个 2 的幂区间内均分为
+2^(SUB_BUCKET_BITS-1) 个桶，相对误差不超过 1/2^(SUB_BUCKET_BITS-1)（约 0.8%）。
+桶编号只由数值决定，不同进程、不同运行的直方图可以直接按桶累加合并，合并后可计算任意百分位。
+
+编码格式（encode/decode，保存在性能测试结果中）：版本号、总数、总和、最小/最大值和非空桶（桶编号差分 + 计数），
+均为变长整数，zlib 压缩后 base64，一次运行的汇总直方图通常只有几百字节。
+"""
+import base64
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+# Locust 进程写出精确统计（apps.testcases.locust_histograms）的文件路径的环境变量
+HISTOGRAM_FILE_ENV = 'BENCHLINK_HISTOGRAM_FILE'
+
+ENCODING_VERSION = 1
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS  # 精确计数范围（微秒）
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1  # 每个 2 的幂区间的桶数
+
+
+def bucket_index(value: int) -> int:
+    """数值（微秒）所在的桶编号"""
+    if value < SUB_BUCKET_COUNT:
+        return max(0, value)
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def bucket_range(index: int):
+    """桶覆盖的数值范围 [lower, upper]（微秒）"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = index // SUB_BUCKET_HALF - 1
+    sub = index - shift * SUB_BUCKET_HALF
+    return sub << shift, ((sub + 1) << shift) - 1
+
+
+def bucket_value(index: int) -> int:
+    """桶的代表值（区间中点，微秒）"""
+    lower, upper = bucket_range(index)
+    return (lower + upper) // 2
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            buffer.append(byte | 0x80)
+        else:
+            buffer.append(byte)
+            return
+
+
+def _read_varints(data: bytes) -> List[int]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+class LatencyHistogram:
+    """响应时间直方图（记录毫秒，内部按微秒分桶）"""
+
+    __slots__ = ('counts', 'count', 'total_us', 'min_us', 'max_us')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us: Optional[int] = None
+
+    def record(self, value_ms: float, count: int = 1) -> None:
+        value = max(0, int(round(value_ms * 1000)))
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total_us += value * count
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if self.max_us is None or value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """合并另一个直方图（就地修改并返回自身）"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        if other.max_us is not None and (self.max_us is None or other.max_us > self.max_us):
+            self.max_us = other.max_us
+        return self
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """百分位响应时间（毫秒），没有数据时返回 None"""
+        if not self.count:
+            return None
+        if percent >= 100:
+            return self.max_us / 1000
+        rank = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # 代表值限制在实际最小/最大值范围内
+                value = min(max(bucket_value(index), self.min_us), self.max_us)
+                return value / 1000
+        return self.max_us / 1000
+
+    def percentiles(self, percents: Iterable[float]) -> Dict[str, Optional[float]]:
+        return {f'p{percent:g}': self.percentile(percent) for percent in percents}
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total_us / self.count / 1000 if self.count else None
+
+    @property
+    def min(self) -> Optional[float]:
+        return self.min_us / 1000 if self.min_us is not None else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self.max_us / 1000 if self.max_us is not None else None
+
+    def encode(self) -> str:
+        """紧凑编码（可用 decode 还原，不同编码可以解码后合并）"""
+        buffer = bytearray()
+        for value in (ENCODING_VERSION, self.count, self.total_us,
+                      0 if self.min_us is None else self.min_us + 1,
+                      0 if self.max_us is None else self.max_us + 1,
+                      len(self.counts)):
+            _write_varint(buffer, value)
+        previous = -1
+        for index in sorted(self.counts):
+            _write_varint(buffer, index - previous - 1)
+            _write_varint(buffer, self.counts[index])
+            previous = index
+        return base64.b64encode(zlib.compress(bytes(buffer))).decode('ascii')
+
+    @classmethod
+    def decode(cls, encoded: Optional[str]) -> 'LatencyHistogram':
+        """还原 encode 的结果（空值返回空直方图）"""
+        histogram = cls()
+        if not encoded:
+            return histogram
+        values = _read_varints(zlib.decompress(base64.b64decode(encoded)))
+        version, histogram.count, histogram.total_us, min_us, max_us, buckets = values[:6]
+        if version != ENCODING_VERSION:
+            raise ValueError(f'不支持的直方图编码版本: {version}')
+        histogram.min_us = min_us - 1 if min_us else None
+        histogram.max_us = max_us - 1 if max_us else None
+        index = -1
+        for position in range(buckets):
+            index += values[6 + position * 2] + 1
+            histogram.counts[index] = values[7 + position * 2]
+        return histogram
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+            'counts': {str(index): count for index, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> 'LatencyHistogram':
+        histogram = cls()
+        if not data:
+            return histogram
+        histogram.counts = {int(index): count for index, count in (data.get('counts') or {}).items()}
+        histogram.count = data.get('count') or sum(histogram.counts.values())
+        histogram.total_us = data.get('total_us') or 0
+        histogram.min_us = data.get('min_us')
+        histogram.max_us = data.get('max_us')
+        return histogram
+
+
+def merge_encoded(encoded_list: Iterable[Optional[str]]) -> LatencyHistogram:
+    """合并多个编码后的直方图（如多个 worker、多次运行）"""
+    merged = LatencyHistogram()
+    for encoded in encoded_list:
+        if encoded:
+            merged.merge(LatencyHistogram.decode(encoded))
+    return merged
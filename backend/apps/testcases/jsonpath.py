@@ -0,0 +1,390 @@
+"""
+JSONPath 表达式编译与求值
+
+用于变量提取（extractors）和 json_path/equals 断言。表达式编译为路径对象并按表达式字符串缓存，
+同一路径在大量参数化响应上求值时只做树遍历，不再重复解析表达式。
+
+支持的语法：
+    $                 根节点（可省略，兼容旧写法 data.token、[0].id）
+    .name / ['name']  子节点（点号写法中的数字在数组上按下标处理，兼容旧写法 items.0.id）
+    [0] / [-1]        数组下标
+    [0,2] / ['a','b'] 多个下标或字段
+    [start:end:step]  数组切片
+    * / [*]           所有子节点
+    ..name / ..*      递归查找
+    [?(@.price < 10)] 过滤（支持 == != < <= > >= =~ /正则/、&& || !、括号和存在性判断 [?(@.isbn)]）
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Tuple
+
+
+class JSONPathError(ValueError):
+    """JSONPath 表达式语法错误"""
+
+
+# 求值时表示“未找到”（与 JSON 中的 null 区分）
+_MISSING = object()
+
+# 点号写法中的字段名（主路径中只以 . [ 分隔，兼容包含特殊字符的字段名）
+_NAME_RE = re.compile(r'[^.\[\]]+')
+# 过滤表达式中的字段名（遇到运算符、空白和括号时结束）
+_FILTER_NAME_RE = re.compile(r'[\w\-]+')
+_NUMBER_RE = re.compile(r'-?\d+(\.\d+)?([eE][+-]?\d+)?')
+_INT_RE = re.compile(r'-?\d+')
+_SELECTOR_RE = re.compile(r'(-?\d*)\s*(:\s*(-?\d*)\s*(:\s*(-?\d*))?)?')
+_OPERATORS = ('==', '!=', '<=', '>=', '=~', '<', '>')
+
+
+class _Step:
+    """路径中的一步：选择器 + 是否递归"""
+    __slots__ = ('kind', 'arg', 'recursive')
+
+    def __init__(self, kind: str, arg: Any = None, recursive: bool = False):
+        self.kind = kind  # name / index / wildcard / slice / union / filter
+        self.arg = arg
+        self.recursive = recursive
+
+    @property
+    def definite(self) -> bool:
+        """是否最多只匹配一个节点"""
+        return not self.recursive and self.kind in ('name', 'index')
+
+
+def _children(node) -> List[Any]:
+    if isinstance(node, dict):
+        return list(node.values())
+    if isinstance(node, list):
+        return node
+    return []
+
+
+def _descendants(node, out: List[Any]) -> None:
+    """node 本身及所有后代节点（先序）"""
+    out.append(node)
+    for child in _children(node):
+        if isinstance(child, (dict, list)):
+            _descendants(child, out)
+
+
+def _select(step: _Step, node, out: List[Any]) -> None:
+    """对单个节点应用选择器"""
+    kind, arg = step.kind, step.arg
+    if kind == 'name':
+        if isinstance(node, dict):
+            if arg in node:
+                out.append(node[arg])
+        elif isinstance(node, list) and _INT_RE.fullmatch(arg):
+            _select_index(node, int(arg), out)
+    elif kind == 'index':
+        if isinstance(node, list):
+            _select_index(node, arg, out)
+    elif kind == 'wildcard':
+        out.extend(_children(node))
+    elif kind == 'slice':
+        if isinstance(node, list):
+            out.extend(node[slice(*arg)])
+    elif kind == 'union':
+        for selector in arg:
+            _select(selector, node, out)
+    elif kind == 'filter':
+        out.extend(child for child in _children(node) if arg(child))
+
+
+def _select_index(node: list, index: int, out: List[Any]) -> None:
+    if -len(node) <= index < len(node):
+        out.append(node[index])
+
+
+def _evaluate(steps: Tuple[_Step, ...], root) -> List[Any]:
+    nodes = [root]
+    for step in steps:
+        matched: List[Any] = []
+        for node in nodes:
+            if step.recursive:
+                candidates: List[Any] = []
+                _descendants(node, candidates)
+                for candidate in candidates:
+                    _select(step, candidate, matched)
+            else:
+                _select(step, node, matched)
+        if not matched:
+            return []
+        nodes = matched
+    return nodes
+
+
+class JSONPath:
+    """编译后的 JSONPath 表达式"""
+
+    def __init__(self, expression: str, steps: Tuple[_Step, ...]):
+        self.expression = expression
+        self.steps = steps
+        # 只包含字段名和下标时结果唯一，求值返回单个值；否则返回所有匹配值的列表
+        self.definite = all(step.definite for step in steps)
+
+    def find(self, data) -> List[Any]:
+        """返回所有匹配的值"""
+        return _evaluate(self.steps, data)
+
+    def value(self, data, default=None) -> Any:
+        """
+        求值：确定路径返回匹配的值（未找到时返回 default），
+        包含通配符、切片、过滤或递归的路径返回匹配值列表（没有匹配时返回 default）
+        """
+        matches = _evaluate(self.steps, data)
+        if not matches:
+            return default
+        return matches[0] if self.definite else matches
+
+    def __repr__(self):
+        return f'JSONPath({self.expression!r})'
+
+
+class _Parser:
+    """JSONPath 表达式解析器"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message: str) -> JSONPathError:
+        return JSONPathError(f'JSONPath 语法错误（位置 {self.pos}）: {message}: {self.text}')
+
+    def peek(self, token: str) -> bool:
+        return self.text.startswith(token, self.pos)
+
+    def skip_spaces(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def expect(self, token: str) -> None:
+        self.skip_spaces()
+        if not self.peek(token):
+            raise self.error(f'缺少 {token!r}')
+        self.pos += len(token)
+
+    # 路径
+
+    def parse_path(self, in_filter: bool = False) -> Tuple[_Step, ...]:
+        steps = []
+        name_re = _FILTER_NAME_RE if in_filter else _NAME_RE
+        # 省略 $ 的旧写法：第一个字段名前没有点号
+        if not in_filter and self.pos < len(self.text) and self.text[self.pos] not in '.[':
+            steps.append(self.parse_dot_member(name_re))
+        while self.pos < len(self.text):
+            if self.peek('..'):
+                self.pos += 2
+                if self.peek('['):
+                    step = self.parse_bracket()
+                else:
+                    step = self.parse_dot_member(name_re)
+                step.recursive = True
+                steps.append(step)
+            elif self.peek('.'):
+                self.pos += 1
+                steps.append(self.parse_dot_member(name_re))
+            elif self.peek('['):
+                steps.append(self.parse_bracket())
+            elif in_filter:
+                break
+            else:
+                raise self.error('无法识别的字符')
+        return tuple(steps)
+
+    def parse_dot_member(self, name_re) -> _Step:
+        if self.peek('*'):
+            self.pos += 1
+            return _Step('wildcard')
+        match = name_re.match(self.text, self.pos)
+        if not match:
+            raise self.error('缺少字段名')
+        self.pos = match.end()
+        return _Step('name', match.group().strip())
+
+    def parse_bracket(self) -> _Step:
+        self.expect('[')
+        self.skip_spaces()
+        if self.peek('?'):
+            self.pos += 1
+            self.skip_spaces()
+            predicate = self.parse_expression()
+            self.expect(']')
+            return _Step('filter', predicate)
+        selectors = [self.parse_selector()]
+        self.skip_spaces()
+        while self.peek(','):
+            self.pos += 1
+            selectors.append(self.parse_selector())
+            self.skip_spaces()
+        self.expect(']')
+        return selectors[0] if len(selectors) == 1 else _Step('union', selectors)
+
+    def parse_selector(self) -> _Step:
+        self.skip_spaces()
+        if self.peek('*'):
+            self.pos += 1
+            return _Step('wildcard')
+        if self.peek("'") or self.peek('"'):
+            return _Step('name', self.parse_string())
+        match = _SELECTOR_RE.match(self.text, self.pos)
+        if not match or not match.group():
+            raise self.error('无效的下标')
+        self.pos = match.end()
+        start, has_slice, end, _, step = match.groups()
+        if has_slice is None:
+            return _Step('index', int(start))
+        as_int = lambda value: int(value) if value else None
+        if step == '0':
+            raise self.error('切片步长不能为0')
+        return _Step('slice', (as_int(start), as_int(end), as_int(step)))
+
+    def parse_string(self) -> str:
+        quote = self.text[self.pos]
+        self.pos += 1
+        chars = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == '\\' and self.pos + 1 < len(self.text):
+                chars.append(self.text[self.pos + 1])
+                self.pos += 2
+                continue
+            if char == quote:
+                self.pos += 1
+                return ''.join(chars)
+            chars.append(char)
+            self.pos += 1
+        raise self.error('字符串未结束')
+
+    # 过滤表达式
+
+    def parse_expression(self) -> Callable[[Any], bool]:
+        left = self.parse_and()
+        self.skip_spaces()
+        while self.peek('||'):
+            self.pos += 2
+            right = self.parse_and()
+            left = (lambda l, r: lambda node: l(node) or r(node))(left, right)
+            self.skip_spaces()
+        return left
+
+    def parse_and(self) -> Callable[[Any], bool]:
+        left = self.parse_not()
+        self.skip_spaces()
+        while self.peek('&&'):
+            self.pos += 2
+            right = self.parse_not()
+            left = (lambda l, r: lambda node: l(node) and r(node))(left, right)
+            self.skip_spaces()
+        return left
+
+    def parse_not(self) -> Callable[[Any], bool]:
+        self.skip_spaces()
+        if self.peek('!') and not self.peek('!='):
+            self.pos += 1
+            inner = self.parse_not()
+            return lambda node: not inner(node)
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> Callable[[Any], bool]:
+        self.skip_spaces()
+        if self.peek('('):
+            self.pos += 1
+            inner = self.parse_expression()
+            self.expect(')')
+            return inner
+        left = self.parse_operand()
+        self.skip_spaces()
+        operator = next((op for op in _OPERATORS if self.peek(op)), None)
+        if operator is None:
+            # 存在性判断
+            return lambda node: _truthy(left(node))
+        self.pos += len(operator)
+        self.skip_spaces()
+        if operator == '=~':
+            pattern = self.parse_regex()
+            return lambda node: isinstance(left(node), str) and pattern.search(left(node)) is not None
+        right = self.parse_operand()
+        compare = _COMPARATORS[operator]
+        return lambda node: _compare(compare, left(node), right(node))
+
+    def parse_operand(self) -> Callable[[Any], Any]:
+        self.skip_spaces()
+        if self.peek('@'):
+            self.pos += 1
+            path = JSONPath('@', self.parse_path(in_filter=True))
+            return lambda node: path.value(node, _MISSING)
+        if self.peek("'") or self.peek('"'):
+            value = self.parse_string()
+            return lambda node: value
+        for literal, value in (('true', True), ('false', False), ('null', None)):
+            if self.peek(literal):
+                self.pos += len(literal)
+                return lambda node, value=value: value
+        match = _NUMBER_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = float(match.group()) if match.group(1) or match.group(2) else int(match.group())
+            return lambda node: number
+        raise self.error('无效的过滤表达式')
+
+    def parse_regex(self) -> 're.Pattern':
+        if not self.peek('/'):
+            raise self.error('正则表达式需写为 /pattern/flags')
+        end = self.pos + 1
+        while end < len(self.text) and self.text[end] != '/':
+            end += 2 if self.text[end] == '\\' else 1
+        if end >= len(self.text):
+            raise self.error('正则表达式未结束')
+        pattern = self.text[self.pos + 1:end]
+        self.pos = end + 1
+        flags = 0
+        while self.pos < len(self.text) and self.text[self.pos] in 'imsx':
+            flags |= {'i': re.I, 'm': re.M, 's': re.S, 'x': re.X}[self.text[self.pos]]
+            self.pos += 1
+        try:
+            return re.compile(pattern, flags)
+        except re.error as e:
+            raise self.error(f'正则表达式无效（{e}）')
+
+
+def _truthy(value) -> bool:
+    return value is not _MISSING and value is not None and value is not False
+
+
+_COMPARATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def _compare(compare, left, right) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return False
+    # 布尔值不与数字比较（True == 1 在 Python 中成立）
+    if isinstance(left, bool) != isinstance(right, bool):
+        return False
+    try:
+        return bool(compare(left, right))
+    except TypeError:
+        return False
+
+
+@lru_cache(maxsize=2048)
+def compile_path(expression: str) -> JSONPath:
+    """编译 JSONPath 表达式（按表达式字符串缓存）"""
+    text = (expression or '').strip()
+    parser = _Parser(text)
+    if text.startswith('$'):
+        parser.pos = 1
+    steps = parser.parse_path()
+    return JSONPath(text, steps)
+
+
+def query(data, expression: str, default=None) -> Any:
+    """按 JSONPath 表达式取值（见 JSONPath.value）"""
+    return compile_path(expression).value(data, default)
@@ -0,0 +1,121 @@
+"""
+性能测试实时指标
+
+Locust 运行期间每秒向 <csv_prefix>_stats_history.csv 追加一行统计（--csv-full-history 时还包含每个请求名称的行）。
+这里按文件偏移增量读取新增的汇总行（Aggregated），解析为实时数据点，
+每次运行只在内存中保留最近 PERF_LIVE_BUFFER_SIZE 个数据点，同时跟踪的运行数不超过 PERF_LIVE_MAX_RUNS。
+读取只依赖结果文件，执行任务在 Celery worker 还是本地队列中运行都可以使用。
+"""
+import csv
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+
+
+def _buffer_size() -> int:
+    return getattr(settings, 'PERF_LIVE_BUFFER_SIZE', 900)
+
+
+def _max_runs() -> int:
+    return getattr(settings, 'PERF_LIVE_MAX_RUNS', 32)
+
+
+def _number(value: Optional[str], cast=float):
+    """解析统计值（Locust 没有数据时输出 N/A）"""
+    if value in (None, '', 'N/A'):
+        return None
+    try:
+        return cast(float(value))
+    except ValueError:
+        return None
+
+
+def parse_history_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """将 stats_history.csv 的一行转换为数据点（百分位为最近一个统计窗口内的响应时间）"""
+    return {
+        'timestamp': _number(row.get('Timestamp'), int),
+        'users': _number(row.get('User Count'), int) or 0,
+        'rps': _number(row.get('Requests/s')) or 0,
+        'failures_per_sec': _number(row.get('Failures/s')) or 0,
+        'p50': _number(row.get('50%')),
+        'p90': _number(row.get('90%')),
+        'p95': _number(row.get('95%')),
+        'p99': _number(row.get('99%')),
+        'max': _number(row.get('100%')),
+        'total_requests': _number(row.get('Total Request Count'), int) or 0,
+        'total_failures': _number(row.get('Total Failure Count'), int) or 0,
+        'avg_response_time': _number(row.get('Total Average Response Time')),
+    }
+
+
+def is_aggregated(row: Dict[str, str]) -> bool:
+    return (row.get('Name') or '').strip() == 'Aggregated' or not (row.get('Type') or '').strip()
+
+
+class LiveMetrics:
+    """单次运行的实时数据（增量读取 stats_history.csv，只保留最近的数据点）"""
+
+    def __init__(self, history_file: Path, maxlen: Optional[int] = None):
+        self.history_file = Path(history_file)
+        self.points = deque(maxlen=maxlen or _buffer_size())
+        self._offset = 0
+        self._header = None
+        self._partial = b''
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """读取上次读取之后追加的行"""
+        with self._lock:
+            try:
+                with open(self.history_file, 'rb') as f:
+                    f.seek(self._offset)
+                    data = f.read()
+                    self._offset = f.tell()
+            except FileNotFoundError:
+                return
+            if not data:
+                return
+            lines = (self._partial + data).split(b'\n')
+            # 最后一段可能是尚未写完的行，留到下次读取
+            self._partial = lines.pop()
+            lines = [line.decode('utf-8', errors='replace') for line in lines if line.strip()]
+            if not lines:
+                return
+            if self._header is None:
+                self._header = next(csv.reader([lines.pop(0)]))
+            for values in csv.reader(lines):
+                row = dict(zip(self._header, values))
+                if is_aggregated(row):
+                    self.points.append(parse_history_row(row))
+
+    def since(self, timestamp: Optional[int] = None) -> List[Dict[str, Any]]:
+        """时间戳（秒）之后的数据点"""
+        with self._lock:
+            if timestamp is None:
+                return list(self.points)
+            return [point for point in self.points if (point['timestamp'] or 0) > timestamp]
+
+    @property
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.points[-1] if self.points else None
+
+
+_runs: 'OrderedDict[str, LiveMetrics]' = OrderedDict()
+_runs_lock = threading.Lock()
+
+
+def get_live_metrics(csv_prefix: str) -> LiveMetrics:
+    """获取运行的实时数据（按结果文件前缀复用，超过上限时淘汰最久未访问的运行）"""
+    with _runs_lock:
+        metrics = _runs.get(csv_prefix)
+        if metrics is None:
+            metrics = LiveMetrics(Path(f'{csv_prefix}_stats_history.csv'))
+            _runs[csv_prefix] = metrics
+        _runs.move_to_end(csv_prefix)
+        while len(_runs) > _max_runs():
+            _runs.popitem(last=False)
+    metrics.refresh()
+    return metrics
@@ -0,0 +1,149 @@
+"""
+性能测试负载模型
+
+PerformanceTest.load_profile 描述施压方式，生成 locustfile 时转换为 LoadTestShape 的阶段表和虚拟用户的 wait_time：
+- closed（默认）：固定并发用户数，请求之间不等待（threads/ramp_up/duration 参数）
+- constant_arrival：恒定到达率，rate 为每秒迭代次数（套件场景为每秒完整执行的场景次数），
+  users 个虚拟用户平分速率（constant_throughput），users 需足够大以覆盖响应时间
+- step：阶梯加压，从 start_users 开始每 step_duration 秒增加 step_users，共 steps 级
+- spike：尖峰，base_users 运行 base_duration 秒后突增到 spike_users 持续 spike_duration 秒，再恢复 recovery_duration 秒
+- stages：自定义阶段表 [{"duration": 秒, "users": 用户数, "spawn_rate": 启动速率}]
+除 constant_arrival 外，均可通过 rate_per_user 限定每个虚拟用户每秒的迭代次数（到达率随用户数变化）
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_TYPES = ('closed', 'constant_arrival', 'step', 'spike', 'stages')
+
+# 阶段：(结束时间（秒，从开始计算）, 用户数, 启动速率（每秒启动的用户数）)
+Stage = Tuple[int, int, float]
+
+
+def _int(profile: Dict[str, Any], key: str, default: Optional[int] = None, minimum: int = 0) -> int:
+    value = profile.get(key, default)
+    if value is None:
+        raise ValueError(f'负载模型缺少参数 {key}')
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'负载模型参数 {key} 必须是整数')
+    if value < minimum:
+        raise ValueError(f'负载模型参数 {key} 不能小于 {minimum}')
+    return value
+
+
+def _rate(profile: Dict[str, Any], key: str) -> Optional[float]:
+    value = profile.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'负载模型参数 {key} 必须是数字')
+    if value <= 0:
+        raise ValueError(f'负载模型参数 {key} 必须大于 0')
+    return value
+
+
+def _spawn_rate(users: int, ramp_up: int) -> float:
+    """与固定并发模式一致：ramp_up 秒内启动全部用户"""
+    return max(1, int(users / ramp_up)) if ramp_up > 0 else max(1, users)
+
+
+def profile_type(profile: Optional[Dict[str, Any]]) -> str:
+    profile_type = (profile or {}).get('type') or 'closed'
+    if profile_type not in PROFILE_TYPES:
+        raise ValueError(f"不支持的负载模型: {profile_type}（可选: {', '.join(PROFILE_TYPES)}）")
+    return profile_type
+
+
+def build_stages(profile: Optional[Dict[str, Any]], threads: int, ramp_up: int, duration: int) -> Optional[List[Stage]]:
+    """
+    生成 LoadTestShape 的阶段表，closed 模式返回 None（使用 --users/--spawn-rate/--run-time）
+    配置错误时抛出 ValueError
+    """
+    profile = profile or {}
+    kind = profile_type(profile)
+    if kind == 'closed':
+        return None
+
+    if kind == 'constant_arrival':
+        users = _int(profile, 'users', threads, minimum=1)
+        run_time = _int(profile, 'duration', duration, minimum=1)
+        if _rate(profile, 'rate') is None:
+            raise ValueError('负载模型缺少参数 rate')
+        return [(run_time, users, _spawn_rate(users, ramp_up))]
+
+    if kind == 'step':
+        step_users = _int(profile, 'step_users', minimum=1)
+        start_users = _int(profile, 'start_users', step_users, minimum=1)
+        step_duration = _int(profile, 'step_duration', minimum=1)
+        steps = _int(profile, 'steps', minimum=1)
+        spawn_rate = _rate(profile, 'spawn_rate') or float(step_users)
+        return [
+            ((index + 1) * step_duration, start_users + index * step_users, spawn_rate)
+            for index in range(steps)
+        ]
+
+    if kind == 'spike':
+        base_users = _int(profile, 'base_users', minimum=1)
+        spike_users = _int(profile, 'spike_users', minimum=1)
+        base_duration = _int(profile, 'base_duration', minimum=1)
+        spike_duration = _int(profile, 'spike_duration', minimum=1)
+        recovery_duration = _int(profile, 'recovery_duration', base_duration, minimum=0)
+        spawn_rate = _rate(profile, 'spawn_rate') or float(_spawn_rate(base_users, ramp_up))
+        # 尖峰阶段默认在 1 秒内启动全部新增用户
+        spike_spawn_rate = _rate(profile, 'spike_spawn_rate') or float(max(1, spike_users - base_users))
+        stages = [
+            (base_duration, base_users, spawn_rate),
+            (base_duration + spike_duration, spike_users, spike_spawn_rate),
+        ]
+        if recovery_duration:
+            stages.append((base_duration + spike_duration + recovery_duration, base_users, spike_spawn_rate))
+        return stages
+
+    rows = profile.get('stages') or []
+    if not isinstance(rows, list) or not rows:
+        raise ValueError('stages 负载模型需要至少一个阶段')
+    stages = []
+    end = 0
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError('阶段必须是对象')
+        end += _int(row, 'duration', minimum=1)
+        users = _int(row, 'users', minimum=0)
+        stages.append((end, users, _rate(row, 'spawn_rate') or float(max(1, users))))
+    return stages
+
+
+def per_user_rate(profile: Optional[Dict[str, Any]], threads: int) -> Optional[float]:
+    """每个虚拟用户每秒的迭代次数（constant_throughput），None 表示不限速"""
+    profile = profile or {}
+    if profile_type(profile) == 'constant_arrival':
+        users = _int(profile, 'users', threads, minimum=1)
+        return _rate(profile, 'rate') / users
+    return _rate(profile, 'rate_per_user')
+
+
+def validate_profile(profile: Optional[Dict[str, Any]], threads: int = 1) -> None:
+    """校验负载模型配置，错误时抛出 ValueError"""
+    build_stages(profile, threads, 0, 1)
+    per_user_rate(profile, threads)
+
+
+def shape_code(stages: List[Stage]) -> str:
+    """生成 LoadTestShape 代码（阶段表结束后返回 None，Locust 停止运行）"""
+    rows = ''.join(f'        ({end}, {users}, {spawn_rate!r}),\n' for end, users, spawn_rate in stages)
+    return f"""
+
+class BenchLinkLoadShape(LoadTestShape):
+    # (结束时间（秒）, 用户数, 启动速率)
+    stages = [
+{rows}    ]
+
+    def tick(self):
+        run_time = self.get_run_time()
+        for end, users, spawn_rate in self.stages:
+            if run_time < end:
+                return users, spawn_rate
+        return None
+"""
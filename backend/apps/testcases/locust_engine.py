@@ -0,0 +1,124 @@
+"""
+内嵌 Locust 引擎（在独立进程中通过 Locust 的 Python API 运行，不依赖 Django）
+
+    python -m apps.testcases.locust_engine <config.json>
+
+Locust 依赖 gevent monkey patch，不能在 Django/Celery 进程内运行，因此由 LocustExecutor 启动独立进程。
+与 locust 命令行相比：
+- 不解析 CSV：请求事件由 apps.testcases.locust_histograms 记录到响应时间直方图，百分位是精确值（误差 < 1%），
+  同时统计每个请求名称的状态码分布和错误样例
+- 结果以 JSON 写入 config['result_file']
+仍会写出 stats_history.csv（实时指标和时间序列使用）和 HTML 报告。
+
+配置项：locustfile, host, users, spawn_rate, run_time（秒，0 表示不限制）, csv_prefix, html_report, result_file, log_file
+"""
+# locust 导入时执行 gevent monkey patch，必须最先导入
+import locust  # noqa: F401
+
+import importlib.util
+import inspect
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict
+
+import gevent
+from locust import LoadTestShape, User
+from locust.env import Environment
+from locust.runners import STATE_CLEANUP, STATE_STOPPED
+from locust.stats import PERCENTILES_TO_REPORT, StatsCSVFileWriter, stats_history
+
+from .locust_histograms import collector
+
+logger = logging.getLogger('apps.testcases.locust_engine')
+
+
+def _load_locustfile(path: str):
+    """加载 locustfile，返回 (虚拟用户类列表, 负载模型实例)"""
+    spec = importlib.util.spec_from_file_location('benchlink_locustfile', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    user_classes = [
+        value for value in vars(module).values()
+        if inspect.isclass(value) and issubclass(value, User) and not getattr(value, 'abstract', False)
+    ]
+    shape_classes = [
+        value for value in vars(module).values()
+        if inspect.isclass(value) and issubclass(value, LoadTestShape) and value.__module__ == module.__name__
+    ]
+    return user_classes, (shape_classes[0]() if shape_classes else None)
+
+
+def _write_html_report(environment, path: str) -> None:
+    try:
+        from locust.html import get_html_report
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(get_html_report(environment, show_download_link=False))
+    except Exception as e:
+        logger.warning(f'生成HTML报告失败: {e}')
+
+
+def run(config: Dict[str, Any]) -> Dict[str, Any]:
+    user_classes, shape = _load_locustfile(config['locustfile'])
+    if not user_classes:
+        raise ValueError('locustfile 中没有虚拟用户类')
+
+    # 使用全局事件对象，locust_histograms 注册的监听器才会收到请求事件
+    environment = Environment(
+        user_classes=user_classes, shape_class=shape, host=config.get('host') or None, events=locust.events,
+    )
+    runner = environment.create_local_runner()
+
+    # 每秒统计写入 stats_history.csv（与命令行 --csv --csv-full-history 相同的文件）
+    csv_writer = StatsCSVFileWriter(environment, PERCENTILES_TO_REPORT, config['csv_prefix'], full_history=True)
+    background = [gevent.spawn(stats_history, runner), gevent.spawn(csv_writer)]
+
+    # runner.start/start_shape 会触发 test_start 事件，runner.quit 会触发 test_stop 事件
+    if shape is not None:
+        runner.start_shape()
+    else:
+        runner.start(config['users'], spawn_rate=config['spawn_rate'])
+
+    started = time.monotonic()
+    run_time = config.get('run_time') or 0
+    # 负载模型结束或按循环次数执行完成时，runner 会停止（STATE_CLEANUP -> STATE_STOPPED）
+    while runner.state not in (STATE_STOPPED, STATE_CLEANUP):
+        if run_time and time.monotonic() - started >= run_time:
+            break
+        gevent.sleep(0.5)
+
+    runner.quit()
+    for greenlet in background:
+        greenlet.kill()
+    csv_writer.close_files()
+
+    if config.get('html_report'):
+        _write_html_report(environment, config['html_report'])
+    metrics = collector.metrics()
+    # 时间窗口为空时使用 Locust 自己的吞吐量
+    metrics.setdefault('throughput', environment.stats.total.total_rps)
+    return metrics
+
+
+def main() -> int:
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    logging.basicConfig(
+        filename=config.get('log_file'),
+        level=logging.INFO,
+        format='[%(asctime)s] %(levelname)s/%(name)s: %(message)s',
+    )
+    try:
+        metrics = run(config)
+        result = {'success': True, 'metrics': metrics}
+    except Exception as e:
+        logger.exception(f'内嵌 Locust 引擎执行失败: {e}')
+        result = {'success': False, 'error': str(e)}
+    with open(config['result_file'], 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    return 0 if result['success'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
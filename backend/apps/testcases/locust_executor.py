@@ -4,12 +4,19 @@
 import os
 import json
 import time
+import pprint
+import sys
+import socket
 import subprocess
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from django.utils import timezone
 import logging
+from apps.environments.tokens import GlobalTokenResolver
+from .histogram import HISTOGRAM_FILE_ENV
+from .load_profiles import build_stages, per_user_rate, shape_code
+from .templating import TrackedDict, VariableScope, compile_template, render, render_field
 
 logger = logging.getLogger(__name__)
 
@@ -24,43 +31,42 @@ class LocustExecutor:
         """
         self.performance_test = performance_test
         self.api = performance_test.api
-        self.environment = performance_test.environment
-        self.variables = {}
+        # 套件场景压测（设置了套件时忽略 api）
+        self.testsuite = performance_test.testsuite
+        self.environment = performance_test.environment or (self.testsuite.environment if self.testsuite else None)
+        self.variables = TrackedDict()
+        self._scope = None
+        self._scenario = None
+        self._stages = False  # 未计算
+        self.token_resolver = GlobalTokenResolver()
         
         # 工作目录
         self.work_dir = Path(settings.BASE_DIR) / 'logs' / 'locust'
         self.work_dir.mkdir(parents=True, exist_ok=True)
     
+    @property
+    def scope(self) -> VariableScope:
+        """变量作用域：运行时变量 < 环境变量"""
+        if self._scope is None:
+            self._scope = VariableScope(
+                self.variables,
+                (self.environment.variables or {}) if self.environment else {}
+            )
+        return self._scope
+    
     def _replace_variables(self, text: str) -> str:
         """替换变量 ${variable}"""
         if not text or not isinstance(text, str):
             return text
-        
-        vars_dict = self.variables.copy()
-        if self.environment and self.environment.variables:
-            vars_dict.update(self.environment.variables)
-        
-        import re
-        def replace_match(match):
-            var_name = match.group(1)
-            return str(vars_dict.get(var_name, match.group(0)))
-        
-        return re.sub(r'\$\{(\w+)\}', replace_match, text)
+        return compile_template(text).render(self.scope)
     
     def _replace_variables_in_dict(self, data: Any) -> Any:
         """递归替换字典中的变量"""
-        if isinstance(data, dict):
-            return {k: self._replace_variables_in_dict(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._replace_variables_in_dict(item) for item in data]
-        elif isinstance(data, str):
-            return self._replace_variables(data)
-        else:
-            return data
+        return render(data, self.scope)
     
-    def _build_url(self) -> str:
-        """构建完整的请求 URL"""
-        api_url = self.api.url.strip()
+    def _build_url(self, url: Optional[str] = None) -> str:
+        """构建完整的请求 URL（默认使用压测接口的 URL）"""
+        api_url = (url if url is not None else self.api.url).strip()
         
         # 如果已经是完整 URL，直接返回
         if api_url.startswith(('http://', 'https://')):
@@ -115,12 +121,8 @@ class LocustExecutor:
                     return {'Authorization': f'Basic {credentials}'}
         
         # 如果没有配置认证，尝试使用全局 Token
-        from apps.environments.models import GlobalToken
         try:
-            default_token = GlobalToken.objects.filter(is_active=True, is_default=True).first()
-            if not default_token:
-                default_token = GlobalToken.objects.filter(is_active=True).first()
-            
+            default_token = self.token_resolver.get()
             if default_token:
                 token_value = default_token.token
                 if default_token.variables:
@@ -142,6 +144,216 @@ class LocustExecutor:
         
         return None
     
+    def validate(self) -> None:
+        """执行前校验压测配置，配置错误时抛出 ValueError"""
+        if self.testsuite:
+            self._scenario_spec()
+        else:
+            self._build_url()
+        self._load_model_code()
+    
+    def _target_url(self) -> str:
+        """用于确定压测目标主机的 URL（套件场景使用第一个步骤的 URL）"""
+        if self.testsuite:
+            return self._scenario_spec()['steps'][0]['url']
+        return self._build_url()
+    
+    def _step_auth(self, api) -> Tuple[Dict[str, str], Optional[List[str]]]:
+        """
+        场景步骤的认证配置（保留 ${variable} 模板，在 Locust 中按虚拟用户的变量渲染）
+        返回 (认证请求头, Basic 认证的 [用户名, 密码])
+        """
+        auth_type = (api.auth_type or '').lower()
+        auth_config = api.auth_config or {}
+        if auth_type in ['bearer', 'token']:
+            return {'Authorization': f"Bearer {auth_config.get('token') or '${token}'}"}, None
+        if auth_type == 'drf_token':
+            return {'Authorization': f"Token {auth_config.get('token') or '${token}'}"}, None
+        if auth_type == 'header':
+            # 与 TestCaseExecutor 一致：按 format 添加前缀（默认 Bearer，为空时只发送 Token）
+            header_name = auth_config.get('header_name') or 'Authorization'
+            token = auth_config.get('token') or '${token}'
+            token_format = auth_config.get('format', 'Bearer')
+            return {header_name: f'{token_format} {token}' if token_format else token}, None
+        if auth_type == 'basic':
+            username = auth_config.get('username') or '${username}'
+            password = auth_config.get('password') or '${password}'
+            return {}, [username, password]
+        return {}, None
+    
+    def _global_token_header(self, variables: Dict[str, Any]) -> Dict[str, str]:
+        """
+        未配置认证的步骤使用全局 Token
+        Token 值作为 ${token} 的默认值，场景中前置步骤提取到 token 后自动使用提取的值
+        """
+        try:
+            default_token = self.token_resolver.get()
+        except Exception as e:
+            logger.warning(f"获取全局 Token 失败: {e}")
+            return {}
+        if not default_token:
+            return {}
+        variables.update(default_token.variables or {})
+        if default_token.token:
+            variables.setdefault('token', compile_template(default_token.token).render(variables))
+        if default_token.auth_type == 'bearer':
+            return {'Authorization': 'Bearer ${token}'}
+        if default_token.auth_type == 'drf_token':
+            return {'Authorization': 'Token ${token}'}
+        if default_token.auth_type == 'header':
+            header_name = default_token.header_name or 'Authorization'
+            token_format = default_token.token_format or 'Bearer'
+            return {header_name: f'{token_format} ${{token}}' if token_format else '${token}'}
+        return {}
+    
+    def _build_step(self, index: int, testcase, config: Dict[str, Any], token_header: Dict[str, str]) -> Dict[str, Any]:
+        """将套件中的用例转换为场景步骤（请求字段保留变量模板）"""
+        api = testcase.api
+        headers = dict(api.headers or {})
+        headers.update(testcase.headers_override or {})
+        auth_headers, basic_auth = self._step_auth(api)
+        if not api.auth_type:
+            auth_headers = token_header
+        headers.update(auth_headers)
+        
+        status_code = None
+        for assertion in testcase.assertions or []:
+            if assertion.get('type') == 'status_code' and assertion.get('expected') not in (None, ''):
+                status_code = int(assertion['expected'])
+                break
+        
+        variables = dict(testcase.variables or {})
+        extractors = variables.pop('extractors', None) or {}
+        return {
+            'name': config.get('name') or f'{index}. {testcase.name}',
+            'testcase_id': testcase.id,
+            'method': api.method,
+            'url': self._build_url(testcase.url_override or api.url),
+            'headers': headers,
+            'params': testcase.params_override or api.params or {},
+            'body': testcase.body_override or api.body or None,
+            'basic_auth': basic_auth,
+            'variables': variables,
+            'extractors': extractors,
+            'status_code': status_code,
+            'weight': config.get('weight', 1),
+            'once': bool(config.get('once', False)),
+        }
+    
+    def _scenario_spec(self) -> Dict[str, Any]:
+        """
+        根据套件和场景配置生成场景描述（写入 locustfile，由 locust_scenario 在 Locust 中执行）
+        前置/后置脚本和环境钩子不在压测中执行
+        """
+        if self._scenario is not None:
+            return self._scenario
+        
+        config = self.performance_test.scenario or {}
+        relations = list(
+            self.testsuite.testsuitetestcase_set
+            .filter(testcase__is_active=True)
+            .select_related('testcase__api')
+        )
+        testcases = {relation.testcase_id: relation.testcase for relation in relations}
+        step_configs = config.get('steps') or [{'testcase_id': relation.testcase_id} for relation in relations]
+        
+        variables = dict((self.environment.variables or {}) if self.environment else {})
+        token_header = self._global_token_header(variables)
+        
+        steps = []
+        for index, step_config in enumerate(step_configs, start=1):
+            testcase = testcases.get(step_config.get('testcase_id'))
+            if testcase is None:
+                raise ValueError(f"场景步骤 {index} 的用例（ID: {step_config.get('testcase_id')}）不在套件中或未激活")
+            steps.append(self._build_step(index, testcase, step_config, token_header))
+        
+        if not steps:
+            raise ValueError(f"测试套件 '{self.testsuite.name}' 中没有可执行的用例")
+        mode = config.get('mode', 'sequential')
+        runnable = [step for step in steps if not step['once'] and (mode != 'weighted' or step['weight'] > 0)]
+        if not runnable:
+            raise ValueError('场景中至少需要一个每次迭代都执行的步骤（once 为 false，weighted 模式下 weight 大于 0）')
+        
+        headers = {'Content-Type': 'application/json'}
+        if self.environment and self.environment.headers:
+            headers.update(self.environment.headers)
+        
+        self._scenario = {
+            'mode': mode,
+            'variables': variables,
+            'headers': headers,
+            'steps': steps,
+        }
+        return self._scenario
+    
+    @property
+    def stages(self):
+        """负载模型的阶段表（closed 模式为 None），配置错误时抛出 ValueError"""
+        if self._stages is False:
+            pt = self.performance_test
+            self._stages = build_stages(pt.load_profile, pt.threads, pt.ramp_up, pt.duration)
+        return self._stages
+    
+    @property
+    def max_iterations(self) -> int:
+        """
+        按循环次数执行时每个虚拟用户的迭代次数（持续时间为 0 且未配置负载模型时生效），0 表示按时间运行
+        """
+        pt = self.performance_test
+        if self.stages or pt.duration > 0 or pt.loops <= 0:
+            return 0
+        return pt.loops
+    
+    def _load_model_code(self) -> Tuple[str, str, str]:
+        """
+        负载模型生成的代码
+        :return: (额外的 locust 导入, 虚拟用户的 wait_time 表达式, LoadTestShape 类代码)
+        """
+        pt = self.performance_test
+        imports = []
+        wait_time = ''
+        rate = per_user_rate(pt.load_profile, pt.threads)
+        if rate:
+            imports.append('constant_throughput')
+            wait_time = f'constant_throughput({rate!r})'
+        shape = ''
+        if self.stages:
+            imports.append('LoadTestShape')
+            shape = shape_code(self.stages)
+        return ', '.join(imports), wait_time, shape
+    
+    def _generate_scenario_locustfile(self) -> str:
+        """生成套件场景压测的 Locust 脚本（请求逻辑在 apps.testcases.locust_scenario 中）"""
+        spec = self._scenario_spec()
+        imports, wait_time, shape = self._load_model_code()
+        locust_script = f"""# -*- coding: utf-8 -*-
+# 套件场景压测：{self.testsuite.name}
+import sys
+sys.path.insert(0, {str(settings.BASE_DIR)!r})
+{f'from locust import {imports}' if imports else ''}
+import apps.testcases.locust_histograms  # noqa: F401  响应时间直方图
+from apps.testcases.locust_scenario import ScenarioUser, build_tasks
+
+SPEC = {pprint.pformat(spec, indent=1, width=120, sort_dicts=False)}
+
+
+class BenchLinkScenarioUser(ScenarioUser):
+    spec = SPEC
+    tasks = build_tasks(SPEC)
+    max_iterations = {self.max_iterations}  # 每个虚拟用户的迭代次数（0 表示按时间运行）
+"""
+        if wait_time:
+            locust_script += f"    wait_time = {wait_time}  # 限定每个虚拟用户每秒的迭代次数\n"
+        locust_script += shape
+        return self._write_locustfile(locust_script)
+    
+    def _write_locustfile(self, locust_script: str) -> str:
+        """保存 Locust 脚本文件"""
+        locust_file = self.work_dir / f'locustfile_{self.performance_test.id}_{int(timezone.now().timestamp())}.py'
+        with open(locust_file, 'w', encoding='utf-8') as f:
+            f.write(locust_script)
+        return str(locust_file)
+    
     def _generate_locustfile(self) -> str:
         """生成 Locust 测试脚本"""
         url = self._build_url()
@@ -150,20 +362,30 @@ class LocustExecutor:
         if auth:
             headers.update(auth)
         
-        params = self._replace_variables_in_dict(self.api.params or {})
-        body = self._replace_variables_in_dict(self.api.body or {}) if self.api.method in ['POST', 'PUT', 'PATCH'] else None
+        params = render_field(self.api, 'params', self.scope, {})
+        body = render_field(self.api, 'body', self.scope, {}) if self.api.method in ['POST', 'PUT', 'PATCH'] else None
         
         # 转义 URL 和名称中的特殊字符
         escaped_url = url.replace('"', '\\"')
         escaped_name = self.api.name.replace('"', '\\"')
+        imports, wait_time, shape = self._load_model_code()
+        
+        max_iterations = self.max_iterations
         
         # 构建 Locust 脚本
         locust_script = f"""# -*- coding: utf-8 -*-
-from locust import HttpUser, task, between
+from locust import HttpUser, task, between{', ' + imports if imports else ''}
 import json
-
+import sys
+sys.path.insert(0, {str(settings.BASE_DIR)!r})
+import apps.testcases.locust_histograms  # noqa: F401  响应时间直方图
+"""
+        if max_iterations:
+            locust_script += "from apps.testcases.locust_iterations import iteration_done, user_stopped\n"
+        locust_script += f"""
 class BenchLinkUser(HttpUser):
-    wait_time = between(0, 0)  # 不等待，立即执行
+    wait_time = {wait_time or 'between(0, 0)'}  # 不限速时不等待，立即执行
+    max_iterations = {max_iterations}  # 每个虚拟用户的请求次数（0 表示按时间运行）
     
     def on_start(self):
         # 设置请求头
@@ -198,18 +420,25 @@ class BenchLinkUser(HttpUser):
         )
         """
         
-        # 保存脚本文件
-        locust_file = self.work_dir / f'locustfile_{self.performance_test.id}_{int(timezone.now().timestamp())}.py'
-        with open(locust_file, 'w', encoding='utf-8') as f:
-            f.write(locust_script)
-        
-        return str(locust_file)
+        if max_iterations:
+            locust_script += """
+        # 达到循环次数后停止该虚拟用户
+        iteration_done(self)
+    
+    def on_stop(self):
+        user_stopped(self)
+"""
+        locust_script += shape
+        return self._write_locustfile(locust_script)
     
     def execute(self) -> Dict[str, Any]:
         """执行性能测试"""
         try:
             # 生成 Locust 脚本
-            locust_file = self._generate_locustfile()
+            if self.testsuite:
+                locust_file = self._generate_scenario_locustfile()
+            else:
+                locust_file = self._generate_locustfile()
             
             # 创建输出目录
             output_dir = self.work_dir / f'result_{self.performance_test.id}_{int(timezone.now().timestamp())}'
@@ -221,6 +450,8 @@ class BenchLinkUser(HttpUser):
             html_report = output_dir / 'report.html'  # 单文件HTML报告
             html_report_dir = output_dir / 'report'  # HTML报告目录（备用）
             log_file = output_dir / 'locust.log'
+            histogram_file = output_dir / 'histograms.json'  # 精确响应时间直方图（命令行模式）
+            locust_env = {**os.environ, HISTOGRAM_FILE_ENV: str(histogram_file)}
             
             # 构建 Locust 命令
             threads = self.performance_test.threads
@@ -228,59 +459,87 @@ class BenchLinkUser(HttpUser):
             duration = self.performance_test.duration
             
             # 提取 host（协议 + 域名）
-            url = self._build_url()
+            url = self._target_url()
             from urllib.parse import urlparse
             parsed = urlparse(url)
             host = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else ''
             
             # 计算启动速率（每秒启动的用户数）
             spawn_rate = max(1, int(threads / ramp_up)) if ramp_up > 0 else threads
+            stages = self.stages
             
             cmd = [
                 'locust',
                 '-f', locust_file,  # Locust 脚本文件
                 '--headless',  # 无头模式
-                '--users', str(threads),  # 并发用户数
-                '--spawn-rate', str(spawn_rate),  # 启动速率（每秒启动的用户数）
                 '--host', host,  # 目标主机
                 '--csv', str(csv_prefix),  # CSV 结果文件前缀
+                '--csv-full-history',  # 每秒统计写入 stats_history.csv（包含每个请求名称），用于实时指标
                 '--html', str(html_report),  # HTML 报告（单文件）
                 '--logfile', str(log_file),  # 日志文件
                 '--loglevel', 'INFO',  # 日志级别
             ]
             
-            # 如果设置了持续时间，使用 --run-time 参数
-            if duration > 0:
-                cmd.extend(['--run-time', f'{duration}s'])
+            if stages:
+                # 负载模型：用户数、启动速率和运行时间都由 LoadTestShape 的阶段表控制，
+                # 阶段表结束后 tick() 返回 None，Locust 自动停止
+                duration = stages[-1][0]
             else:
-                # 否则使用循环次数（Locust 默认运行直到停止）
-                # 可以通过设置 --run-time 来实现循环次数
-                loops = self.performance_test.loops
-                if loops > 0:
-                    # 估算时间：假设每个请求平均耗时 100ms
-                    estimated_time = (loops * threads * 0.1)
-                    cmd.extend(['--run-time', f'{int(estimated_time)}s'])
+                cmd.extend([
+                    '--users', str(threads),  # 并发用户数
+                    '--spawn-rate', str(spawn_rate),  # 启动速率（每秒启动的用户数）
+                ])
+                # 如果设置了持续时间，使用 --run-time 参数
+                # 否则按循环次数执行：每个虚拟用户完成 loops 次迭代后停止，全部完成后 Locust 自动退出
+                if duration > 0:
+                    cmd.extend(['--run-time', f'{duration}s'])
             
-            logger.info(f"执行 Locust 命令: {' '.join(cmd)}")
+            workers = self._worker_count()
+            engine = self._engine(workers)
+            if engine == 'embedded':
+                logger.info(f"使用内嵌 Locust 引擎执行: {locust_file}")
+            else:
+                logger.info(f"执行 Locust 命令: {' '.join(cmd)}（worker 进程数: {workers}）")
             
             # 执行 Locust
             # 计算超时时间：测试持续时间 + 启动时间 + 额外缓冲时间（用于报告生成等）
             # 最小超时时间：如果duration为0，使用默认值
-            if duration > 0:
+            if stages:
+                timeout_seconds = duration + 120  # 阶段表总时长 + 缓冲时间
+            elif duration > 0:
                 timeout_seconds = duration + ramp_up + 120  # 增加缓冲时间到120秒
+            elif self.max_iterations:
+                timeout_seconds = getattr(settings, 'LOCUST_LOOP_TIMEOUT', 3600)  # 按循环次数执行的最长时间
             else:
                 timeout_seconds = 600  # 默认10分钟超时
             
             logger.info(f"Locust 超时设置: {timeout_seconds}秒 (测试时长: {duration}s, 启动时间: {ramp_up}s)")
             
+            self._mark_running(csv_prefix)
             start_time = timezone.now()
             try:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout_seconds
-                )
+                if engine == 'embedded':
+                    result = self._run_embedded({
+                        'locustfile': locust_file,
+                        'host': host,
+                        'users': threads,
+                        'spawn_rate': spawn_rate,
+                        'run_time': duration if not stages and duration > 0 else 0,
+                        'csv_prefix': str(csv_prefix),
+                        'html_report': str(html_report),
+                        'result_file': str(output_dir / 'engine_result.json'),
+                        'log_file': str(log_file),
+                    }, timeout_seconds)
+                elif workers > 1:
+                    result = self._run_distributed(cmd, locust_file, output_dir, workers, timeout_seconds, locust_env)
+                else:
+                    result = subprocess.run(
+                        cmd,
+                        capture_output=True,
+                        text=True,
+                        timeout=timeout_seconds,
+                        env=locust_env
+                    )
             except subprocess.TimeoutExpired as e:
                 logger.warning(f"Locust 执行超时: {e}")
                 return {
@@ -297,7 +556,12 @@ class BenchLinkUser(HttpUser):
             # 所以即使返回码非0，也要尝试解析结果，只要能够解析出结果就认为执行成功
             
             logger.info(f"Locust 执行完成，返回码: {result.returncode}")
-            metrics = self._parse_results(csv_prefix, output_dir)
+            if engine == 'embedded':
+                metrics = self._read_engine_result(output_dir / 'engine_result.json', result.stderr)
+            else:
+                metrics = self._parse_results(csv_prefix, output_dir)
+                if 'error' not in metrics:
+                    self._apply_histograms(metrics, histogram_file)
             
             # 检查解析结果是否有效
             if isinstance(metrics, dict) and 'error' in metrics:
@@ -342,7 +606,9 @@ class BenchLinkUser(HttpUser):
                 reported_rps = metrics.get('throughput', 0)
                 
                 # 如果计算的RPS和报告的RPS差异较大，记录警告
-                if abs(calculated_rps - reported_rps) > reported_rps * 0.1 and reported_rps > 0:
+                # （按循环次数执行时实际运行时间包含等待最后一次统计写出的时间，不可比较）
+                if (abs(calculated_rps - reported_rps) > reported_rps * 0.1 and reported_rps > 0
+                        and not self.max_iterations):
                     logger.warning(
                         f"RPS计算差异较大: 计算值={calculated_rps:.2f}, 报告值={reported_rps:.2f}, "
                         f"总请求数={metrics['total_samples']}, 实际运行时间={actual_duration:.2f}秒"
@@ -353,6 +619,7 @@ class BenchLinkUser(HttpUser):
                 metrics['ramp_up_time'] = ramp_up  # 启动时间（秒）
                 metrics['full_load_duration'] = max(0, actual_duration - ramp_up)  # 满负载运行时间（秒）
                 metrics['calculated_rps'] = calculated_rps  # 根据总请求数和实际时间计算的RPS
+                metrics['workers'] = workers  # 施压进程数（1 表示单进程）
                 
                 logger.info(
                     f"性能测试统计: 总请求数={metrics['total_samples']}, "
@@ -362,6 +629,12 @@ class BenchLinkUser(HttpUser):
                     f"平均RPS={reported_rps:.2f}, 计算RPS={calculated_rps:.2f}"
                 )
             
+            if self.max_iterations:
+                # 按循环次数执行：总迭代次数固定，请求数可直接与基线比较
+                metrics['loop_mode'] = True
+                metrics['iterations_per_user'] = self.max_iterations
+                metrics['expected_iterations'] = self.max_iterations * threads
+            
             # 检查 stderr 是否包含真正的错误（不是 Locust 的正常统计输出）
             error_msg = None
             if result.stderr:
@@ -418,6 +691,155 @@ class BenchLinkUser(HttpUser):
                 'error': str(e)
             }
     
+    def _mark_running(self, csv_prefix: Path) -> None:
+        """记录本次运行的结果文件前缀，运行期间实时指标接口据此读取 stats_history.csv"""
+        last_result = {
+            **(self.performance_test.last_result or {}),
+            'status': 'running',
+            'live': {'csv_prefix': str(csv_prefix), 'started_at': timezone.now().isoformat()},
+        }
+        type(self.performance_test).objects.filter(pk=self.performance_test.pk).update(last_result=last_result)
+        self.performance_test.last_result = last_result
+    
+    @staticmethod
+    def _engine(workers: int) -> str:
+        """
+        执行引擎：cli（locust 命令行 + CSV 解析）或 embedded（独立进程中通过 Python API 运行，直方图统计）
+        内嵌引擎只支持单进程，分布式压测使用命令行
+        """
+        engine = getattr(settings, 'LOCUST_ENGINE', 'cli')
+        if engine == 'embedded' and workers > 1:
+            logger.info("内嵌 Locust 引擎不支持分布式压测，使用命令行执行")
+            return 'cli'
+        return engine
+    
+    def _run_embedded(self, config: Dict[str, Any], timeout_seconds: int) -> subprocess.CompletedProcess:
+        """在独立进程中运行内嵌引擎（apps.testcases.locust_engine），超时抛出 subprocess.TimeoutExpired"""
+        config_file = Path(config['result_file']).with_name('engine_config.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        return subprocess.run(
+            [sys.executable, '-m', 'apps.testcases.locust_engine', str(config_file)],
+            cwd=str(settings.BASE_DIR),
+            capture_output=True,
+            text=True,
+            timeout=timeout_seconds
+        )
+    
+    @staticmethod
+    def _read_engine_result(result_file: Path, stderr: Optional[str] = None) -> Dict[str, Any]:
+        """
+        读取内嵌引擎的结果（结构与 _parse_results 相同）
+        引擎进程在写出结果前退出（如导入失败）时，错误信息附带进程 stderr 的末尾部分
+        """
+        try:
+            with open(result_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            error = f'读取内嵌引擎结果失败: {e}'
+            if stderr and stderr.strip():
+                error += f'\n{stderr.strip()[-2000:]}'
+            return {'error': error}
+        if not result.get('success'):
+            return {'error': result.get('error') or '内嵌引擎执行失败'}
+        return result['metrics']
+    
+    def _worker_count(self) -> int:
+        """分布式压测的 worker 进程数（不超过虚拟用户数，1 表示单进程）"""
+        workers = self.performance_test.workers
+        if workers is None:
+            workers = getattr(settings, 'LOCUST_WORKERS', 0) or os.cpu_count() or 1
+        max_users = max(users for _, users, _ in self.stages) if self.stages else self.performance_test.threads
+        return max(1, min(workers, max_users))
+    
+    @staticmethod
+    def _free_port() -> int:
+        """获取一个本机空闲端口（master 与 worker 通信使用）"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+    
+    def _run_distributed(self, cmd: List[str], locust_file: str, output_dir: Path,
+                         workers: int, timeout_seconds: int,
+                         env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+        """
+        分布式执行：一个 master 加 N 个 worker 进程（均在本机）
+        master 负责汇总所有 worker 的统计并输出 CSV/HTML 报告；
+        执行超时、master 异常退出或 worker 全部退出时结束所有进程，超时抛出 subprocess.TimeoutExpired
+        env 只传给 master（worker 的直方图随统计上报给 master 合并）
+        """
+        port = self._free_port()
+        connect_timeout = getattr(settings, 'LOCUST_WORKER_CONNECT_TIMEOUT', 30)
+        master_cmd = cmd + [
+            '--master',
+            '--master-bind-host', '127.0.0.1',
+            '--master-bind-port', str(port),
+            '--expect-workers', str(workers),  # 所有 worker 连接后才开始施压
+            '--expect-workers-max-wait', str(connect_timeout),
+        ]
+        worker_cmd = [
+            'locust',
+            '-f', locust_file,
+            '--worker',
+            '--master-host', '127.0.0.1',
+            '--master-port', str(port),
+            '--loglevel', 'INFO',
+        ]
+        
+        # 输出写入文件，避免管道缓冲区写满导致进程阻塞
+        master_out = open(output_dir / 'master.out', 'w+', encoding='utf-8')
+        master_err = open(output_dir / 'master.err', 'w+', encoding='utf-8')
+        processes = []
+        try:
+            master = subprocess.Popen(master_cmd, stdout=master_out, stderr=master_err, text=True, env=env)
+            processes.append(master)
+            for index in range(workers):
+                log_file = open(output_dir / f'worker_{index}.log', 'w', encoding='utf-8')
+                try:
+                    processes.append(subprocess.Popen(
+                        worker_cmd, stdout=log_file, stderr=subprocess.STDOUT, text=True
+                    ))
+                finally:
+                    # 子进程已继承文件描述符
+                    log_file.close()
+            
+            deadline = time.monotonic() + timeout_seconds
+            while master.poll() is None:
+                if time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(master_cmd, timeout_seconds)
+                if all(process.poll() is not None for process in processes[1:]):
+                    # worker 全部退出后 master 不会再收到统计，给 master 留出写报告的时间
+                    try:
+                        master.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        logger.error("所有 Locust worker 已退出，结束 master 进程")
+                    break
+                time.sleep(0.5)
+            
+            returncode = master.poll()
+            if returncode is None:
+                returncode = 2
+            master_out.seek(0)
+            master_err.seek(0)
+            return subprocess.CompletedProcess(master_cmd, returncode, master_out.read(), master_err.read())
+        finally:
+            self._stop_processes(processes)
+            master_out.close()
+            master_err.close()
+    
+    @staticmethod
+    def _stop_processes(processes: List[subprocess.Popen]) -> None:
+        """结束仍在运行的 Locust 进程（先 terminate，超时后 kill）"""
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    
     def _parse_results(self, csv_prefix: Path, output_dir: Path) -> Dict[str, Any]:
         """解析 Locust 结果文件"""
         try:
@@ -436,7 +858,8 @@ class BenchLinkUser(HttpUser):
                 'p95_response_time': None,
                 'p99_response_time': None,
                 'throughput': 0,
-                'error_rate': 0
+                'error_rate': 0,
+                'steps': []  # 按请求名称（场景步骤）分别统计
             }
             
             # 读取统计结果
@@ -461,6 +884,11 @@ class BenchLinkUser(HttpUser):
                     if not aggregated_row and all_rows:
                         aggregated_row = all_rows[-1]
                     
+                    metrics['steps'] = [
+                        self._parse_step_row(row) for row in all_rows
+                        if row is not aggregated_row and row.get('Name', '').strip()
+                    ]
+                    
                     if aggregated_row:
                         try:
                             # 解析各个字段
@@ -506,4 +934,57 @@ class BenchLinkUser(HttpUser):
             return {
                 'error': f'解析结果失败: {str(e)}'
             }
+    
+    @staticmethod
+    def _apply_histograms(metrics: Dict[str, Any], histogram_file: Path) -> None:
+        """
+        用 Locust 进程写出的精确统计替换 CSV 中的结果（汇总和每个步骤）：请求数、错误率、吞吐量和响应时间
+        都来自同一收集器的同一批请求，并补充状态码分布和错误样例；文件不存在（如 Locust 异常退出）时保留 CSV 的结果，
+        收集器的时间窗口为空（结果中没有吞吐量）时保留 CSV 中的吞吐量
+        """
+        try:
+            with open(histogram_file, 'r', encoding='utf-8') as f:
+                exact = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取响应时间直方图失败，使用 CSV 中的统计: {e}")
+            return
+        if not exact.get('total_samples'):
+            return
+        csv_steps = {(step.get('method'), step.get('name')): step for step in metrics.get('steps') or []}
+        for step in exact.get('steps') or []:
+            csv_step = csv_steps.get((step.get('method'), step.get('name')))
+            if 'throughput' not in step and csv_step and 'throughput' in csv_step:
+                step['throughput'] = csv_step['throughput']
+        metrics.update(exact)
+    
+    @staticmethod
+    def _parse_step_row(row: Dict[str, str]) -> Dict[str, Any]:
+        """解析单个请求名称（步骤）的统计行"""
+        def number(*keys):
+            for key in keys:
+                value = row.get(key)
+                if value not in (None, '', 'N/A'):
+                    try:
+                        return float(value)
+                    except ValueError:
+                        return 0
+            return 0
+        
+        total = int(number('Request Count', '# requests'))
+        failed = int(number('Failure Count', '# failures'))
+        return {
+            'name': row.get('Name', '').strip(),
+            'method': row.get('Type', '').strip(),
+            'total_samples': total,
+            'failed_samples': failed,
+            'error_rate': (failed / total) * 100 if total else 0,
+            'avg_response_time': number('Average Response Time', 'Average'),
+            'min_response_time': number('Min Response Time', 'Min'),
+            'max_response_time': number('Max Response Time', 'Max'),
+            'median_response_time': number('50%', 'Median Response Time'),
+            'p90_response_time': number('90%'),
+            'p95_response_time': number('95%'),
+            'p99_response_time': number('99%'),
+            'throughput': number('Requests/s', 'RPS'),
+        }
 
@@ -0,0 +1,222 @@
+"""
+Locust 响应时间直方图收集（生成的 locustfile 和内嵌引擎导入，不依赖 Django）
+
+请求事件记录到每个请求名称和汇总的直方图（apps.testcases.histogram），同时统计状态码分布和错误样例：
+- 单进程（命令行或内嵌引擎）：直接记录
+- 分布式：worker 每次上报统计时附带自上次上报以来的增量直方图（report_to_master），master 按桶合并（worker_report）
+- 命令行运行结束（quitting）时，master/单进程把结果写入环境变量 BENCHLINK_HISTOGRAM_FILE 指定的文件，
+  LocustExecutor 用其中的请求数、错误率、吞吐量和精确百分位替换 CSV 中的结果
+吞吐量与 Locust 的 total_rps 口径相同：请求数 / (最后一个请求完成时间 - 测试开始时间)，测试开始时间在 test_start
+事件中记录（分布式时取 master 和各 worker 中最早的）；时间窗口为空（如没有收到 test_start 且只有一个请求）时
+结果中不含吞吐量，由调用方保留 Locust 自己的统计
+"""
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from locust import events
+from locust.runners import WorkerRunner
+
+from .histogram import HISTOGRAM_FILE_ENV, LatencyHistogram
+
+# worker 上报数据中的字段
+REPORT_KEY = 'benchlink_histograms'
+# 每个请求名称保留的不同错误信息数量上限
+MAX_ERROR_SAMPLES = 20
+# 结果中的百分位
+REPORT_PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+
+class _Entry:
+    """单个请求名称的统计"""
+
+    __slots__ = ('method', 'name', 'histogram', 'failures', 'status_codes', 'errors')
+
+    def __init__(self, method: str, name: str):
+        self.method = method
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.failures = 0
+        self.status_codes = Counter()
+        self.errors = Counter()
+
+    def add_error(self, message: str, count: int = 1) -> None:
+        if message in self.errors or len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors[message] += count
+
+
+class RequestCollector:
+    """收集 Locust 请求事件（按请求名称分别记录，汇总直方图在输出时合并）"""
+
+    def __init__(self):
+        self.entries: Dict[tuple, _Entry] = {}
+        self.started: Optional[float] = None
+        self.first_request: Optional[float] = None
+        self.last_request: Optional[float] = None
+
+    def _entry(self, method: str, name: str) -> _Entry:
+        entry = self.entries.get((method, name))
+        if entry is None:
+            entry = self.entries[(method, name)] = _Entry(method, name)
+        return entry
+
+    def mark_started(self, started: Optional[float]) -> None:
+        """记录测试开始时间（取最早的一次）"""
+        if started is not None and (self.started is None or started < self.started):
+            self.started = started
+
+    def _touch(self, first: Optional[float], last: Optional[float]) -> None:
+        if first is not None and (self.first_request is None or first < self.first_request):
+            self.first_request = first
+        if last is not None and (self.last_request is None or last > self.last_request):
+            self.last_request = last
+
+    def on_request(self, request_type, name, response_time, response_length,
+                   response=None, context=None, exception=None, **kwargs):
+        now = time.time()
+        self._touch(now, now)
+        entry = self._entry(request_type, name)
+        entry.histogram.record(response_time or 0)
+
+        status_code = getattr(response, 'status_code', None)
+        # status_code 为 0 表示连接失败等未收到响应的情况
+        entry.status_codes[str(status_code) if status_code else 'error'] += 1
+
+        if exception is not None:
+            entry.failures += 1
+            entry.add_error(f'{type(exception).__name__}: {exception}'[:500])
+
+    def drain(self) -> Dict[str, Any]:
+        """导出自上次导出以来的增量数据并清空（worker 上报给 master）"""
+        report = {
+            'started': self.started,
+            'first_request': self.first_request,
+            'last_request': self.last_request,
+            'entries': [
+                {
+                    'method': entry.method,
+                    'name': entry.name,
+                    'histogram': entry.histogram.encode(),
+                    'failures': entry.failures,
+                    'status_codes': dict(entry.status_codes),
+                    'errors': dict(entry.errors),
+                }
+                for entry in self.entries.values()
+            ],
+        }
+        self.entries = {}
+        self.first_request = self.last_request = None
+        return report
+
+    def merge_report(self, report: Dict[str, Any]) -> None:
+        """合并 worker 上报的增量数据"""
+        self.mark_started(report.get('started'))
+        self._touch(report.get('first_request'), report.get('last_request'))
+        for data in report.get('entries') or []:
+            entry = self._entry(data['method'], data['name'])
+            entry.histogram.merge(LatencyHistogram.decode(data['histogram']))
+            entry.failures += data.get('failures', 0)
+            entry.status_codes.update(data.get('status_codes') or {})
+            for message, count in (data.get('errors') or {}).items():
+                entry.add_error(message, count)
+
+    @staticmethod
+    def _stats(histogram: LatencyHistogram, failures: int, elapsed: float) -> Dict[str, Any]:
+        total = histogram.count
+        percentiles = histogram.percentiles(REPORT_PERCENTILES)
+        stats = {
+            'total_samples': total,
+            'success_samples': total - failures,
+            'failed_samples': failures,
+            'error_rate': (failures / total) * 100 if total else 0,
+            'avg_response_time': histogram.mean or 0,
+            'min_response_time': histogram.min or 0,
+            'max_response_time': histogram.max or 0,
+            'median_response_time': percentiles['p50'] or 0,
+            'p90_response_time': percentiles['p90'] or 0,
+            'p95_response_time': percentiles['p95'] or 0,
+            'p99_response_time': percentiles['p99'] or 0,
+            'percentiles': percentiles,
+        }
+        if elapsed > 0:
+            stats['throughput'] = total / elapsed
+        return stats
+
+    def elapsed(self) -> float:
+        """吞吐量的时间窗口（秒）：测试开始到最后一个请求完成，没有测试开始时间时从第一个请求开始"""
+        start = self.started if self.started is not None else self.first_request
+        if start is None or self.last_request is None:
+            return 0
+        return self.last_request - start
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        与 LocustExecutor._parse_results 相同结构的指标，另含状态码分布、错误样例，
+        以及汇总和每个请求名称的直方图（紧凑编码，可跨运行合并）
+        """
+        elapsed = self.elapsed()
+        total = LatencyHistogram()
+        failures = 0
+        status_codes = Counter()
+        steps = []
+        errors = []
+        for entry in self.entries.values():
+            total.merge(entry.histogram)
+            failures += entry.failures
+            status_codes.update(entry.status_codes)
+            step = self._stats(entry.histogram, entry.failures, elapsed)
+            step.update({
+                'name': entry.name,
+                'method': entry.method,
+                'status_codes': dict(entry.status_codes),
+                'histogram': entry.histogram.encode(),
+            })
+            steps.append(step)
+            errors.extend(
+                {'name': entry.name, 'method': entry.method, 'error': message, 'occurrences': count}
+                for message, count in entry.errors.most_common()
+            )
+        metrics = self._stats(total, failures, elapsed)
+        metrics.update({
+            'status_codes': dict(status_codes),
+            'histogram': total.encode(),
+            'steps': steps,
+            'errors': errors,
+        })
+        return metrics
+
+
+# 当前进程的收集器
+collector = RequestCollector()
+
+
+@events.request.add_listener
+def _on_request(**kwargs):
+    collector.on_request(**kwargs)
+
+
+@events.test_start.add_listener
+def _on_test_start(**kwargs):
+    collector.mark_started(time.time())
+
+
+@events.report_to_master.add_listener
+def _on_report_to_master(client_id, data, **kwargs):
+    data[REPORT_KEY] = collector.drain()
+
+
+@events.worker_report.add_listener
+def _on_worker_report(client_id, data, **kwargs):
+    if REPORT_KEY in data:
+        collector.merge_report(data[REPORT_KEY])
+
+
+@events.quitting.add_listener
+def _on_quitting(environment, **kwargs):
+    path = os.environ.get(HISTOGRAM_FILE_ENV)
+    if not path or isinstance(environment.runner, WorkerRunner):
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(collector.metrics(), f, ensure_ascii=False)
@@ -0,0 +1,71 @@
+"""
+按循环次数执行（在 Locust 进程中加载，不依赖 Django）
+
+每个虚拟用户完成 max_iterations 次迭代后停止（StopUser），全部虚拟用户完成后结束运行：
+- 单进程：停止 runner，等统计写入 CSV 后退出并生成报告
+- 分布式：worker 的每个虚拟用户完成时先上报统计（含直方图），再通知 master；
+  master 收到全部虚拟用户的完成通知后，等统计写入 CSV 再退出（退出时通知 worker 退出）并生成报告
+这样结束时所有请求都已计入统计，总请求数 = 循环次数 × 虚拟用户数（× 每次迭代的请求数）。
+一次迭代：单接口压测为一次请求，场景压测为一次完整场景（weighted 模式为一个步骤），启动时执行一次的步骤不计入。
+"""
+import gevent
+from locust import events
+from locust.exception import StopUser
+from locust.runners import MasterRunner, WorkerRunner
+from locust.stats import CSV_STATS_INTERVAL_SEC
+
+# worker 通知 master 虚拟用户已完成全部迭代的消息类型
+USER_DONE_MESSAGE = 'benchlink_user_done'
+
+# 本进程中已完成全部迭代的虚拟用户数（master 上为所有 worker 的合计）
+_finished = {'count': 0, 'quitting': False}
+
+
+def iteration_done(user) -> None:
+    """一次迭代完成，达到循环次数时停止该虚拟用户"""
+    limit = getattr(user, 'max_iterations', 0)
+    if not limit:
+        return
+    user.iterations = getattr(user, 'iterations', 0) + 1
+    if user.iterations >= limit:
+        raise StopUser()
+
+
+def _finish(runner) -> None:
+    """等统计写入 CSV（每 CSV_STATS_INTERVAL_SEC 秒写一次）后退出"""
+    if not isinstance(runner, MasterRunner):
+        # 单进程：所有虚拟用户已停止，先把 runner 置为停止状态（内嵌引擎据此结束）
+        runner.stop()
+    gevent.sleep(CSV_STATS_INTERVAL_SEC + 0.5)
+    runner.quit()
+
+
+def _user_finished(runner, count: int = 1) -> None:
+    _finished['count'] += count
+    if not _finished['quitting'] and _finished['count'] >= runner.target_user_count:
+        _finished['quitting'] = True
+        # 在单独的协程中退出，避免在正在停止的虚拟用户协程中结束自身
+        gevent.spawn(_finish, runner)
+
+
+def user_stopped(user) -> None:
+    """虚拟用户停止（on_stop 中调用）：所有虚拟用户都完成全部迭代后结束运行"""
+    limit = getattr(user, 'max_iterations', 0)
+    if not limit or getattr(user, 'iterations', 0) < limit:
+        return
+    runner = user.environment.runner
+    if runner is None:
+        return
+    if isinstance(runner, WorkerRunner):
+        # 先上报统计再通知 master（同一连接上按顺序到达），master 结束时统计已完整
+        runner._send_stats()
+        runner.send_message(USER_DONE_MESSAGE, 1)
+    else:
+        _user_finished(runner)
+
+
+@events.init.add_listener
+def _on_init(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, MasterRunner):
+        runner.register_message(USER_DONE_MESSAGE, lambda msg, **kw: _user_finished(runner, msg.data or 1))
@@ -0,0 +1,161 @@
+"""
+套件场景压测运行时（在 Locust 进程中加载，不依赖 Django）
+
+LocustExecutor 为套件压测生成的 locustfile 只包含场景描述（JSON），请求逻辑都在这里：
+- 每个步骤的 url/headers/params/body 在类创建时编译为替换计划，请求时按虚拟用户的变量作用域渲染
+- 每个虚拟用户维护独立的运行时变量，步骤提取的变量只对该虚拟用户的后续步骤可见
+- 请求以步骤名称上报统计（name=...），Locust 按步骤分别统计响应时间
+"""
+import logging
+from typing import Any, Dict, List
+
+from locust import HttpUser, constant
+
+from .jsonpath import compile_path
+from .locust_iterations import iteration_done, user_stopped
+from .templating import TrackedDict, VariableScope, compile_template, compile_value
+
+logger = logging.getLogger(__name__)
+
+# 发送请求体的请求方法（与单接口压测一致）
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class ScenarioStep:
+    """编译后的场景步骤"""
+
+    def __init__(self, index: int, spec: Dict[str, Any]):
+        self.index = index
+        self.name = spec['name']
+        self.method = spec.get('method', 'GET').upper()
+        self.url = compile_template(spec['url'])
+        self.headers = compile_value(spec.get('headers') or {})
+        self.params = compile_value(spec.get('params') or {})
+        body = spec.get('body')
+        self.body = compile_value(body) if body is not None and self.method in BODY_METHODS else None
+        basic_auth = spec.get('basic_auth')
+        self.basic_auth = tuple(compile_template(str(item)) for item in basic_auth) if basic_auth else None
+        self.variables = spec.get('variables') or {}
+        self.extractors = spec.get('extractors') or {}
+        self.status_code = spec.get('status_code')
+        self.weight = spec.get('weight', 1)
+        self.once = bool(spec.get('once'))
+
+
+def compile_steps(spec: Dict[str, Any]) -> List[ScenarioStep]:
+    return [ScenarioStep(index, step) for index, step in enumerate(spec.get('steps') or [])]
+
+
+def _step_task(step: ScenarioStep):
+    def task(user):
+        user.run_step(step)
+        iteration_done(user)
+    task.__name__ = f'step_{step.index}'
+    return task
+
+
+def _iteration_task(steps: List[ScenarioStep]):
+    def task(user):
+        for step in steps:
+            user.run_step(step)
+        iteration_done(user)
+    task.__name__ = 'iteration'
+    return task
+
+
+def build_tasks(spec: Dict[str, Any]):
+    """
+    生成 Locust 任务
+    sequential：一次迭代按顺序执行全部步骤；weighted：每个步骤是独立任务，按权重随机选择
+    """
+    steps = [step for step in compile_steps(spec) if not step.once]
+    if spec.get('mode') == 'weighted':
+        return {_step_task(step): step.weight for step in steps if step.weight > 0}
+    return [_iteration_task(steps)] if steps else []
+
+
+class ScenarioUser(HttpUser):
+    """场景压测虚拟用户（生成的 locustfile 中继承并设置 spec 和 tasks）"""
+    abstract = True
+    wait_time = constant(0)  # 不等待，立即执行
+    spec: Dict[str, Any] = {}
+    # 每个虚拟用户的迭代次数（0 表示不限制，按时间或负载模型运行）
+    max_iterations = 0
+
+    def on_start(self):
+        cls = type(self)
+        if '_steps' not in cls.__dict__:
+            cls._steps = compile_steps(cls.spec)
+        # 每个虚拟用户独立的运行时变量
+        self.variables = TrackedDict()
+        base = self.spec.get('variables') or {}
+        self._scopes = {
+            step.index: VariableScope(base, step.variables, self.variables)
+            for step in cls._steps
+        }
+        headers = compile_value(self.spec.get('headers') or {}).render(VariableScope(base))
+        self.client.headers.update(headers)
+        # 只执行一次的步骤（如登录）在虚拟用户启动时执行
+        for step in cls._steps:
+            if step.once:
+                self.run_step(step)
+
+    def on_stop(self):
+        user_stopped(self)
+
+    def run_step(self, step: ScenarioStep) -> None:
+        """执行一个步骤：渲染请求、校验状态码、提取变量"""
+        scope = self._scopes[step.index]
+        kwargs = {
+            'headers': step.headers.render(scope),
+            'params': step.params.render(scope) or None,
+            'name': step.name,
+            'catch_response': True,
+        }
+        if step.body is not None:
+            kwargs['json'] = step.body.render(scope)
+        if step.basic_auth:
+            kwargs['auth'] = tuple(item.render(scope) for item in step.basic_auth)
+
+        with self.client.request(step.method, step.url.render(scope), **kwargs) as response:
+            if step.status_code is not None:
+                if response.status_code != step.status_code:
+                    response.failure(f'状态码断言失败: 期望 {step.status_code}, 实际 {response.status_code}')
+                    return
+                response.success()
+            elif not response.ok:
+                return
+            missing = self._extract(step, response)
+            if missing:
+                response.failure(f"变量提取失败: {', '.join(missing)}")
+
+    def _extract(self, step: ScenarioStep, response) -> List[str]:
+        """从响应中提取变量到当前虚拟用户，返回提取失败的变量名"""
+        missing = []
+        data = None
+        parsed = False
+        for var_name, path in step.extractors.items():
+            value = None
+            try:
+                if path.startswith('header.'):
+                    value = response.headers.get(path[7:])
+                elif path == 'status_code':
+                    value = response.status_code
+                elif path == 'body':
+                    value = response.text
+                else:
+                    if not parsed:
+                        parsed = True
+                        try:
+                            data = response.json()
+                        except ValueError:
+                            data = None
+                    if data is not None:
+                        value = compile_path(path).value(data)
+            except Exception as e:
+                logger.warning(f'变量提取失败 {var_name}: {e}')
+            if value is None:
+                missing.append(var_name)
+            else:
+                self.variables[var_name] = value
+        return missing
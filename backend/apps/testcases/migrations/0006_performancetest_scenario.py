@@ -0,0 +1,31 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0002_api_parameterized_data_api_parameterized_mode'),
+        ('testsuites', '0004_testsuite_max_concurrency'),
+        ('testcases', '0005_testcase_files_override'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='performancetest',
+            name='api',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='performance_tests', to='apis.api', verbose_name='关联接口'),
+        ),
+        migrations.AddField(
+            model_name='performancetest',
+            name='testsuite',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='performance_tests', to='testsuites.testsuite', verbose_name='关联测试套件'),
+        ),
+        migrations.AddField(
+            model_name='performancetest',
+            name='scenario',
+            field=models.JSONField(blank=True, default=dict, help_text='套件压测的场景配置：{"mode": "sequential|weighted", "steps": [{"testcase_id": 1, "name": "登录", "weight": 1, "once": false}]}，sequential 每次迭代按顺序执行全部步骤，weighted 按权重随机选择步骤；once 的步骤只在虚拟用户启动时执行一次；steps 留空则使用套件中的全部用例', verbose_name='场景配置'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testcases', '0006_performancetest_scenario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancetest',
+            name='workers',
+            field=models.PositiveIntegerField(blank=True, help_text='分布式压测启动的 Locust worker 进程数，留空则使用系统默认值（LOCUST_WORKERS，默认为CPU核数），1表示单进程', null=True, verbose_name='Worker进程数'),
+        ),
+    ]
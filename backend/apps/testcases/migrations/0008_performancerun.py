@@ -0,0 +1,39 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testcases', '0007_performancetest_workers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('completed', '已完成'), ('failed', '失败')], default='completed', max_length=20, verbose_name='状态')),
+                ('start_time', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('end_time', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('duration', models.FloatField(default=0, verbose_name='运行时长(秒)')),
+                ('threads', models.IntegerField(default=0, verbose_name='并发用户数')),
+                ('workers', models.IntegerField(default=1, verbose_name='Worker进程数')),
+                ('summary', models.JSONField(blank=True, default=dict, verbose_name='汇总指标')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='错误信息')),
+                ('series', models.BinaryField(blank=True, null=True, verbose_name='时间序列')),
+                ('series_names', models.JSONField(blank=True, default=list, help_text='Aggregated 及各请求名称', verbose_name='序列名称')),
+                ('point_count', models.IntegerField(default=0, help_text='汇总序列的数据点数（每秒一个）', verbose_name='数据点数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('performance_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='testcases.performancetest', verbose_name='性能测试')),
+            ],
+            options={
+                'verbose_name': '性能测试运行记录',
+                'verbose_name_plural': '性能测试运行记录',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['performance_test', '-created_at'], name='perfrun_test_created_idx')],
+            },
+        ),
+    ]
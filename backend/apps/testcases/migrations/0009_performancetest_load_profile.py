@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testcases', '0008_performancerun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancetest',
+            name='load_profile',
+            field=models.JSONField(blank=True, default=dict, help_text='施压方式：{"type": "closed|constant_arrival|step|spike|stages", ...}，留空为固定并发（closed），参数说明见 apps.testcases.load_profiles', verbose_name='负载模型'),
+        ),
+    ]
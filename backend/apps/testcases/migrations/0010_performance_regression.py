@@ -0,0 +1,34 @@
+# Generated manually
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testcases', '0009_performancetest_load_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancetest',
+            name='baseline_run',
+            field=models.ForeignKey(blank=True, help_text='回归检测的比较基准，留空则不做回归检测', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='testcases.performancerun', verbose_name='基线运行'),
+        ),
+        migrations.AddField(
+            model_name='performancetest',
+            name='regression_tolerances',
+            field=models.JSONField(blank=True, default=dict, help_text='{"p95_response_time": 10, "throughput": 10, "error_rate": 1}：p95 上升、吞吐量下降的百分比，错误率上升的百分点，留空的指标使用默认值', verbose_name='回归容差'),
+        ),
+        migrations.AddField(
+            model_name='performancerun',
+            name='verdict',
+            field=models.CharField(blank=True, choices=[('passed', '无回归'), ('failed', '性能回归')], max_length=20, null=True, verbose_name='回归判定'),
+        ),
+        migrations.AddField(
+            model_name='performancerun',
+            name='regression',
+            field=models.JSONField(blank=True, default=dict, verbose_name='回归检测详情'),
+        ),
+    ]
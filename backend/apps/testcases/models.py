@@ -81,7 +81,24 @@ class PerformanceTest(models.Model):
     """性能测试模型"""
     name = models.CharField(max_length=200, verbose_name='性能测试名称')
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='performance_tests', verbose_name='所属项目')
-    api = models.ForeignKey(API, on_delete=models.CASCADE, related_name='performance_tests', verbose_name='关联接口')
+    api = models.ForeignKey(API, on_delete=models.CASCADE, null=True, blank=True, related_name='performance_tests', verbose_name='关联接口')
+    # 场景压测：按套件中的用例顺序串联请求（与 api 二选一，设置套件时忽略 api）
+    testsuite = models.ForeignKey(
+        'testsuites.TestSuite',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='performance_tests',
+        verbose_name='关联测试套件'
+    )
+    scenario = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='场景配置',
+        help_text='套件压测的场景配置：{"mode": "sequential|weighted", "steps": [{"testcase_id": 1, "name": "登录", "weight": 1, "once": false}]}，'
+                  'sequential 每次迭代按顺序执行全部步骤，weighted 按权重随机选择步骤；once 的步骤只在虚拟用户启动时执行一次；'
+                  'steps 留空则使用套件中的全部用例'
+    )
     environment = models.ForeignKey(Environment, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='测试环境')
     description = models.TextField(blank=True, null=True, verbose_name='测试描述')
     
@@ -90,6 +107,37 @@ class PerformanceTest(models.Model):
     ramp_up = models.IntegerField(default=10, verbose_name='启动时间(秒)', help_text='所有线程启动完成所需的时间')
     duration = models.IntegerField(default=60, verbose_name='持续时间(秒)', help_text='测试持续运行的时间，0表示使用循环次数')
     loops = models.IntegerField(default=1, verbose_name='循环次数', help_text='每个线程执行的次数，-1表示无限循环')
+    load_profile = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='负载模型',
+        help_text='施压方式：{"type": "closed|constant_arrival|step|spike|stages", ...}，留空为固定并发（closed），'
+                  '参数说明见 apps.testcases.load_profiles'
+    )
+    workers = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Worker进程数',
+        help_text='分布式压测启动的 Locust worker 进程数，留空则使用系统默认值（LOCUST_WORKERS，默认为CPU核数），1表示单进程'
+    )
+    
+    # 性能回归检测：每次运行结束后与基线运行比较（见 apps.testcases.regression）
+    baseline_run = models.ForeignKey(
+        'PerformanceRun',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='基线运行',
+        help_text='回归检测的比较基准，留空则不做回归检测'
+    )
+    regression_tolerances = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='回归容差',
+        help_text='{"p95_response_time": 10, "throughput": 10, "error_rate": 1}：p95 上升、吞吐量下降的百分比，'
+                  '错误率上升的百分点，留空的指标使用默认值'
+    )
     
     # JMeter 配置
     jmx_file = models.CharField(max_length=500, blank=True, null=True, verbose_name='JMX文件路径', help_text='自定义JMX文件路径，留空则自动生成')
@@ -111,4 +159,60 @@ class PerformanceTest(models.Model):
         return self.name
 
 
+class PerformanceRun(models.Model):
+    """性能测试运行记录（每次执行一条，保存汇总指标和每秒的时间序列）"""
+    STATUS_CHOICES = [
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+    VERDICT_CHOICES = [
+        ('passed', '无回归'),
+        ('failed', '性能回归'),
+    ]
+
+    performance_test = models.ForeignKey(PerformanceTest, on_delete=models.CASCADE, related_name='runs', verbose_name='性能测试')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed', verbose_name='状态')
+    start_time = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    end_time = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    duration = models.FloatField(default=0, verbose_name='运行时长(秒)')
+    # 运行时的压测参数快照
+    threads = models.IntegerField(default=0, verbose_name='并发用户数')
+    workers = models.IntegerField(default=1, verbose_name='Worker进程数')
+    summary = models.JSONField(default=dict, blank=True, verbose_name='汇总指标')
+    error = models.TextField(blank=True, null=True, verbose_name='错误信息')
+    # 每秒时间序列（按列编码、zlib 压缩，见 apps.testcases.series）
+    series = models.BinaryField(null=True, blank=True, verbose_name='时间序列')
+    series_names = models.JSONField(default=list, blank=True, verbose_name='序列名称', help_text='Aggregated 及各请求名称')
+    point_count = models.IntegerField(default=0, verbose_name='数据点数', help_text='汇总序列的数据点数（每秒一个）')
+    # 与基线运行的比较结果（没有基线或运行失败时为空）
+    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES, null=True, blank=True, verbose_name='回归判定')
+    regression = models.JSONField(default=dict, blank=True, verbose_name='回归检测详情')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '性能测试运行记录'
+        verbose_name_plural = '性能测试运行记录'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['performance_test', '-created_at'], name='perfrun_test_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.performance_test.name} #{self.id}'
+
+    def compare_to(self, baseline: 'PerformanceRun', tolerances=None):
+        """与基线运行比较（汇总指标 + 稳定阶段的每秒数据），返回 apps.testcases.regression.compare_runs 的结果"""
+        from django.conf import settings
+        from .regression import compare_runs
+        from .series import AGGREGATED, decode_series
 
+        comparison = compare_runs(
+            baseline.summary or {},
+            self.summary or {},
+            decode_series(baseline.series).get(AGGREGATED),
+            decode_series(self.series).get(AGGREGATED),
+            tolerances,
+            getattr(settings, 'PERF_REGRESSION_ALPHA', 0.05),
+        )
+        comparison['baseline_run_id'] = baseline.id
+        return comparison
@@ -0,0 +1,182 @@
+"""
+性能回归检测（不依赖 Django）
+
+每次运行结束后与性能测试固定的基线运行比较，三项指标都在容差内为 passed，任一项回归为 failed：
+- p95_response_time：p95 响应时间上升超过容差（百分比）
+- throughput：吞吐量下降超过容差（百分比）
+- error_rate：错误率上升超过容差（百分点）
+
+只看汇总值容易把抖动误判为回归，因此同时做显著性检验，变化超过容差且显著（p 值 < alpha）才判定为回归：
+- p95/吞吐量：两次运行稳定阶段（并发用户数达到最大值后）的每秒 p95/RPS 做单侧 Mann-Whitney U 检验
+- 错误率：失败请求数做单侧两比例 z 检验
+每秒数据点不足 MIN_SAMPLES 时无法检验，只按容差判定。
+"""
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+# 默认容差
+DEFAULT_TOLERANCES = {
+    'p95_response_time': 10.0,  # p95 最多上升 10%
+    'throughput': 10.0,  # 吞吐量最多下降 10%
+    'error_rate': 1.0,  # 错误率最多上升 1 个百分点
+}
+# 显著性水平
+DEFAULT_ALPHA = 0.05
+# 做显著性检验需要的每秒数据点数（每次运行）
+MIN_SAMPLES = 5
+
+# 指标 -> (汇总字段, 每秒序列列名, 变差方向：1 为上升变差，-1 为下降变差, 容差单位)
+METRICS = {
+    'p95_response_time': ('p95_response_time', 'p95', 1, 'percent'),
+    'throughput': ('throughput', 'rps', -1, 'percent'),
+    'error_rate': ('error_rate', None, 1, 'points'),
+}
+
+
+def validate_tolerances(tolerances: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """校验容差配置，返回合并默认值后的容差，错误时抛出 ValueError"""
+    tolerances = tolerances or {}
+    if not isinstance(tolerances, dict):
+        raise ValueError('回归容差必须是对象')
+    result = dict(DEFAULT_TOLERANCES)
+    for key, value in tolerances.items():
+        if key not in DEFAULT_TOLERANCES:
+            raise ValueError(f"不支持的回归指标: {key}（可选: {', '.join(DEFAULT_TOLERANCES)}）")
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'回归容差 {key} 必须是数字')
+        if value < 0:
+            raise ValueError(f'回归容差 {key} 不能小于 0')
+        result[key] = value
+    return result
+
+
+def _normal_sf(z: float) -> float:
+    """标准正态分布的上尾概率 P(Z > z)"""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def mann_whitney_greater(current: Sequence[float], baseline: Sequence[float]) -> Optional[float]:
+    """
+    单侧 Mann-Whitney U 检验（正态近似，含结值校正）：current 是否整体大于 baseline
+    :return: p 值，样本不足时返回 None
+    """
+    n1, n2 = len(current), len(baseline)
+    if n1 < MIN_SAMPLES or n2 < MIN_SAMPLES:
+        return None
+    values = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(values)
+    tie_term = 0
+    index = 0
+    while index < len(values):
+        end = index
+        while end + 1 < len(values) and values[end + 1][0] == values[index][0]:
+            end += 1
+        rank = (index + end) / 2 + 1  # 结值取平均秩
+        for position in range(index, end + 1):
+            ranks[position] = rank
+        ties = end - index + 1
+        tie_term += ties ** 3 - ties
+        index = end + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, values) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        # 所有值相同，没有差异
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)  # 连续性校正
+    return _normal_sf(z)
+
+
+def two_proportion_greater(current_failures: int, current_total: int,
+                           baseline_failures: int, baseline_total: int) -> Optional[float]:
+    """单侧两比例 z 检验：current 的失败比例是否大于 baseline，请求数为 0 时返回 None"""
+    if not current_total or not baseline_total:
+        return None
+    pooled = (current_failures + baseline_failures) / (current_total + baseline_total)
+    variance = pooled * (1 - pooled) * (1 / current_total + 1 / baseline_total)
+    if variance <= 0:
+        return 1.0
+    z = (current_failures / current_total - baseline_failures / baseline_total) / math.sqrt(variance)
+    return _normal_sf(z)
+
+
+def steady_samples(columns: Optional[Dict[str, list]], column: str) -> List[float]:
+    """稳定阶段（并发用户数达到最大值后）的每秒数据，排除启动阶段"""
+    if not columns or column not in columns:
+        return []
+    users = columns.get('users') or []
+    peak = max((value for value in users if value is not None), default=None)
+    return [
+        value for value, user_count in zip(columns[column], users)
+        if value is not None and (peak is None or user_count == peak)
+    ]
+
+
+def _number(summary: Dict[str, Any], key: str) -> float:
+    try:
+        return float(summary.get(key) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any],
+                 baseline_series: Optional[Dict[str, list]] = None,
+                 current_series: Optional[Dict[str, list]] = None,
+                 tolerances: Optional[Dict[str, Any]] = None,
+                 alpha: float = DEFAULT_ALPHA) -> Dict[str, Any]:
+    """
+    比较本次运行与基线运行
+    :param baseline/current: 运行的汇总指标（PerformanceRun.summary）
+    :param baseline_series/current_series: 汇总序列的列数据（decode_series 结果中的 Aggregated），可为空
+    :return: {'verdict': 'passed'|'failed', 'alpha', 'regressions': [指标], 'metrics': {指标: 比较详情}}
+    """
+    tolerances = validate_tolerances(tolerances)
+    metrics = {}
+    for metric, (field, column, direction, unit) in METRICS.items():
+        base_value = _number(baseline, field)
+        value = _number(current, field)
+        if unit == 'points':
+            change = value - base_value
+        elif base_value:
+            change = (value - base_value) / base_value * 100
+        else:
+            change = 0.0 if not value else math.inf
+        worse = change * direction  # 变差的幅度（正数为变差）
+
+        if metric == 'error_rate':
+            p_value = two_proportion_greater(
+                int(_number(current, 'failed_samples')), int(_number(current, 'total_samples')),
+                int(_number(baseline, 'failed_samples')), int(_number(baseline, 'total_samples')),
+            )
+        else:
+            current_samples = steady_samples(current_series, column)
+            baseline_samples = steady_samples(baseline_series, column)
+            if direction < 0:
+                # 检验“下降”：交换两组
+                p_value = mann_whitney_greater(baseline_samples, current_samples)
+            else:
+                p_value = mann_whitney_greater(current_samples, baseline_samples)
+
+        exceeded = worse > tolerances[metric]
+        significant = p_value is None or p_value < alpha
+        metrics[metric] = {
+            'baseline': base_value,
+            'current': value,
+            'change': None if math.isinf(change) else round(change, 2),
+            'unit': unit,
+            'tolerance': tolerances[metric],
+            'p_value': None if p_value is None else float(f'{p_value:.3g}'),
+            'regressed': exceeded and significant,
+        }
+
+    regressions = [metric for metric, detail in metrics.items() if detail['regressed']]
+    return {
+        'verdict': 'failed' if regressions else 'passed',
+        'alpha': alpha,
+        'regressions': regressions,
+        'metrics': metrics,
+    }
@@ -0,0 +1,268 @@
+"""
+测试用例执行流程（普通执行和参数化执行）
+
+执行记录由接口请求创建，实际执行在后台任务中完成（见 apps.executions.jobs）。
+"""
+import logging
+import traceback
+from typing import Dict, Any, List, Optional
+from django.utils import timezone
+from apps.executions.models import Execution
+from apps.executions.recorder import ExecutionRecorder
+from apps.executions.rollups import record_finished
+from apps.executions.blobs import summarize_result
+from apps.environments.tokens import GlobalTokenResolver
+from .executor import TestCaseExecutor, AsyncTestCaseExecutor, execute_concurrently, is_async_execution_enabled
+
+logger = logging.getLogger(__name__)
+
+
+def create_testcase_execution(testcase, user=None, parameterized=False) -> Execution:
+    """创建用例执行记录（参数化执行时为父记录），状态为待执行"""
+    if parameterized:
+        return Execution.objects.create(
+            name=f"{testcase.name} [参数化执行] - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            project=testcase.project,
+            testcase=testcase,
+            executor=user,
+            status='pending',
+            execution_type='parameterized',
+            parent=None  # 父记录
+        )
+    return Execution.objects.create(
+        name=f"{testcase.name} - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        project=testcase.project,
+        testcase=testcase,
+        executor=user,
+        status='pending'
+    )
+
+
+class TestCaseRunner:
+    """测试用例执行流程"""
+
+    def __init__(self, testcase, user=None):
+        """
+        :param testcase: TestCase 实例
+        :param user: 执行人（可选）
+        """
+        self.testcase = testcase
+        self.user = user
+        # 同一次执行（含参数化的多组参数）共用一个全局Token解析器
+        self.token_resolver = GlobalTokenResolver()
+
+    def run(self, execution, parameterized_data: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        执行用例并更新执行记录
+        :param execution: 执行记录（参数化执行时为父记录）
+        :param parameterized_data: 参数化数据（为空时普通执行）
+        :return: 执行汇总
+        """
+        execution.status = 'running'
+        execution.start_time = timezone.now()
+        execution.save(update_fields=['status', 'start_time'])
+
+        if parameterized_data:
+            return self._run_parameterized(execution, parameterized_data)
+        return self._run_single(execution)
+
+    def _run_single(self, execution) -> Dict[str, Any]:
+        """普通执行：单次"""
+        testcase = self.testcase
+        try:
+            # 执行测试用例
+            executor = TestCaseExecutor(testcase, testcase.environment, self.token_resolver)
+            result = executor.execute()
+
+            # 更新执行记录
+            end_time = timezone.now()
+            # 优先使用HTTP请求的实际时间（result.time），如果没有则使用总执行时间
+            http_time = result.get('time')
+            if http_time:
+                # result.time是毫秒，转换为秒
+                duration = http_time / 1000.0
+            else:
+                # 如果没有HTTP时间，使用总执行时间（包含程序执行时间）
+                duration = (end_time - execution.start_time).total_seconds()
+
+            execution.status = 'passed' if result.get('success', False) else 'failed'
+            execution.result = result
+            execution.end_time = end_time
+            execution.duration = duration
+            execution.save()
+            record_finished([execution])
+
+            return {
+                'execution_id': execution.id,
+                'status': execution.status,
+                'result': result,
+                'message': '执行完成'
+            }
+
+        except Exception as e:
+            # 执行失败，更新执行记录
+            logger.warning(f"用例 {testcase.name} 执行异常: {e}")
+            end_time = timezone.now()
+            # 执行失败时，使用总执行时间
+            duration = (end_time - execution.start_time).total_seconds()
+
+            execution.status = 'failed'
+            execution.result = {
+                'error': str(e),
+                'traceback': traceback.format_exc(),
+                'success': False
+            }
+            execution.end_time = end_time
+            execution.duration = duration
+            execution.save()
+            record_finished([execution])
+
+            return {
+                'execution_id': execution.id,
+                'status': 'failed',
+                'error': str(e),
+                'message': '执行失败'
+            }
+
+    def _run_parameterized(self, parent_execution, parameterized_data) -> Dict[str, Any]:
+        """参数化执行：每组参数创建一条子记录"""
+        testcase = self.testcase
+        parent_start_time = parent_execution.start_time
+
+        results = []
+        passed_count = 0
+        failed_count = 0
+        total_time = 0
+
+        # 为每组参数创建子执行记录（执行完成后由 ExecutionRecorder 批量写入）
+        recorder = ExecutionRecorder(parent_execution, total=len(parameterized_data))
+        executions = []
+        for idx, param_set in enumerate(parameterized_data):
+            execution = recorder.new(
+                name=f"{testcase.name} [参数化#{idx+1}] - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                project=testcase.project,
+                testcase=testcase,
+                executor=self.user,
+                status='running',
+                start_time=timezone.now(),
+                execution_type='parameterized',
+                parent=parent_execution  # 关联到父记录
+            )
+            executions.append(execution)
+
+        def finish(idx, result=None, error=None, error_trace=None):
+            """记录一组参数的执行结果（完成后立即提交给 ExecutionRecorder，执行过程中即可看到进度）"""
+            nonlocal passed_count, failed_count, total_time
+            execution = executions[idx]
+            end_time = timezone.now()
+            if error is None:
+                # 更新执行记录
+                http_time = result.get('time')
+                if http_time:
+                    duration = http_time / 1000.0
+                else:
+                    duration = (end_time - execution.start_time).total_seconds()
+
+                execution.status = 'passed' if result.get('success', False) else 'failed'
+                execution.result = result
+
+                if result.get('success', False):
+                    passed_count += 1
+                else:
+                    failed_count += 1
+                total_time += result.get('time', 0)
+
+                item = {
+                    'execution_id': None,  # 子记录写入后回填
+                    'index': idx + 1,
+                    'status': execution.status,
+                    'result': summarize_result(result),  # 完整结果在子执行记录中
+                    'duration': duration
+                }
+            else:
+                # 执行失败，更新执行记录
+                duration = (end_time - execution.start_time).total_seconds()
+
+                execution.status = 'failed'
+                execution.result = {
+                    'error': str(error),
+                    'traceback': error_trace,
+                    'success': False
+                }
+
+                failed_count += 1
+                item = {
+                    'execution_id': None,  # 子记录写入后回填
+                    'index': idx + 1,
+                    'status': 'failed',
+                    'error': str(error),
+                    'duration': duration
+                }
+            execution.end_time = end_time
+            execution.duration = duration
+            results.append(item)
+            recorder.record(execution, item)
+
+        if is_async_execution_enabled():
+            # 异步模式：所有参数组合在同一个事件循环中并发发送请求，每组完成时立即记录
+            executors = []
+            for idx, param_set in enumerate(parameterized_data):
+                try:
+                    executor = AsyncTestCaseExecutor(testcase, testcase.environment, self.token_resolver)
+                    executor.variables.update(param_set)
+                    executors.append((idx, executor))
+                except Exception as e:
+                    finish(idx, error=e, error_trace=traceback.format_exc())
+            if executors:
+                execute_concurrently(
+                    [executor for _, executor in executors],
+                    on_result=lambda position, result: finish(executors[position][0], result),
+                )
+        else:
+            for idx, param_set in enumerate(parameterized_data):
+                execution = executions[idx]
+                try:
+                    # 执行测试用例，传入参数化变量
+                    execution.start_time = timezone.now()
+                    executor = TestCaseExecutor(testcase, testcase.environment, self.token_resolver)
+                    # 将参数化数据合并到执行器的变量中
+                    executor.variables.update(param_set)
+                    result = executor.execute()
+                except Exception as e:
+                    finish(idx, error=e, error_trace=traceback.format_exc())
+                else:
+                    finish(idx, result)
+
+        # 写入剩余的子执行记录（异步模式按完成顺序记录，结果按参数顺序排列）
+        recorder.close()
+        results.sort(key=lambda item: item['index'])
+        execution_ids = [item['execution_id'] for item in results]
+
+        # 更新父执行记录
+        parent_end_time = timezone.now()
+        parent_duration = (parent_end_time - parent_start_time).total_seconds()
+        parent_execution.status = 'passed' if failed_count == 0 else 'failed'
+        parent_execution.result = {
+            'parameterized': True,
+            'total': len(results),
+            'passed': passed_count,
+            'failed': failed_count,
+            'total_time': round(total_time, 2),
+            'results': results
+        }
+        parent_execution.end_time = parent_end_time
+        parent_execution.duration = parent_duration
+        parent_execution.save()
+        record_finished([parent_execution])
+
+        return {
+            'parameterized': True,
+            'execution_id': parent_execution.id,  # 返回父记录的ID
+            'total': len(results),
+            'passed': passed_count,
+            'failed': failed_count,
+            'total_time': round(total_time, 2),
+            'execution_ids': execution_ids,
+            'results': results,
+            'message': f'参数化执行完成：{passed_count}通过，{failed_count}失败'
+        }
@@ -0,0 +1,473 @@
+"""
+用户脚本沙箱执行
+
+前置/后置脚本、手动断言脚本和环境钩子不再在 Web/worker 进程内 exec，而是交给预先启动的脚本进程池执行：
+- 每个脚本有墙钟超时（SCRIPT_TIMEOUT），超时的进程直接结束并补充新进程，死循环不会卡住请求线程
+- 脚本进程启动时设置地址空间上限（SCRIPT_MEMORY_LIMIT_MB）
+- 进程常驻复用，同一进程内按脚本摘要缓存编译结果，只有首次执行某个脚本时才发送源码
+
+通信协议（stdin/stdout，4字节长度 + 数据）：
+    请求（主进程 -> 脚本进程，pickle）: (摘要, 源码或None, 内置函数集, 上下文数据)
+    响应（脚本进程 -> 主进程，JSON）: {'status': ok/assertion/error, 'variables', 'removed', 'output', 'error'}
+脚本进程的响应使用 JSON 而不是 pickle，脚本即使逃逸出受限环境也无法让主进程反序列化任意对象。
+响应中只包含脚本新增或修改的变量（variables）和删除的变量名（removed），未修改的变量不经过 JSON 转换；
+脚本写入的值必须能无损转换为 JSON（字符串、数字、布尔、None 及其组成的列表/字典），
+datetime、Decimal、bytes 等值不会被悄悄转为字符串，而是作为脚本错误返回。
+
+SCRIPT_SANDBOX_ENABLED=False 时（或脚本进程无法启动时）回退到进程内执行，执行逻辑与沙箱内一致。
+"""
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import pickle
+import select
+import struct
+import logging
+import threading
+import subprocess
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+
+
+class ScriptTimeout(Exception):
+    """脚本执行超时"""
+
+
+class ScriptAssertionError(AssertionError):
+    """手动断言脚本断言失败"""
+
+
+class ScriptError(Exception):
+    """脚本执行错误（包括脚本进程异常退出）"""
+
+
+# 各类脚本可用的内置函数
+_BASIC_BUILTINS = {
+    'len': len, 'str': str, 'int': int, 'float': float, 'bool': bool,
+    'list': list, 'dict': dict, 'tuple': tuple, 'range': range,
+}
+_EXTENDED_BUILTINS = {
+    **_BASIC_BUILTINS,
+    'type': type, 'isinstance': isinstance, 'hasattr': hasattr,
+    'getattr': getattr, 'setattr': setattr, 'round': round,
+    'abs': abs, 'min': min, 'max': max, 'sum': sum,
+}
+
+
+def _hook_builtins() -> Dict[str, Any]:
+    """环境前置钩子额外提供签名所需的模块"""
+    import hmac, hashlib, base64, uuid
+    return {
+        **_EXTENDED_BUILTINS,
+        'hmac': hmac, 'hashlib': hashlib, 'base64': base64,
+        'time': time, 'json': json, 'uuid': uuid,
+    }
+
+
+BUILTIN_PROFILES = {
+    'pre_script': lambda: _BASIC_BUILTINS,
+    'post_script': lambda: _EXTENDED_BUILTINS,
+    'pre_hook': _hook_builtins,
+    'post_hook': lambda: _EXTENDED_BUILTINS,
+    'assertion': lambda: {},
+}
+
+
+# 手动断言辅助函数
+
+def assert_equal(actual, expected, message=''):
+    if actual != expected:
+        raise AssertionError(f"{message} 期望: {expected}, 实际: {actual}")
+    return True
+
+
+def assert_not_equal(actual, expected, message=''):
+    if actual == expected:
+        raise AssertionError(f"{message} 不应等于: {expected}, 实际: {actual}")
+    return True
+
+
+def assert_contains(container, item, message=''):
+    if item not in container:
+        raise AssertionError(f"{message} 期望包含: {item}, 实际: {container}")
+    return True
+
+
+def assert_greater_than(actual, expected, message=''):
+    if actual <= expected:
+        raise AssertionError(f"{message} 期望 > {expected}, 实际: {actual}")
+    return True
+
+
+def assert_less_than(actual, expected, message=''):
+    if actual >= expected:
+        raise AssertionError(f"{message} 期望 < {expected}, 实际: {actual}")
+    return True
+
+
+def assert_true(condition, message=''):
+    if not condition:
+        raise AssertionError(f"{message} 期望为True, 实际为False")
+    return True
+
+
+def assert_false(condition, message=''):
+    if condition:
+        raise AssertionError(f"{message} 期望为False, 实际为True")
+    return True
+
+
+ASSERTION_HELPERS = {
+    'assert_equal': assert_equal,
+    'assert_not_equal': assert_not_equal,
+    'assert_contains': assert_contains,
+    'assert_greater_than': assert_greater_than,
+    'assert_less_than': assert_less_than,
+    'assert_true': assert_true,
+    'assert_false': assert_false,
+}
+
+
+def snapshot(instance) -> Optional[SimpleNamespace]:
+    """模型实例的字段快照（脚本中可照常使用 testcase.name、api.method 等字段）"""
+    if instance is None:
+        return None
+    return SimpleNamespace(**{field.attname: getattr(instance, field.attname)
+                              for field in instance._meta.concrete_fields})
+
+
+class _Namespace(dict):
+    """脚本命名空间：body/json 在脚本首次使用时才解码/解析"""
+
+    def __init__(self, response, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._response = response
+
+    def __missing__(self, key):
+        if self._response is None or key not in ('body', 'json'):
+            raise KeyError(key)
+        value = self._response.text if key == 'body' else self._response.json_data
+        self[key] = value
+        return value
+
+
+def run_code(code, profile: str, payload: Dict[str, Any], variables: Dict[str, Any], output: List[str]) -> None:
+    """
+    执行脚本（沙箱进程和进程内回退共用）
+    :param payload: 上下文数据（variables 以外的部分）
+    :param variables: 运行时变量（脚本可直接修改）
+    :param output: 收集脚本 print 输出
+    """
+    from .capture import CapturedResponse
+    from .jsonpath import compile_path
+
+    response = None
+    response_data = payload.get('response')
+    if response_data is not None:
+        if isinstance(response_data, CapturedResponse):
+            response = response_data
+        else:
+            status_code, headers, content = response_data
+            response = CapturedResponse(status_code, headers, content)
+
+    def get_json_value(path):
+        data = response.json_data if response is not None else None
+        return compile_path(path).value(data) if data is not None else None
+
+    def script_print(*args, sep=' ', end='', **kwargs):
+        output.append(sep.join(str(arg) for arg in args) + end)
+
+    namespace = _Namespace(response, {
+        key: value for key, value in payload.items() if key != 'response'
+    })
+    namespace.update({
+        'variables': variables,
+        'set_variable': lambda name, value: variables.update({name: value}),
+        'get_variable': lambda name: variables.get(name),
+        'print': script_print,
+    })
+    if 'response' in payload:
+        namespace.update({
+            'status_code': response.status_code if response is not None else None,
+            'headers': dict(response.headers) if response is not None else {},
+            'response': response,
+            'get_json_value': get_json_value,
+        })
+        if response is None:
+            namespace.update({'body': '', 'json': None})
+    if profile == 'assertion':
+        namespace.update(ASSERTION_HELPERS)
+    exec(code, {'__builtins__': BUILTIN_PROFILES[profile]()}, namespace)
+
+
+def _variable_changes(original: Dict[str, Any], variables: Dict[str, Any]):
+    """
+    脚本执行前后变量的差异
+    :return: (新增或修改的变量, 删除的变量名)
+    :raises ScriptError: 新增或修改的值不能无损转换为 JSON
+    """
+    changed = {}
+    for name, value in variables.items():
+        if name in original and type(original[name]) is type(value) and original[name] == value:
+            continue
+        try:
+            encoded = json.dumps(value, ensure_ascii=False, allow_nan=False)
+        except (TypeError, ValueError) as e:
+            raise ScriptError(f'变量 {name} 的值无法保存（{type(value).__name__}）: {e}，'
+                              f'只支持字符串、数字、布尔、None 及其组成的列表和字典')
+        if json.loads(encoded) != value:
+            raise ScriptError(f'变量 {name} 的值无法保存（{type(value).__name__}），'
+                              f'转换为 JSON 后会改变（如元组、非字符串的字典键）')
+        changed[name] = value
+    removed = [name for name in original if name not in variables]
+    return changed, removed
+
+
+def _apply_changes(variables: Dict[str, Any], changed: Dict[str, Any], removed: List[str]) -> None:
+    """把脚本修改的变量写回（未修改的变量保持原值）"""
+    if changed:
+        variables.update(changed)
+    for name in removed:
+        variables.pop(name, None)
+
+
+# 脚本进程
+
+def _read_frame(stream) -> Optional[bytes]:
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    return stream.read(_HEADER.unpack(header)[0])
+
+
+def _write_frame(stream, data: bytes) -> None:
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _worker_main(memory_limit_mb: int) -> None:
+    """脚本进程主循环"""
+    # 协议使用原 stdout，脚本中的任何直接输出都重定向到 stderr，不会破坏通信数据
+    channel = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    requests_in = sys.stdin.buffer
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    codes = {}
+    while True:
+        frame = _read_frame(requests_in)
+        if frame is None:
+            return
+        digest, source, profile, payload = pickle.loads(frame)
+        original = payload.pop('variables', None) or {}
+        variables = copy.deepcopy(original)
+        output: List[str] = []
+        reply = {'status': 'ok', 'error': None}
+        try:
+            if source is not None:
+                codes[digest] = compile(source, '<script>', 'exec')
+            code = codes.get(digest)
+            if code is None:
+                raise ScriptError('脚本未发送')
+            run_code(code, profile, payload, variables, output)
+        except AssertionError as e:
+            reply = {'status': 'assertion', 'error': str(e)}
+        except MemoryError:
+            reply = {'status': 'error', 'error': '脚本内存超出限制'}
+        except BaseException as e:
+            reply = {'status': 'error', 'error': str(e)}
+        reply['output'] = output
+        try:
+            reply['variables'], reply['removed'] = _variable_changes(original, variables)
+        except ScriptError as e:
+            reply.update({'status': 'error', 'error': str(e), 'variables': None, 'removed': []})
+        _write_frame(channel, json.dumps(reply, ensure_ascii=False).encode('utf-8'))
+
+
+class _Worker:
+    """常驻的脚本进程"""
+
+    def __init__(self, memory_limit_mb: int):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'apps.testcases.sandbox', str(memory_limit_mb)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=str(settings.BASE_DIR),
+        )
+        # 该进程已编译的脚本摘要（再次执行时不再发送源码）
+        self.digests = set()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def call(self, message, timeout: float) -> Dict[str, Any]:
+        _write_frame(self.process.stdin, pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+        deadline = time.monotonic() + timeout
+        header = self._read(_HEADER.size, deadline)
+        return json.loads(self._read(_HEADER.unpack(header)[0], deadline))
+
+    def _read(self, size: int, deadline: float) -> bytes:
+        fd = self.process.stdout.fileno()
+        chunks = []
+        while size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise ScriptTimeout()
+            chunk = os.read(fd, size)
+            if not chunk:
+                raise ScriptError('脚本进程异常退出')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class ScriptPool:
+    """脚本进程池（进程常驻复用，超时或异常退出的进程被替换）"""
+
+    def __init__(self, size: int, timeout: float, memory_limit_mb: int):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._idle: 'queue.LifoQueue[_Worker]' = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _Worker(self.memory_limit_mb)
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    def _discard(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._created -= 1
+
+    def run(self, compiled, source: str, profile: str, payload: Dict[str, Any],
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        在脚本进程中执行已校验的脚本
+        :return: {'status', 'variables', 'output', 'error'}
+        """
+        worker = self._acquire()
+        if not worker.alive:
+            self._discard(worker)
+            worker = self._acquire()
+        send_source = compiled.digest not in worker.digests
+        message = (compiled.digest, source if send_source else None, profile, payload)
+        try:
+            reply = worker.call(message, timeout or self.timeout)
+        except ScriptTimeout:
+            self._discard(worker)
+            raise ScriptTimeout(f'脚本执行超时（{timeout or self.timeout}秒）')
+        except Exception as e:
+            self._discard(worker)
+            raise ScriptError(f'脚本进程异常: {e}')
+        worker.digests.add(compiled.digest)
+        self._idle.put(worker)
+        return reply
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pool: Optional[ScriptPool] = None
+_pool_lock = threading.Lock()
+
+
+def is_sandbox_enabled() -> bool:
+    return getattr(settings, 'SCRIPT_SANDBOX_ENABLED', True) and os.name == 'posix'
+
+
+def get_script_pool() -> ScriptPool:
+    """获取进程内共享的脚本进程池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ScriptPool(
+                    size=getattr(settings, 'SCRIPT_POOL_SIZE', 2),
+                    timeout=getattr(settings, 'SCRIPT_TIMEOUT', 5),
+                    memory_limit_mb=getattr(settings, 'SCRIPT_MEMORY_LIMIT_MB', 512),
+                )
+    return _pool
+
+
+def run_script(compiled, source: str, profile: str, payload: Dict[str, Any],
+               variables: Dict[str, Any]) -> List[str]:
+    """
+    执行已校验的脚本，脚本新增、修改或删除的变量写回 variables（值必须能无损转换为 JSON）
+    :return: 脚本的 print 输出
+    :raises ScriptAssertionError: 手动断言失败
+    :raises ScriptTimeout / ScriptError: 超时或执行错误
+    """
+    if is_sandbox_enabled():
+        # 响应以（状态码, 响应头, 响应体）发送，脚本进程中按需解码和解析
+        response = payload.get('response')
+        if response is not None and not isinstance(response, tuple):
+            payload = {**payload, 'response': (response.status_code, dict(response.headers), response.content)}
+        try:
+            reply = get_script_pool().run(compiled, source, profile, {**payload, 'variables': dict(variables)})
+        except OSError as e:
+            logger.warning(f"脚本进程无法启动，改为进程内执行: {e}")
+        else:
+            if reply.get('variables') is not None:
+                _apply_changes(variables, reply['variables'], reply.get('removed') or [])
+            if reply['status'] == 'assertion':
+                raise ScriptAssertionError(reply['error'])
+            if reply['status'] == 'error':
+                raise ScriptError(reply['error'])
+            return reply.get('output') or []
+
+    output: List[str] = []
+    working = copy.deepcopy(dict(variables))
+    error = None
+    try:
+        run_code(compiled.code, profile, payload, working, output)
+    except AssertionError as e:
+        error = ScriptAssertionError(str(e))
+    except Exception as e:
+        error = ScriptError(str(e))
+    # 与脚本进程一致：出错前修改的变量同样写回
+    _apply_changes(variables, *_variable_changes(variables, working))
+    if error is not None:
+        raise error
+    return output
+
+
+if __name__ == '__main__':
+    _worker_main(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
@@ -0,0 +1,110 @@
+"""
+用户脚本编译缓存
+
+前置/后置脚本、手动断言脚本和环境前置/后置钩子每次执行都需要安全校验（ast.parse + ast.walk）和编译。
+校验结果和编译后的代码对象按脚本内容的 SHA-256 缓存，相同内容只校验和编译一次；
+测试用例或环境更新、删除时清除其脚本对应的缓存。
+"""
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from types import CodeType
+from typing import Dict, Optional, Set, Tuple
+
+# 缓存的脚本数量上限（按最近使用淘汰）
+SCRIPT_CACHE_SIZE = 1024
+# 脚本长度上限（字符），防止资源耗尽
+MAX_SCRIPT_LENGTH = 10000
+
+# 禁止的语法节点和函数调用
+FORBIDDEN_NODES = (
+    ast.Import, ast.ImportFrom,  # 禁止导入
+)
+FORBIDDEN_FUNCTIONS = {
+    'open', 'file', '__import__', 'exec', 'eval', 'compile',
+    'reload', 'input', 'raw_input', 'execfile', 'exit', 'quit',
+}
+
+
+class CompiledScript:
+    """脚本校验结果和编译后的代码对象"""
+    __slots__ = ('digest', 'code', 'error')
+
+    def __init__(self, digest: str, code: Optional[CodeType] = None, error: Optional[str] = None):
+        self.digest = digest
+        self.code = code
+        # 拒绝执行的原因（None 表示校验通过）
+        self.error = error
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+
+_cache: 'OrderedDict[str, CompiledScript]' = OrderedDict()
+# 模型实例 -> 其脚本的内容摘要（用于实例更新时清除缓存）
+_owners: Dict[Tuple[str, object], Set[str]] = {}
+_lock = threading.Lock()
+
+
+def _is_safe(tree: ast.AST) -> bool:
+    """检查语法树中是否包含禁止的操作"""
+    for node in ast.walk(tree):
+        # 检查禁止的节点类型
+        if isinstance(node, FORBIDDEN_NODES):
+            return False
+        # 检查禁止的函数调用（包括属性访问，如 builtins.__import__）
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in FORBIDDEN_FUNCTIONS:
+                return False
+            if isinstance(node.func, ast.Attribute) and node.func.attr in FORBIDDEN_FUNCTIONS:
+                return False
+    return True
+
+
+def _compile(digest: str, source: str) -> CompiledScript:
+    try:
+        tree = ast.parse(source)
+    except Exception:
+        # 语法错误等解析失败的脚本同样拒绝执行
+        return CompiledScript(digest, error='包含不安全操作，已拒绝执行')
+    if not _is_safe(tree):
+        return CompiledScript(digest, error='包含不安全操作，已拒绝执行')
+    if len(source) > MAX_SCRIPT_LENGTH:
+        return CompiledScript(digest, error=f'过长（{len(source)}字符），已拒绝执行')
+    try:
+        # 直接编译已解析的语法树，不再重复解析源码
+        return CompiledScript(digest, code=compile(tree, '<script>', 'exec'))
+    except Exception:
+        return CompiledScript(digest, error='包含不安全操作，已拒绝执行')
+
+
+def compile_script(source: str, owner=None) -> CompiledScript:
+    """
+    获取脚本的校验结果和代码对象（按内容摘要缓存）
+    :param source: 脚本源码
+    :param owner: 脚本所属的模型实例（TestCase/Environment），实例更新时清除对应缓存
+    """
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    with _lock:
+        compiled = _cache.get(digest)
+        if compiled is not None:
+            _cache.move_to_end(digest)
+    if compiled is None:
+        compiled = _compile(digest, source)
+        with _lock:
+            _cache[digest] = compiled
+            while len(_cache) > SCRIPT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    if owner is not None and owner.pk is not None:
+        with _lock:
+            _owners.setdefault((owner._meta.label, owner.pk), set()).add(digest)
+    return compiled
+
+
+def invalidate_scripts(sender, instance, **kwargs) -> None:
+    """测试用例或环境更新/删除后清除其脚本的缓存（post_save/post_delete 信号）"""
+    with _lock:
+        for digest in _owners.pop((instance._meta.label, instance.pk), ()):
+            _cache.pop(digest, None)
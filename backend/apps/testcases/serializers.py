@@ -1,12 +1,15 @@
 from rest_framework import serializers
-from .models import TestCase, PerformanceTest
+from .models import TestCase, PerformanceTest, PerformanceRun
+from .load_profiles import validate_profile
+from .regression import validate_tolerances
 from apps.projects.serializers import ProjectSerializer
 from apps.apis.serializers import APISerializer
 from apps.environments.serializers import EnvironmentSerializer
 from apps.projects.models import Project
 from apps.apis.models import API
 from apps.environments.models import Environment
-from apps.executions.models import Execution
+from apps.executions.models import Execution, TestCaseLatestStatus
+from apps.testsuites.models import TestSuite
 
 
 class TestCaseSerializer(serializers.ModelSerializer):
@@ -47,9 +50,16 @@ class TestCaseSerializer(serializers.ModelSerializer):
                   'is_active', 'status', 'duration', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'status', 'duration']
     
+    def _get_latest_execution(self, obj):
+        """获取最新执行记录：优先使用上下文中批量查询的结果（latest_executions），否则单独查询"""
+        latest_executions = self.context.get('latest_executions')
+        if latest_executions is not None and obj.id in latest_executions:
+            return latest_executions[obj.id]
+        return Execution.objects.filter(testcase=obj).order_by('-created_at').first()
+    
     def get_status(self, obj):
         """获取最新执行状态"""
-        latest_execution = Execution.objects.filter(testcase=obj).order_by('-created_at').first()
+        latest_execution = self._get_latest_execution(obj)
         if latest_execution:
             status_map = {
                 'passed': '通过',
@@ -63,7 +73,7 @@ class TestCaseSerializer(serializers.ModelSerializer):
     
     def get_duration(self, obj):
         """获取最新执行耗时"""
-        latest_execution = Execution.objects.filter(testcase=obj).order_by('-created_at').first()
+        latest_execution = self._get_latest_execution(obj)
         if latest_execution and latest_execution.duration:
             # 转换为毫秒
             duration_ms = latest_execution.duration * 1000
@@ -74,6 +84,23 @@ class TestCaseSerializer(serializers.ModelSerializer):
         return None
 
 
+def get_latest_executions(testcase_ids):
+    """
+    批量查询用例的最新执行记录（读取用例最新状态汇总表，一次查询），结果放入序列化器上下文的 latest_executions
+    最新记录的定义与汇总表一致：最近一次已结束的执行（按创建时间、ID）
+    :return: {用例ID: 最新执行记录，没有执行记录时为 None}
+    """
+    testcase_ids = {testcase_id for testcase_id in testcase_ids if testcase_id}
+    if not testcase_ids:
+        return {}
+    latest_executions = dict.fromkeys(testcase_ids)
+    rows = (TestCaseLatestStatus.objects.filter(testcase_id__in=testcase_ids, execution__isnull=False)
+            .select_related('execution').only('testcase_id', 'execution__id', 'execution__status', 'execution__duration'))
+    for row in rows:
+        latest_executions[row.testcase_id] = row.execution
+    return latest_executions
+
+
 class PerformanceTestSerializer(serializers.ModelSerializer):
     """性能测试序列化器"""
     project = ProjectSerializer(read_only=True)
@@ -89,7 +116,16 @@ class PerformanceTestSerializer(serializers.ModelSerializer):
         queryset=API.objects.all(),
         write_only=True,
         source='api',
-        required=True
+        required=False,
+        allow_null=True
+    )
+    testsuite = serializers.SerializerMethodField()
+    testsuite_id = serializers.PrimaryKeyRelatedField(
+        queryset=TestSuite.objects.all(),
+        write_only=True,
+        source='testsuite',
+        required=False,
+        allow_null=True
     )
     environment_id = serializers.PrimaryKeyRelatedField(
         queryset=Environment.objects.all(),
@@ -101,10 +137,68 @@ class PerformanceTestSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PerformanceTest
-        fields = ['id', 'name', 'project', 'project_id', 'api', 'api_id', 'environment', 'environment_id',
-                  'description', 'threads', 'ramp_up', 'duration', 'loops', 'jmx_file',
+        fields = ['id', 'name', 'project', 'project_id', 'api', 'api_id', 'testsuite', 'testsuite_id',
+                  'scenario', 'environment', 'environment_id',
+                  'description', 'threads', 'ramp_up', 'duration', 'loops', 'workers', 'load_profile', 'jmx_file',
+                  'baseline_run', 'regression_tolerances',
                   'last_result', 'last_execution_time', 'is_active', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at', 'last_result', 'last_execution_time']
+        # 基线运行通过 performance-tests/{id}/baseline 接口设置（校验运行记录属于该性能测试）
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_result', 'last_execution_time', 'baseline_run']
+
+    def get_testsuite(self, obj):
+        """关联的测试套件（只返回基本信息）"""
+        if not obj.testsuite_id:
+            return None
+        return {'id': obj.testsuite_id, 'name': obj.testsuite.name}
+
+    def validate_scenario(self, value):
+        """校验场景配置"""
+        value = value or {}
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('场景配置必须是对象')
+        mode = value.get('mode', 'sequential')
+        if mode not in ('sequential', 'weighted'):
+            raise serializers.ValidationError('mode 只能是 sequential 或 weighted')
+        steps = value.get('steps') or []
+        if not isinstance(steps, list):
+            raise serializers.ValidationError('steps 必须是列表')
+        for step in steps:
+            if not isinstance(step, dict) or not step.get('testcase_id'):
+                raise serializers.ValidationError('每个步骤都需要指定 testcase_id')
+            weight = step.get('weight', 1)
+            if not isinstance(weight, int) or weight < 0:
+                raise serializers.ValidationError('weight 必须是非负整数')
+        return value
 
+    def validate_regression_tolerances(self, value):
+        """校验回归容差"""
+        try:
+            validate_tolerances(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value or {}
 
+    def validate(self, attrs):
+        load_profile = attrs.get('load_profile', getattr(self.instance, 'load_profile', None))
+        threads = attrs.get('threads', getattr(self.instance, 'threads', None) or 10)
+        try:
+            validate_profile(load_profile, threads)
+        except ValueError as e:
+            raise serializers.ValidationError({'load_profile': str(e)})
+        api = attrs.get('api', getattr(self.instance, 'api', None))
+        testsuite = attrs.get('testsuite', getattr(self.instance, 'testsuite', None))
+        if not api and not testsuite:
+            raise serializers.ValidationError('请选择压测接口或测试套件')
+        return attrs
 
+
+class PerformanceRunSerializer(serializers.ModelSerializer):
+    """性能测试运行记录序列化器（不包含时间序列，时间序列通过 series 接口按需降采样获取）"""
+    performance_test_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = PerformanceRun
+        fields = ['id', 'performance_test_id', 'status', 'start_time', 'end_time', 'duration',
+                  'threads', 'workers', 'summary', 'error', 'series_names', 'point_count',
+                  'verdict', 'regression', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,133 @@
+"""
+性能测试时间序列
+
+每次性能测试运行结束后，从 <csv_prefix>_stats_history.csv 读取每秒的统计（汇总行和每个请求名称），
+按列存储：时间戳差分编码，各指标为数值数组，整体 JSON 序列化后 zlib 压缩保存到 PerformanceRun.series。
+查询时按需解压并降采样到指定点数，不同运行的曲线按相对开始时间（秒）对齐后可叠加对比。
+"""
+import csv
+import json
+import math
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .live_metrics import is_aggregated, parse_history_row
+
+SERIES_VERSION = 1
+AGGREGATED = 'Aggregated'
+# 存储的指标列
+COLUMNS = (
+    'users', 'rps', 'failures_per_sec', 'p50', 'p90', 'p95', 'p99', 'max',
+    'total_requests', 'total_failures',
+)
+# 累计值列（降采样时取区间最后一个值）
+CUMULATIVE_COLUMNS = ('total_requests', 'total_failures')
+AGGREGATIONS = ('avg', 'max', 'min')
+
+
+def series_key(row: Dict[str, str]) -> str:
+    """序列名称：汇总行为 Aggregated，其余为 '<方法> <请求名称>'"""
+    if is_aggregated(row):
+        return AGGREGATED
+    return f"{row.get('Type', '').strip()} {row.get('Name', '').strip()}".strip()
+
+
+def read_history(history_file: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """读取 stats_history.csv，按序列名称分组（文件不存在时返回空字典）"""
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        with open(history_file, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                point = parse_history_row(row)
+                if point['timestamp'] is None:
+                    continue
+                series.setdefault(series_key(row), []).append(point)
+    except FileNotFoundError:
+        return {}
+    return series
+
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
+
+
+def encode_series(series: Dict[str, List[Dict[str, Any]]]) -> bytes:
+    """按列编码并压缩"""
+    encoded = {}
+    for name, points in series.items():
+        points = sorted(points, key=lambda point: point['timestamp'])
+        timestamps = [point['timestamp'] for point in points]
+        encoded[name] = {
+            't0': timestamps[0] if timestamps else 0,
+            # 时间戳差分（每秒一个点时几乎全为 1，压缩率很高）
+            'dt': [b - a for a, b in zip(timestamps, timestamps[1:])],
+            **{column: [_round(point.get(column)) for point in points] for column in COLUMNS},
+        }
+    raw = json.dumps({'version': SERIES_VERSION, 'series': encoded}, separators=(',', ':'))
+    return zlib.compress(raw.encode('utf-8'))
+
+
+def decode_series(data: Optional[bytes]) -> Dict[str, Dict[str, list]]:
+    """解压并还原为 {序列名称: {'t': [时间戳], 列名: [值]}}"""
+    if not data:
+        return {}
+    payload = json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+    series = {}
+    for name, encoded in payload.get('series', {}).items():
+        timestamps = [encoded['t0']]
+        for delta in encoded['dt']:
+            timestamps.append(timestamps[-1] + delta)
+        series[name] = {'t': timestamps, **{column: encoded.get(column, []) for column in COLUMNS}}
+    return series
+
+
+def build_series(csv_prefix: Optional[str]):
+    """
+    读取一次运行的时间序列并编码
+    :return: (压缩后的序列, 序列名称列表, 汇总序列的数据点数)，没有历史文件时序列为 None
+    """
+    series = read_history(Path(f'{csv_prefix}_stats_history.csv')) if csv_prefix else {}
+    if not series:
+        return None, [], 0
+    names = sorted(series, key=lambda name: (name != AGGREGATED, name))
+    return encode_series(series), names, len(series.get(AGGREGATED, []))
+
+
+def _aggregate(values: List, agg: str):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    if agg == 'max':
+        return max(values)
+    if agg == 'min':
+        return min(values)
+    return round(sum(values) / len(values), 2)
+
+
+def downsample(columns: Dict[str, list], points: int, agg: str = 'avg',
+               metrics: Optional[List[str]] = None, start: Optional[int] = None) -> Dict[str, list]:
+    """
+    降采样到不超过 points 个点
+    :param agg: 区间内的聚合方式（avg/max/min），累计值列总是取区间最后一个值
+    :param metrics: 返回的指标列（默认全部）
+    :param start: 运行开始时间戳，返回的 offset 为相对开始时间的秒数（用于叠加对比不同运行）
+    """
+    timestamps = columns.get('t', [])
+    metrics = [column for column in (metrics or COLUMNS) if column in COLUMNS]
+    size = max(1, math.ceil(len(timestamps) / max(1, points)))
+    if start is None:
+        start = timestamps[0] if timestamps else 0
+
+    result = {'t': [], 'offset': []}
+    result.update({column: [] for column in metrics})
+    for index in range(0, len(timestamps), size):
+        result['t'].append(timestamps[index])
+        result['offset'].append(timestamps[index] - start)
+        for column in metrics:
+            bucket = columns[column][index:index + size]
+            if column in CUMULATIVE_COLUMNS:
+                result[column].append(bucket[-1] if bucket else None)
+            else:
+                result[column].append(_aggregate(bucket, agg))
+    return result
@@ -0,0 +1,222 @@
+"""
+变量替换模板引擎
+
+${variable} 模板按字符串预编译为替换计划（字面量片段 + 变量名），
+用例/接口上的 url、headers、body、params 按字段缓存编译结果，
+渲染时从分层变量作用域取值，合并后的变量字典只在变量变化时重建。
+"""
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+VARIABLE_PATTERN = re.compile(r'\$\{(\w+)\}')
+
+# 字段编译计划缓存的最大条目数
+PLAN_CACHE_SIZE = 2048
+
+
+class Template:
+    """编译后的字符串模板"""
+
+    __slots__ = ('source', 'parts', 'names')
+
+    def __init__(self, source: str):
+        self.source = source
+        # parts 中偶数位为字面量，奇数位为变量名
+        self.parts = tuple(VARIABLE_PATTERN.split(source))
+        self.names = self.parts[1::2]
+
+    def render(self, scope: Mapping) -> str:
+        """渲染模板，未定义的变量保留原样"""
+        if not self.names:
+            return self.source
+        parts = self.parts
+        output = []
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                if part:
+                    output.append(part)
+            else:
+                value = scope.get(part, _MISSING)
+                output.append('${' + part + '}' if value is _MISSING else str(value))
+        return ''.join(output)
+
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=8192)
+def compile_template(text: str) -> Template:
+    """编译字符串模板（按内容缓存）"""
+    return Template(text)
+
+
+class _Const:
+    """不含变量的标量值（字典和列表总是编译为 _Dict/_List，渲染时生成新对象）"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def render(self, scope):
+        return self.value
+
+
+class _Dict:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def render(self, scope):
+        return {key: node.render(scope) for key, node in self.items}
+
+
+class _List:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def render(self, scope):
+        return [node.render(scope) for node in self.items]
+
+
+def compile_value(data: Any):
+    """将字符串/字典/列表编译为替换计划，字典只替换值不替换键"""
+    if isinstance(data, dict):
+        return _Dict(tuple((key, compile_value(value)) for key, value in data.items()))
+    if isinstance(data, list):
+        return _List(tuple(compile_value(item) for item in data))
+    if isinstance(data, str) and data:
+        return compile_template(data)
+    return _Const(data)
+
+
+def render(data: Any, scope: Mapping) -> Any:
+    """编译并渲染任意值（字符串模板按内容缓存）"""
+    if isinstance(data, str):
+        return compile_template(data).render(scope) if data else data
+    return compile_value(data).render(scope)
+
+
+_plan_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def get_field_plan(instance, field: str):
+    """
+    获取模型实例某个字段的编译计划
+    按 (模型, 主键, 更新时间, 字段) 缓存，实例保存后 updated_at 变化，缓存自然失效；
+    命中时再比较字段内容，防止绕过 save 的批量更新导致使用旧计划
+    """
+    data = getattr(instance, field)
+    updated_at = getattr(instance, 'updated_at', None)
+    if instance.pk is None or updated_at is None:
+        return compile_value(data)
+
+    key = (instance._meta.label, instance.pk, updated_at, field)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached is not None:
+            _plan_cache.move_to_end(key)
+    if cached is not None and (cached[0] is data or cached[0] == data):
+        return cached[1]
+
+    plan = compile_value(data)
+    with _plan_cache_lock:
+        _plan_cache[key] = (data, plan)
+        if len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def render_field(instance, field: str, scope: Mapping, default: Any = None) -> Any:
+    """渲染模型实例的字段（字段为空时返回 default）"""
+    if not getattr(instance, field):
+        return default
+    return get_field_plan(instance, field).render(scope)
+
+
+class TrackedDict(dict):
+    """记录修改版本号的字典，用于判断变量作用域是否需要重建"""
+
+    __slots__ = ('version',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.version += 1
+        return super().setdefault(key, default)
+
+    def pop(self, key, *args):
+        self.version += 1
+        return super().pop(key, *args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+class VariableScope(Mapping):
+    """
+    分层变量作用域，后面的层覆盖前面的层
+    普通字典层视为不可变，TrackedDict 层修改后下次取值时重建合并结果
+    """
+
+    def __init__(self, *layers: Optional[Mapping]):
+        self.layers = [layer for layer in layers if layer is not None]
+        self._merged: Dict[str, Any] = {}
+        self._versions = None
+
+    def _current_versions(self):
+        return tuple(getattr(layer, 'version', 0) for layer in self.layers)
+
+    @property
+    def merged(self) -> Dict[str, Any]:
+        versions = self._current_versions()
+        if versions != self._versions:
+            merged = {}
+            for layer in self.layers:
+                merged.update(layer)
+            self._merged = merged
+            self._versions = versions
+        return self._merged
+
+    def get(self, key, default=None):
+        return self.merged.get(key, default)
+
+    def __getitem__(self, key):
+        return self.merged[key]
+
+    def __iter__(self):
+        return iter(self.merged)
+
+    def __len__(self):
+        return len(self.merged)
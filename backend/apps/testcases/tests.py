@@ -0,0 +1,765 @@
+import asyncio
+import json
+import random
+from datetime import datetime
+from decimal import Decimal
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.apis.models import API
+from apps.environments.models import Environment
+from apps.executions.models import Execution
+from apps.projects.models import Project
+from .capture import CapturedResponse
+from .histogram import LatencyHistogram, bucket_index, bucket_range, merge_encoded
+from .live_metrics import LiveMetrics
+from .series import AGGREGATED, build_series, decode_series, downsample, encode_series
+from .load_profiles import build_stages, per_user_rate, shape_code, validate_profile
+from .locust_executor import LocustExecutor
+from .models import PerformanceTest, TestCase as CaseModel
+from .sandbox import ScriptError, run_script
+from .scripts import compile_script
+from .runner import TestCaseRunner, create_testcase_execution
+from .regression import compare_runs, mann_whitney_greater, steady_samples, two_proportion_greater, validate_tolerances
+
+User = get_user_model()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """本地压测目标：/fail 返回 500，其余返回 200 JSON，并统计收到的请求数"""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits += 1
+        status = 500 if self.path.startswith('/fail') else 200
+        body = json.dumps({'ok': status == 200, 'token': 'abc'}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """在后台线程中运行的本地 HTTP 服务"""
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.hits = 0
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    @property
+    def hits(self):
+        return self.server.hits
+
+
+ENGINE_LOCUSTFILE = """
+from locust import HttpUser, task, constant
+
+
+class EngineUser(HttpUser):
+    wait_time = constant(0.05)
+
+    @task(3)
+    def ok(self):
+        self.client.get('/ok', name='ok')
+
+    @task
+    def fail(self):
+        self.client.get('/fail', name='fail')
+"""
+
+
+class LoadProfileTests(SimpleTestCase):
+    """负载模型转换为 LoadTestShape 阶段表"""
+
+    def test_closed_uses_command_line_options(self):
+        self.assertIsNone(build_stages(None, 10, 5, 60))
+        self.assertIsNone(build_stages({'type': 'closed'}, 10, 5, 60))
+        self.assertIsNone(per_user_rate(None, 10))
+
+    def test_constant_arrival(self):
+        profile = {'type': 'constant_arrival', 'rate': 50, 'users': 20}
+        self.assertEqual(build_stages(profile, 10, 4, 60), [(60, 20, 5)])
+        self.assertEqual(per_user_rate(profile, 10), 2.5)
+        # 未配置 users/duration 时使用性能测试的并发数和持续时间
+        self.assertEqual(build_stages({'type': 'constant_arrival', 'rate': 5}, 10, 0, 30), [(30, 10, 10)])
+
+    def test_step(self):
+        profile = {'type': 'step', 'start_users': 5, 'step_users': 10, 'step_duration': 30, 'steps': 3}
+        self.assertEqual(build_stages(profile, 1, 0, 0), [(30, 5, 10.0), (60, 15, 10.0), (90, 25, 10.0)])
+
+    def test_spike(self):
+        profile = {'type': 'spike', 'base_users': 10, 'spike_users': 100,
+                   'base_duration': 60, 'spike_duration': 20, 'recovery_duration': 30}
+        self.assertEqual(build_stages(profile, 1, 10, 0), [(60, 10, 1.0), (80, 100, 90.0), (110, 10, 90.0)])
+        profile['recovery_duration'] = 0
+        self.assertEqual(len(build_stages(profile, 1, 10, 0)), 2)
+
+    def test_custom_stages(self):
+        profile = {'type': 'stages', 'rate_per_user': 0.5, 'stages': [
+            {'duration': 10, 'users': 5},
+            {'duration': 20, 'users': 20, 'spawn_rate': 2},
+            {'duration': 5, 'users': 0},
+        ]}
+        self.assertEqual(build_stages(profile, 1, 0, 0), [(10, 5, 5.0), (30, 20, 2.0), (35, 0, 1.0)])
+        self.assertEqual(per_user_rate(profile, 1), 0.5)
+
+    def test_invalid_profiles(self):
+        for profile in (
+            {'type': 'ramp'},
+            {'type': 'constant_arrival'},
+            {'type': 'constant_arrival', 'rate': 0},
+            {'type': 'step', 'step_users': 1, 'step_duration': 1},
+            {'type': 'step', 'step_users': 'x', 'step_duration': 1, 'steps': 1},
+            {'type': 'stages', 'stages': []},
+            {'type': 'stages', 'stages': [{'duration': 0, 'users': 1}]},
+            {'type': 'stages', 'stages': [5]},
+            {'rate_per_user': -1},
+        ):
+            with self.subTest(profile=profile), self.assertRaises(ValueError):
+                validate_profile(profile, threads=10)
+
+    def test_shape_code(self):
+        # 不在测试进程中导入 locust（会 monkey patch 标准库），基类只需提供 get_run_time
+        namespace = {'LoadTestShape': object}
+        exec(shape_code([(10, 5, 5.0), (30, 20, 2.0)]), namespace)
+        shape = namespace['BenchLinkLoadShape']()
+        for run_time, expected in ((0, (5, 5.0)), (9.9, (5, 5.0)), (10, (20, 2.0)), (30, None)):
+            shape.get_run_time = lambda run_time=run_time: run_time
+            self.assertEqual(shape.tick(), expected)
+
+
+HISTORY_HEADER = ('Timestamp,User Count,Type,Name,Requests/s,Failures/s,50%,66%,75%,80%,90%,95%,98%,99%,'
+                  '99.9%,99.99%,100%,Total Request Count,Total Failure Count,Total Median Response Time,'
+                  'Total Average Response Time,Total Min Response Time,Total Max Response Time,Total Average Content Size')
+
+
+def history_row(timestamp, users, rps, p95, total, name='Aggregated', method=''):
+    """stats_history.csv 的一行（--csv-full-history）"""
+    return (f'{timestamp},{users},{method},{name},{rps},0,{p95 // 2},0,0,0,{p95 - 5},{p95},0,{p95 + 5},'
+            f'0,0,{p95 + 10},{total},0,0,{p95 / 2},0,0,0')
+
+
+class SeriesTests(SimpleTestCase):
+    """性能测试时间序列：按列编码/解码与降采样"""
+
+    def write_history(self, workdir, rows):
+        prefix = Path(workdir) / 'result'
+        Path(f'{prefix}_stats_history.csv').write_text('\n'.join([HISTORY_HEADER, *rows]) + '\n', encoding='utf-8')
+        return str(prefix)
+
+    def test_build_and_decode(self):
+        rows = []
+        for second in range(5):
+            timestamp = 1700000000 + second
+            rows.append(history_row(timestamp, 2, 10.5 + second, 40, 10 * (second + 1), name='/ok', method='GET'))
+            rows.append(history_row(timestamp, 2, 10.5 + second, 40, 10 * (second + 1)))
+        # 没有数据时 Locust 输出 N/A
+        rows.append('1700000005,2,,Aggregated,0,0,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,50,0,0,0,0,0,0')
+        with tempfile.TemporaryDirectory() as workdir:
+            data, names, points = build_series(self.write_history(workdir, rows))
+            self.assertEqual(build_series(str(Path(workdir) / 'missing')), (None, [], 0))
+        self.assertEqual(names, [AGGREGATED, 'GET /ok'])
+        self.assertEqual(points, 6)
+
+        series = decode_series(data)
+        aggregated = series[AGGREGATED]
+        self.assertEqual(aggregated['t'], list(range(1700000000, 1700000006)))
+        self.assertEqual(aggregated['rps'][:2], [10.5, 11.5])
+        self.assertEqual(aggregated['p95'], [40.0] * 5 + [None])
+        self.assertEqual(aggregated['total_requests'], [10, 20, 30, 40, 50, 50])
+        self.assertEqual(series['GET /ok']['users'], [2] * 5)
+        self.assertEqual(decode_series(None), {})
+
+    def test_encode_sorts_points(self):
+        points = [{'timestamp': 3, 'rps': 3.333}, {'timestamp': 1, 'rps': 1.0}, {'timestamp': 2, 'rps': 2.0}]
+        series = decode_series(encode_series({AGGREGATED: points}))[AGGREGATED]
+        self.assertEqual(series['t'], [1, 2, 3])
+        self.assertEqual(series['rps'], [1.0, 2.0, 3.33])
+
+    def test_downsample(self):
+        columns = {
+            't': list(range(100, 110)),
+            'rps': [1, 2, 3, 4, 5, 6, 7, 8, 9, None],
+            'total_requests': list(range(10, 110, 10)),
+        }
+        result = downsample(columns, 4, metrics=['rps', 'total_requests', 'unknown'])
+        self.assertEqual(result['t'], [100, 103, 106, 109])
+        self.assertEqual(result['offset'], [0, 3, 6, 9])
+        self.assertEqual(result['rps'], [2, 5, 8, None])
+        # 累计值取区间最后一个值
+        self.assertEqual(result['total_requests'], [30, 60, 90, 100])
+        self.assertNotIn('unknown', result)
+        self.assertEqual(downsample(columns, 4, agg='max', metrics=['rps'])['rps'], [3, 6, 9, None])
+        self.assertEqual(downsample(columns, 4, agg='min', metrics=['rps'])['rps'], [1, 4, 7, None])
+        # 叠加对比时 offset 相对运行开始时间
+        self.assertEqual(downsample(columns, 20, metrics=['rps'], start=95)['offset'][:2], [5, 6])
+
+
+class LiveMetricsTests(SimpleTestCase):
+    """实时指标：按文件偏移增量读取追加的汇总行"""
+
+    def test_incremental_parsing(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            history_file = Path(workdir) / 'result_stats_history.csv'
+            live = LiveMetrics(history_file, maxlen=3)
+            # 文件尚未创建
+            live.refresh()
+            self.assertIsNone(live.latest)
+
+            with open(history_file, 'w', encoding='utf-8') as f:
+                f.write(HISTORY_HEADER + '\n')
+                f.write(history_row(100, 1, 5.0, 40, 5, name='/ok', method='GET') + '\n')
+                f.write(history_row(100, 1, 5.0, 40, 5) + '\n')
+                # 尚未写完的行留到下次读取
+                f.write(history_row(101, 2, 8.0, 50, 13)[:20])
+            live.refresh()
+            self.assertEqual([point['timestamp'] for point in live.since()], [100])
+            self.assertEqual(live.latest['p95'], 40.0)
+
+            with open(history_file, 'a', encoding='utf-8') as f:
+                f.write(history_row(101, 2, 8.0, 50, 13)[20:] + '\n')
+                for second in (102, 103):
+                    f.write(history_row(second, 2, 8.0, 50, 13) + '\n')
+            live.refresh()
+            live.refresh()
+        # 只保留最近 maxlen 个数据点
+        self.assertEqual([point['timestamp'] for point in live.since()], [101, 102, 103])
+        self.assertEqual([point['timestamp'] for point in live.since(101)], [102, 103])
+        self.assertEqual(live.latest['users'], 2)
+        self.assertEqual(live.latest['total_requests'], 13)
+        self.assertEqual(live.latest['avg_response_time'], 25.0)
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    """响应时间直方图：编码/解码、合并与百分位精度"""
+
+    def sample(self, seed, count=5000):
+        rng = random.Random(seed)
+        return [rng.lognormvariate(4, 1) for _ in range(count)]
+
+    def test_bucket_covers_value(self):
+        for value in (0, 1, 255, 256, 257, 1000, 123456, 10 ** 9):
+            lower, upper = bucket_range(bucket_index(value))
+            self.assertLessEqual(lower, value)
+            self.assertLessEqual(value, upper)
+
+    def test_encode_decode_roundtrip(self):
+        histogram = LatencyHistogram()
+        for value in self.sample(1):
+            histogram.record(value)
+        decoded = LatencyHistogram.decode(histogram.encode())
+        self.assertEqual(decoded.counts, histogram.counts)
+        self.assertEqual((decoded.count, decoded.total_us, decoded.min_us, decoded.max_us),
+                         (histogram.count, histogram.total_us, histogram.min_us, histogram.max_us))
+        self.assertEqual(LatencyHistogram.decode('').count, 0)
+        self.assertIsNone(LatencyHistogram.decode(None).percentile(95))
+
+    def test_merge_equals_combined_recording(self):
+        first, second = self.sample(2), self.sample(3)
+        combined = LatencyHistogram()
+        for value in first + second:
+            combined.record(value)
+        parts = []
+        for values in (first, second):
+            part = LatencyHistogram()
+            for value in values:
+                part.record(value)
+            parts.append(part.encode())
+        merged = merge_encoded(parts + [None])
+        self.assertEqual(merged.counts, combined.counts)
+        self.assertEqual(merged.count, len(first) + len(second))
+        self.assertEqual(merged.min, combined.min)
+        self.assertEqual(merged.max, combined.max)
+        self.assertEqual(merged.percentile(99), combined.percentile(99))
+
+    def test_percentile_accuracy(self):
+        values = self.sample(4)
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        ordered = sorted(values)
+        for percent in (50, 90, 95, 99):
+            exact = ordered[max(1, int(len(ordered) * percent / 100 + 0.5)) - 1]
+            # 对数线性分桶的相对误差不超过约 0.8%
+            self.assertAlmostEqual(histogram.percentile(percent), exact, delta=exact * 0.01 + 0.001)
+        self.assertEqual(histogram.percentile(100), histogram.max)
+        self.assertAlmostEqual(histogram.mean, sum(values) / len(values), places=2)
+
+
+class RegressionTests(SimpleTestCase):
+    """回归检测：显著性检验的 p 值和容差判定"""
+
+    def test_mann_whitney_known_values(self):
+        # 完全分离的两组：U = n1*n2，正态近似 z = (U - n1*n2/2 - 0.5) / sqrt(n1*n2*(n+1)/12)
+        p_value = mann_whitney_greater([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])
+        self.assertAlmostEqual(p_value, 0.00609, places=5)
+        self.assertAlmostEqual(mann_whitney_greater([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]), 0.99669, places=5)
+        # 所有值相同时没有差异
+        self.assertEqual(mann_whitney_greater([1] * 10, [1] * 10), 1.0)
+        # 样本不足时无法检验
+        self.assertIsNone(mann_whitney_greater([1, 2, 3, 4], [1, 2, 3, 4, 5]))
+
+    def test_mann_whitney_shifted_samples(self):
+        rng = random.Random(1)
+        current = [rng.gauss(115, 5) for _ in range(60)]
+        baseline = [rng.gauss(100, 5) for _ in range(60)]
+        self.assertLess(mann_whitney_greater(current, baseline), 1e-10)
+        self.assertGreater(mann_whitney_greater(baseline, current), 0.99)
+
+    def test_two_proportion_known_values(self):
+        self.assertAlmostEqual(two_proportion_greater(50, 1000, 10, 1000), 7.89e-08, delta=0.01e-08)
+        self.assertAlmostEqual(two_proportion_greater(10, 1000, 10, 1000), 0.5)
+        self.assertEqual(two_proportion_greater(0, 100, 0, 100), 1.0)
+        self.assertIsNone(two_proportion_greater(1, 0, 1, 100))
+
+    def test_steady_samples_exclude_ramp_up(self):
+        columns = {'users': [1, 2, 3, 3, 3], 'rps': [10, 20, 30, 31, 29]}
+        self.assertEqual(steady_samples(columns, 'rps'), [30, 31, 29])
+        self.assertEqual(steady_samples(None, 'rps'), [])
+
+    def test_validate_tolerances(self):
+        self.assertEqual(validate_tolerances({'throughput': '5'})['throughput'], 5.0)
+        for tolerances in ({'latency': 1}, {'error_rate': -1}, {'throughput': 'x'}, [1]):
+            with self.assertRaises(ValueError):
+                validate_tolerances(tolerances)
+
+    def series(self, rps, p95, seed):
+        rng = random.Random(seed)
+        return {
+            'users': [10] * 30,
+            'rps': [rng.gauss(rps, 2) for _ in range(30)],
+            'p95': [rng.gauss(p95, 2) for _ in range(30)],
+        }
+
+    def summary(self, p95, throughput, failed, total=10000):
+        return {'p95_response_time': p95, 'throughput': throughput, 'failed_samples': failed,
+                'total_samples': total, 'error_rate': failed / total * 100}
+
+    def test_compare_runs_detects_regression(self):
+        baseline = self.summary(100, 200, 10)
+        current = self.summary(130, 150, 300)
+        result = compare_runs(baseline, current, self.series(200, 100, 1), self.series(150, 130, 2))
+        self.assertEqual(result['verdict'], 'failed')
+        self.assertEqual(sorted(result['regressions']), ['error_rate', 'p95_response_time', 'throughput'])
+        self.assertEqual(result['metrics']['p95_response_time']['change'], 30.0)
+        self.assertEqual(result['metrics']['throughput']['change'], -25.0)
+        self.assertEqual(result['metrics']['error_rate']['change'], 2.9)
+        for detail in result['metrics'].values():
+            self.assertLess(detail['p_value'], 0.05)
+
+    def test_compare_runs_within_tolerance(self):
+        baseline = self.summary(100, 200, 10)
+        current = self.summary(105, 195, 12)
+        result = compare_runs(baseline, current, self.series(200, 100, 1), self.series(195, 105, 2))
+        self.assertEqual(result['verdict'], 'passed')
+        self.assertEqual(result['regressions'], [])
+
+    def test_compare_runs_change_must_be_significant(self):
+        """超过容差但每秒数据没有显著差异（抖动）时不判定为回归"""
+        baseline = self.summary(100, 200, 10)
+        current = self.summary(120, 200, 10)
+        noisy = self.series(200, 100, 3)
+        result = compare_runs(baseline, current, noisy, noisy)
+        self.assertFalse(result['metrics']['p95_response_time']['regressed'])
+        # 没有每秒数据时只按容差判定
+        result = compare_runs(baseline, current, tolerances={'p95_response_time': 15})
+        self.assertIsNone(result['metrics']['p95_response_time']['p_value'])
+        self.assertTrue(result['metrics']['p95_response_time']['regressed'])
+
+
+class ScriptVariablesTests(SimpleTestCase):
+    """脚本变量写回：只写回脚本修改的变量，无法无损转换为 JSON 的值作为脚本错误"""
+
+    def modes(self):
+        # 沙箱进程和进程内执行的结果一致
+        for enabled in (True, False):
+            with self.subTest(sandbox=enabled), override_settings(SCRIPT_SANDBOX_ENABLED=enabled):
+                yield
+
+    def run_script(self, source, variables, profile='post_script'):
+        return run_script(compile_script(source), source, profile, {}, variables)
+
+    def test_only_changed_variables_written_back(self):
+        when = datetime(2026, 1, 1, 8, 30)
+        for _ in self.modes():
+            variables = {'when': when, 'amount': Decimal('1.50'), 'count': 1, 'stale': 'x'}
+            output = self.run_script(
+                "set_variable('count', get_variable('count') + 1)\n"
+                "variables['items'] = [1, {'a': None}]\n"
+                "variables.pop('stale')\n"
+                "print('done')",
+                variables,
+            )
+            self.assertEqual(output, ['done'])
+            self.assertEqual(variables, {'when': when, 'amount': Decimal('1.50'), 'count': 2,
+                                         'items': [1, {'a': None}]})
+            # 未修改的变量保持原来的类型
+            self.assertIs(type(variables['when']), datetime)
+            self.assertIs(type(variables['amount']), Decimal)
+
+    def test_non_json_value_rejected(self):
+        for _ in self.modes():
+            for source in ("set_variable('digest', hashlib.md5(b'x').digest())",
+                           "set_variable('pair', tuple([1, 2]))",
+                           "set_variable('mapping', {1: 'a'})"):
+                variables = {'token': 'abc'}
+                with self.assertRaises(ScriptError):
+                    self.run_script(source, variables, profile='pre_hook')
+                self.assertEqual(variables, {'token': 'abc'})
+
+
+class ApplyHistogramsTests(SimpleTestCase):
+    """命令行模式：请求数、错误率、吞吐量与响应时间都取自同一收集器"""
+
+    def test_counts_and_throughput_from_collector(self):
+        csv_metrics = {
+            'total_samples': 832, 'failed_samples': 2, 'success_samples': 830, 'error_rate': 0.24,
+            'throughput': 80.0, 'p95_response_time': 40.0,
+            'steps': [{'name': 'ok', 'method': 'GET', 'total_samples': 832, 'failed_samples': 2}],
+        }
+        exact = {
+            'total_samples': 900, 'failed_samples': 3, 'success_samples': 897, 'error_rate': 1 / 3,
+            'throughput': 90.0, 'p95_response_time': 42.5, 'status_codes': {'200': 897, '500': 3},
+            'errors': [], 'histogram': 'x',
+            'steps': [{'name': 'ok', 'method': 'GET', 'total_samples': 900, 'failed_samples': 3}],
+        }
+        with tempfile.TemporaryDirectory() as workdir:
+            histogram_file = Path(workdir) / 'histograms.json'
+            histogram_file.write_text(json.dumps(exact), encoding='utf-8')
+            LocustExecutor._apply_histograms(csv_metrics, histogram_file)
+            missing = {'total_samples': 1}
+            LocustExecutor._apply_histograms(missing, Path(workdir) / 'missing.json')
+        for field in ('total_samples', 'failed_samples', 'error_rate', 'throughput', 'p95_response_time', 'steps'):
+            self.assertEqual(csv_metrics[field], exact[field])
+        # 文件不存在时保留 CSV 的结果
+        self.assertEqual(missing, {'total_samples': 1})
+
+    def test_degenerate_window_keeps_csv_throughput(self):
+        """收集器的时间窗口为空时结果中没有吞吐量，保留 CSV 中的值"""
+        csv_metrics = {
+            'total_samples': 1, 'throughput': 0.5,
+            'steps': [{'name': 'ok', 'method': 'GET', 'total_samples': 1, 'throughput': 0.5}],
+        }
+        exact = {'total_samples': 1, 'steps': [{'name': 'ok', 'method': 'GET', 'total_samples': 1}]}
+        with tempfile.TemporaryDirectory() as workdir:
+            histogram_file = Path(workdir) / 'histograms.json'
+            histogram_file.write_text(json.dumps(exact), encoding='utf-8')
+            LocustExecutor._apply_histograms(csv_metrics, histogram_file)
+        self.assertEqual(csv_metrics['throughput'], 0.5)
+        self.assertEqual(csv_metrics['steps'][0]['throughput'], 0.5)
+
+
+# 在独立进程中运行（导入 locust 会执行 gevent monkey patch），输出收集器的吞吐量
+COLLECTOR_THROUGHPUT_SCRIPT = '''
+import json
+from unittest import mock
+from apps.testcases.locust_histograms import RequestCollector
+
+def request(collector, now):
+    with mock.patch('apps.testcases.locust_histograms.time.time', return_value=now):
+        collector.on_request(request_type='GET', name='ok', response_time=5, response_length=0)
+
+single = RequestCollector()
+single.mark_started(100.0)
+request(single, 102.0)
+
+burst = RequestCollector()
+burst.mark_started(100.0)
+for index in range(10):
+    request(burst, 110.0 + index * 0.00001)
+
+worker = RequestCollector()
+worker.mark_started(100.0)
+request(worker, 104.0)
+master = RequestCollector()
+master.merge_report(worker.drain())
+
+unanchored = RequestCollector()
+request(unanchored, 100.0)
+
+print(json.dumps({
+    'single': single.metrics().get('throughput'),
+    'burst': burst.metrics().get('throughput'),
+    'worker': master.metrics().get('throughput'),
+    'unanchored': unanchored.metrics().get('throughput'),
+}))
+'''
+
+
+class CapturedResponseEncodingTests(SimpleTestCase):
+    """响应文本编码与 requests 一致：响应头中的字符集，否则按内容检测"""
+
+    TEXT = '性能测试报告：接口响应时间统计，包含平均值、中位数和百分位数据。' * 4
+
+    def response(self, content_type, content):
+        return CapturedResponse(200, {'content-type': content_type}, content)
+
+    def test_header_charset(self):
+        self.assertEqual(self.response('text/plain; charset=gbk', self.TEXT.encode('gbk')).text, self.TEXT)
+        self.assertEqual(self.response('application/json', self.TEXT.encode('utf-8')).text, self.TEXT)
+        # text/* 没有字符集时默认 ISO-8859-1
+        self.assertEqual(self.response('text/html', 'café'.encode('latin-1')).text, 'café')
+
+    def test_detects_encoding_without_charset(self):
+        response = self.response('application/octet-stream', self.TEXT.encode('gbk'))
+        self.assertEqual(response.text, self.TEXT)
+        self.assertEqual(self.response('', self.TEXT.encode('utf-8')).encoding, 'utf-8')
+
+    def test_encoding_can_be_overridden(self):
+        response = self.response('text/html', self.TEXT.encode('gbk'))
+        self.assertNotEqual(response.text, self.TEXT)
+        response.encoding = 'gbk'
+        self.assertEqual(response.text, self.TEXT)
+
+
+class StepAuthTests(SimpleTestCase):
+    """场景步骤的认证请求头与功能测试一致"""
+
+    def step_auth(self, auth_type, auth_config):
+        api = SimpleNamespace(auth_type=auth_type, auth_config=auth_config)
+        return LocustExecutor._step_auth(LocustExecutor.__new__(LocustExecutor), api)
+
+    def test_header_token_format(self):
+        self.assertEqual(self.step_auth('header', {'token': 'xyz'}), ({'Authorization': 'Bearer xyz'}, None))
+        self.assertEqual(
+            self.step_auth('header', {'token': 'xyz', 'format': 'JWT', 'header_name': 'X-Auth'}),
+            ({'X-Auth': 'JWT xyz'}, None),
+        )
+        self.assertEqual(self.step_auth('header', {'token': 'xyz', 'format': ''}), ({'Authorization': 'xyz'}, None))
+        # 未配置 Token 时使用虚拟用户的 ${token} 变量
+        self.assertEqual(self.step_auth('header', {}), ({'Authorization': 'Bearer ${token}'}, None))
+
+
+class CollectorThroughputTests(SimpleTestCase):
+    """吞吐量从测试开始计算（与 Locust 的 total_rps 口径相同）"""
+
+    def test_window_starts_at_test_start(self):
+        process = subprocess.run(
+            [sys.executable, '-c', COLLECTOR_THROUGHPUT_SCRIPT],
+            cwd=str(settings.BASE_DIR), capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        self.assertAlmostEqual(result['single'], 0.5)
+        self.assertAlmostEqual(result['burst'], 1.0, places=3)
+        # worker 上报中带有测试开始时间
+        self.assertAlmostEqual(result['worker'], 0.25)
+        # 没有测试开始时间且只有一个请求时不输出吞吐量
+        self.assertIsNone(result['unanchored'])
+
+
+class EmbeddedEngineTests(SimpleTestCase):
+    """内嵌 Locust 引擎：独立进程运行并输出与请求数一致的精确指标"""
+
+    def run_engine(self, workdir, config):
+        config_file = Path(workdir) / 'engine_config.json'
+        config_file.write_text(json.dumps(config), encoding='utf-8')
+        return subprocess.run(
+            [sys.executable, '-m', 'apps.testcases.locust_engine', str(config_file)],
+            cwd=str(settings.BASE_DIR), capture_output=True, text=True, timeout=120,
+        )
+
+    def test_run_against_local_server(self):
+        with tempfile.TemporaryDirectory() as workdir, LocalServer() as server:
+            locustfile = Path(workdir) / 'locustfile.py'
+            locustfile.write_text(ENGINE_LOCUSTFILE, encoding='utf-8')
+            result_file = Path(workdir) / 'engine_result.json'
+            process = self.run_engine(workdir, {
+                'locustfile': str(locustfile),
+                'host': server.url,
+                'users': 2,
+                'spawn_rate': 2,
+                'run_time': 2,
+                'csv_prefix': str(Path(workdir) / 'result'),
+                'html_report': str(Path(workdir) / 'report.html'),
+                'result_file': str(result_file),
+                'log_file': str(Path(workdir) / 'engine.log'),
+            })
+            self.assertEqual(process.returncode, 0, process.stderr)
+            result = json.loads(result_file.read_text(encoding='utf-8'))
+            hits = server.hits
+
+        self.assertTrue(result['success'], result)
+        metrics = result['metrics']
+        self.assertGreater(metrics['total_samples'], 0)
+        # 所有请求都已记录（与服务端收到的请求数一致）
+        self.assertEqual(metrics['total_samples'], hits)
+        steps = {step['name']: step for step in metrics['steps']}
+        self.assertEqual(steps['fail']['failed_samples'], steps['fail']['total_samples'])
+        self.assertEqual(steps['ok']['failed_samples'], 0)
+        self.assertEqual(metrics['failed_samples'], steps['fail']['total_samples'])
+        self.assertEqual(metrics['status_codes'].get('500'), steps['fail']['total_samples'])
+        self.assertTrue(metrics['histogram'])
+
+    def test_startup_failure_is_reported(self):
+        """locustfile 无法加载时引擎仍写出失败结果"""
+        with tempfile.TemporaryDirectory() as workdir:
+            result_file = Path(workdir) / 'engine_result.json'
+            process = self.run_engine(workdir, {
+                'locustfile': str(Path(workdir) / 'missing.py'),
+                'host': 'http://127.0.0.1:1',
+                'users': 1,
+                'spawn_rate': 1,
+                'run_time': 1,
+                'csv_prefix': str(Path(workdir) / 'result'),
+                'result_file': str(result_file),
+                'log_file': str(Path(workdir) / 'engine.log'),
+            })
+            self.assertEqual(process.returncode, 2, process.stderr)
+            result = json.loads(result_file.read_text(encoding='utf-8'))
+        self.assertFalse(result['success'])
+        self.assertTrue(result['error'])
+
+
+class PerformanceExecuteTests(TestCase):
+    """提交性能测试：正在执行时拒绝再次提交"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='perf-submit', password='perf-submit')
+        cls.project = Project.objects.create(name='提交', owner=cls.user)
+        cls.api = API.objects.create(name='ok', url='/ok', method='GET', project=cls.project)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def execute(self, performance_test):
+        with mock.patch('apps.testcases.views.LocustExecutor'), \
+                mock.patch('apps.testcases.views.enqueue', return_value='job') as enqueue:
+            response = self.client.post(reverse('performance-test-execute', args=[performance_test.pk]))
+        return response, enqueue
+
+    def test_rejects_second_submit_while_running(self):
+        for last_result in (None, {}, {'status': 'completed', 'metrics': {'total_samples': 1}}):
+            performance_test = PerformanceTest.objects.create(
+                name='提交', project=self.project, api=self.api, last_result=last_result,
+            )
+            response, enqueue = self.execute(performance_test)
+            self.assertEqual(response.status_code, 202)
+            enqueue.assert_called_once_with('run_performance_job', performance_test.id)
+            performance_test.refresh_from_db()
+            self.assertEqual(performance_test.last_result['status'], 'running')
+
+            response, enqueue = self.execute(performance_test)
+            self.assertEqual(response.status_code, 409)
+            enqueue.assert_not_called()
+
+
+class _DelayedExecutor:
+    """异步执行器替身：按参数中的 delay 延迟返回，慢的一组在返回前读取已写入的子记录数"""
+
+    def __init__(self, *args):
+        self.variables = {}
+
+    async def execute(self, client=None):
+        await asyncio.sleep(self.variables['delay'])
+        if self.variables.get('slow'):
+            self.variables['written'] = await sync_to_async(
+                lambda: Execution.objects.filter(parent_id=self.variables['parent_id']).count()
+            )()
+        return {'success': True, 'time': 1, 'written': self.variables.get('written')}
+
+
+@override_settings(TESTCASE_EXECUTION_MODE='async', EXECUTION_RECORD_FLUSH_INTERVAL=0)
+class AsyncParameterizedRunTests(TransactionTestCase):
+    """异步参数化执行：每组参数完成时立即记录，执行过程中即可看到子记录"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='async-param', password='async-param')
+        project = Project.objects.create(name='异步参数化', owner=user)
+        api = API.objects.create(name='ok', url='/ok', method='GET', project=project)
+        self.testcase = CaseModel.objects.create(name='异步参数化', project=project, api=api)
+
+    def test_records_as_results_complete(self):
+        parent = create_testcase_execution(self.testcase, parameterized=True)
+        parent.start_time = timezone.now()
+        data = [{'delay': 0.5, 'slow': True, 'parent_id': parent.id}] + [
+            {'delay': 0.01, 'parent_id': parent.id} for _ in range(3)
+        ]
+        with mock.patch('apps.testcases.runner.AsyncTestCaseExecutor', _DelayedExecutor):
+            summary = TestCaseRunner(self.testcase).run(parent, data)
+
+        # 慢的一组完成前，其余各组的子记录已写入
+        self.assertEqual(summary['results'][0]['result']['written'], 3)
+        self.assertEqual([item['index'] for item in summary['results']], [1, 2, 3, 4])
+        self.assertEqual(summary['passed'], 4)
+        children = Execution.objects.filter(parent=parent)
+        self.assertEqual(children.count(), 4)
+        self.assertEqual(set(summary['execution_ids']), set(children.values_list('id', flat=True)))
+
+
+class LoopModePerformanceTests(TestCase):
+    """按循环次数执行：结束时所有请求都已计入统计，总请求数 = 循环次数 × 虚拟用户数"""
+
+    THREADS = 3
+    LOOPS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='loop-tester', password='loop-tester')
+        cls.project = Project.objects.create(name='循环次数', owner=user)
+        cls.api = API.objects.create(name='ok', url='/ok', method='GET', project=cls.project)
+
+    def run_loops(self, workers):
+        with tempfile.TemporaryDirectory() as workdir, LocalServer() as server:
+            environment = Environment.objects.create(name='本地', base_url=server.url, project=self.project)
+            performance_test = PerformanceTest.objects.create(
+                name=f'循环 {workers}', project=self.project, api=self.api, environment=environment,
+                threads=self.THREADS, ramp_up=0, duration=0, loops=self.LOOPS, workers=workers,
+            )
+            executor = LocustExecutor(performance_test)
+            executor.work_dir = Path(workdir)
+            result = executor.execute()
+            hits = server.hits
+        self.assertTrue(result['success'], result)
+        return result['metrics'], hits
+
+    def assert_exact(self, metrics, hits):
+        expected = self.LOOPS * self.THREADS
+        self.assertTrue(metrics['loop_mode'])
+        self.assertEqual(metrics['expected_iterations'], expected)
+        self.assertEqual(metrics['total_samples'], expected)
+        self.assertEqual(metrics['failed_samples'], 0)
+        self.assertEqual(hits, expected)
+
+    def test_single_process(self):
+        self.assert_exact(*self.run_loops(workers=1))
+
+    def test_distributed(self):
+        """worker 在退出前上报最后的统计，master 的合计不丢失请求"""
+        metrics, hits = self.run_loops(workers=3)
+        self.assertEqual(metrics['workers'], 3)
+        self.assert_exact(metrics, hits)
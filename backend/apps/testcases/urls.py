@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TestCaseViewSet, PerformanceTestViewSet
+from .views import TestCaseViewSet, PerformanceTestViewSet, PerformanceRunViewSet
 
 router = DefaultRouter()
 router.register(r'testcases', TestCaseViewSet, basename='testcase')
 router.register(r'performance-tests', PerformanceTestViewSet, basename='performance-test')
+router.register(r'performance-runs', PerformanceRunViewSet, basename='performance-run')
 
 urlpatterns = [
     path('', include(router.urls)),
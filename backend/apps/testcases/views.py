@@ -3,20 +3,26 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as http_status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Q, Count, Avg
-from datetime import datetime, timedelta
-from django.http import FileResponse, Http404
+from django.db.models import Q, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.conf import settings
 from pathlib import Path
+import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
-from .models import TestCase, PerformanceTest
-from .serializers import TestCaseSerializer, PerformanceTestSerializer
-from .executor import TestCaseExecutor
+from .models import TestCase, PerformanceTest, PerformanceRun
+from .serializers import TestCaseSerializer, PerformanceTestSerializer, PerformanceRunSerializer
+from .runner import create_testcase_execution
 from .locust_executor import LocustExecutor
-from apps.executions.models import Execution
+from .live_metrics import get_live_metrics
+from .series import AGGREGATED, AGGREGATIONS, decode_series, downsample
+from .histogram import merge_encoded
+from apps.executions.models import TestCaseHourlyStat, TestCaseLatestStatus
+from apps.executions.jobs import enqueue
 
 
 class TestCaseViewSet(viewsets.ModelViewSet):
@@ -57,233 +63,46 @@ class TestCaseViewSet(viewsets.ModelViewSet):
                 return Response({'error': '参数化数据最多100条'}, 
                               status=http_status.HTTP_400_BAD_REQUEST)
         
-        # 如果启用参数化且有参数化数据
-        if parameterized_mode == 'enabled' and parameterized_data and isinstance(parameterized_data, list) and len(parameterized_data) > 0:
-            # 参数化执行：先创建父记录，然后创建子记录
-            parent_start_time = timezone.now()
-            parent_execution = Execution.objects.create(
-                name=f"{testcase.name} [参数化执行] - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                project=testcase.project,
-                testcase=testcase,
-                executor=request.user if request.user.is_authenticated else None,
-                status='running',
-                start_time=parent_start_time,
-                execution_type='parameterized',
-                parent=None  # 父记录
-            )
-            
-            # 循环执行多次，创建子记录
-            results = []
-            execution_ids = []
-            passed_count = 0
-            failed_count = 0
-            total_time = 0
-            
-            for idx, param_set in enumerate(parameterized_data):
-                # 为每次执行创建子执行记录
-                execution = Execution.objects.create(
-                    name=f"{testcase.name} [参数化#{idx+1}] - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                    project=testcase.project,
-                    testcase=testcase,
-                    executor=request.user if request.user.is_authenticated else None,
-                    status='running',
-                    start_time=timezone.now(),
-                    execution_type='parameterized',
-                    parent=parent_execution  # 关联到父记录
-                )
-                execution_ids.append(execution.id)
-                
-                try:
-                    # 执行测试用例，传入参数化变量
-                    executor = TestCaseExecutor(testcase, testcase.environment)
-                    # 将参数化数据合并到执行器的变量中
-                    executor.variables.update(param_set)
-                    result = executor.execute()
-                    
-                    # 更新执行记录
-                    end_time = timezone.now()
-                    http_time = result.get('time')
-                    if http_time:
-                        duration = http_time / 1000.0
-                    else:
-                        duration = (end_time - execution.start_time).total_seconds()
-                    
-                    execution.status = 'passed' if result.get('success', False) else 'failed'
-                    execution.result = result
-                    execution.end_time = end_time
-                    execution.duration = duration
-                    execution.save()
-                    
-                    if result.get('success', False):
-                        passed_count += 1
-                    else:
-                        failed_count += 1
-                    total_time += result.get('time', 0)
-                    
-                    results.append({
-                        'execution_id': execution.id,
-                        'index': idx + 1,
-                        'status': execution.status,
-                        'result': result,
-                        'duration': duration
-                    })
-                    
-                except Exception as e:
-                    # 执行失败，更新执行记录
-                    import traceback
-                    error_trace = traceback.format_exc()
-                    
-                    end_time = timezone.now()
-                    duration = (end_time - execution.start_time).total_seconds()
-                    
-                    execution.status = 'failed'
-                    execution.result = {
-                        'error': str(e),
-                        'traceback': error_trace,
-                        'success': False
-                    }
-                    execution.end_time = end_time
-                    execution.duration = duration
-                    execution.save()
-                    
-                    failed_count += 1
-                    results.append({
-                        'execution_id': execution.id,
-                        'index': idx + 1,
-                        'status': 'failed',
-                        'error': str(e),
-                        'duration': duration
-                    })
-            
-            # 更新父执行记录
-            parent_end_time = timezone.now()
-            parent_duration = (parent_end_time - parent_start_time).total_seconds()
-            parent_execution.status = 'passed' if failed_count == 0 else 'failed'
-            parent_execution.result = {
-                'parameterized': True,
-                'total': len(results),
-                'passed': passed_count,
-                'failed': failed_count,
-                'total_time': round(total_time, 2),
-                'results': results
-            }
-            parent_execution.end_time = parent_end_time
-            parent_execution.duration = parent_duration
-            parent_execution.save()
-            
-            return Response({
-                'parameterized': True,
-                'execution_id': parent_execution.id,  # 返回父记录的ID
-                'total': len(results),
-                'passed': passed_count,
-                'failed': failed_count,
-                'total_time': round(total_time, 2),
-                'execution_ids': execution_ids,
-                'results': results,
-                'message': f'参数化执行完成：{passed_count}通过，{failed_count}失败'
-            }, status=http_status.HTTP_200_OK)
-        else:
-            # 普通执行：单次
-            # 创建执行记录
-            execution = Execution.objects.create(
-                name=f"{testcase.name} - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                project=testcase.project,
-                testcase=testcase,
-                executor=request.user if request.user.is_authenticated else None,
-                status='running',
-                start_time=timezone.now()
-            )
-            
-            try:
-                # 执行测试用例
-                executor = TestCaseExecutor(testcase, testcase.environment)
-                result = executor.execute()
-                
-                # 更新执行记录
-                end_time = timezone.now()
-                # 优先使用HTTP请求的实际时间（result.time），如果没有则使用总执行时间
-                http_time = result.get('time')
-                if http_time:
-                    # result.time是毫秒，转换为秒
-                    duration = http_time / 1000.0
-                else:
-                    # 如果没有HTTP时间，使用总执行时间（包含程序执行时间）
-                    duration = (end_time - execution.start_time).total_seconds()
-                
-                execution.status = 'passed' if result.get('success', False) else 'failed'
-                execution.result = result
-                execution.end_time = end_time
-                execution.duration = duration
-                execution.save()
-                
-                return Response({
-                    'execution_id': execution.id,
-                    'status': execution.status,
-                    'result': result,
-                    'message': '执行完成'
-                }, status=http_status.HTTP_200_OK)
-                
-            except Exception as e:
-                # 执行失败，更新执行记录
-                import traceback
-                error_trace = traceback.format_exc()
-                
-                end_time = timezone.now()
-                # 执行失败时，使用总执行时间
-                duration = (end_time - execution.start_time).total_seconds()
-                
-                execution.status = 'failed'
-                execution.result = {
-                    'error': str(e),
-                    'traceback': error_trace,
-                    'success': False
-                }
-                execution.end_time = end_time
-                execution.duration = duration
-                execution.save()
-                
-                return Response({
-                    'execution_id': execution.id,
-                    'status': 'failed',
-                    'error': str(e),
-                    'message': '执行失败'
-                }, status=http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+        user = request.user if request.user.is_authenticated else None
+        parameterized = bool(parameterized_mode == 'enabled' and parameterized_data and isinstance(parameterized_data, list))
+
+        # 创建执行记录并提交后台任务，立即返回执行记录ID，前端通过执行记录查询进度和结果
+        execution = create_testcase_execution(testcase, user=user, parameterized=parameterized)
+        job_id = enqueue('run_testcase_job', execution.id, parameterized_data if parameterized else None)
+
+        return Response({
+            'execution_id': execution.id,
+            'job_id': job_id,
+            'parameterized': parameterized,
+            'status': execution.status,
+            'message': '已提交执行'
+        }, status=http_status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """获取测试用例统计数据"""
         today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # 今日执行的用例数
-        today_executions = Execution.objects.filter(
-            testcase__isnull=False,
-            created_at__gte=today_start
-        ).values('testcase').distinct().count()
+        # 今日执行的用例数（读取用例小时汇总表）
+        today_stats = TestCaseHourlyStat.objects.filter(hour__gte=today_start)
+        today_executions = today_stats.values('testcase').distinct().count()
         
         # 总用例数
         total = TestCase.objects.count()
         
-        # 通过的用例数（基于最新执行记录）
-        passed_count = 0
-        failed_count = 0
-        for testcase in TestCase.objects.all():
-            latest_execution = Execution.objects.filter(testcase=testcase).order_by('-created_at').first()
-            if latest_execution:
-                if latest_execution.status == 'passed':
-                    passed_count += 1
-                elif latest_execution.status == 'failed':
-                    failed_count += 1
+        # 通过的用例数（基于最新执行记录，读取用例最新状态汇总表）
+        passed_count = TestCaseLatestStatus.objects.filter(status='passed').count()
         
         pass_rate = round((passed_count / total * 100), 2) if total > 0 else 0
         
         # 平均耗时（基于今日执行记录）
-        today_durations = Execution.objects.filter(
-            testcase__isnull=False,
-            created_at__gte=today_start,
-            duration__isnull=False
-        ).aggregate(avg_duration=Avg('duration'))
+        today_durations = today_stats.aggregate(
+            duration_sum=Sum('duration_sum'),
+            duration_count=Sum('duration_count')
+        )
         
-        avg_duration = today_durations['avg_duration']
+        avg_duration = (today_durations['duration_sum'] / today_durations['duration_count']) \
+            if today_durations['duration_count'] else None
         if avg_duration:
             avg_duration_ms = avg_duration * 1000
             if avg_duration_ms < 1000:
@@ -301,6 +120,79 @@ class TestCaseViewSet(viewsets.ModelViewSet):
         }, status=http_status.HTTP_200_OK)
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Server-Sent Events（EventSource 请求的 Accept 为 text/event-stream）"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, str)):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+# 时间序列查询默认/最多返回的点数
+SERIES_DEFAULT_POINTS = 300
+SERIES_MAX_POINTS = 2000
+
+
+def _series_params(query_params):
+    """解析时间序列查询参数：name（序列名称）、metrics（逗号分隔的指标）、points（点数）、agg（聚合方式）"""
+    try:
+        points = int(query_params.get('points') or SERIES_DEFAULT_POINTS)
+    except ValueError:
+        raise ValueError('points 必须是整数')
+    agg = query_params.get('agg') or 'avg'
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"agg 只能是 {', '.join(AGGREGATIONS)}")
+    metrics = [metric.strip() for metric in (query_params.get('metrics') or '').split(',') if metric.strip()]
+    return {
+        'name': query_params.get('name') or AGGREGATED,
+        'metrics': metrics or None,
+        'points': max(1, min(points, SERIES_MAX_POINTS)),
+        'agg': agg,
+    }
+
+
+def _run_series(run, params):
+    """单次运行的降采样序列（offset 为相对运行开始的秒数，便于叠加对比）"""
+    columns = decode_series(run.series).get(params['name'])
+    data = None
+    if columns:
+        data = downsample(columns, params['points'], params['agg'], params['metrics'])
+    return {
+        'run_id': run.id,
+        'start_time': run.start_time,
+        'status': run.status,
+        'name': params['name'],
+        'series': data,
+    }
+
+
+# 默认返回的百分位
+DEFAULT_PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+
+def _summary_histogram(summary, name=None):
+    """运行汇总中的直方图编码（name 为请求名称/步骤名称，为空时取汇总直方图）"""
+    summary = summary or {}
+    if not name or name == AGGREGATED:
+        return summary.get('histogram')
+    for step in summary.get('steps') or []:
+        if step.get('name') == name:
+            return step.get('histogram')
+    return None
+
+
+def _live_csv_prefix(last_result):
+    """实时指标读取的结果文件前缀：运行中使用本次运行记录的前缀，已结束使用最近一次结果"""
+    last_result = last_result or {}
+    live = last_result.get('live') or {}
+    if last_result.get('status') == 'running':
+        return live.get('csv_prefix')
+    return last_result.get('csv_prefix') or live.get('csv_prefix')
+
+
 class PerformanceTestViewSet(viewsets.ModelViewSet):
     """性能测试视图集"""
     queryset = PerformanceTest.objects.all()
@@ -314,44 +206,193 @@ class PerformanceTestViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def execute(self, request, pk=None):
-        """执行性能测试（使用 Locust）"""
+        """执行性能测试（使用 Locust，后台任务执行）"""
         performance_test = self.get_object()
-        
+
         try:
-            # 使用 Locust 执行器
-            executor = LocustExecutor(performance_test)
-            result = executor.execute()
-            
-            # 保存执行结果
-            if result.get('success'):
-                performance_test.last_result = result
-                performance_test.last_execution_time = timezone.now()
-                performance_test.save()
-                
-                return Response({
-                    'success': True,
-                    'message': '性能测试执行成功',
-                    'result': result
-                }, status=http_status.HTTP_200_OK)
-            else:
-                return Response({
-                    'success': False,
-                    'message': '性能测试执行失败',
-                    'error': result.get('error', '未知错误'),
-                    'result': result
-                }, status=http_status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
+            # 提前校验配置，配置错误直接返回
+            LocustExecutor(performance_test).validate()
         except ValueError as e:
             return Response({
                 'success': False,
                 'error': str(e)
             }, status=http_status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            logger.exception(f"执行性能测试失败: {e}")
+
+        # 标记为执行中（保留上一次结果），执行完成后由后台任务写入结果
+        # 条件更新：正在执行时拒绝再次提交，避免两次执行同时写入实时指标和结果
+        running = {**(performance_test.last_result or {}), 'status': 'running', 'live': None}
+        not_running = (
+            Q(last_result__isnull=True) | ~Q(last_result__has_key='status') | ~Q(last_result__status='running')
+        )
+        updated = PerformanceTest.objects.filter(not_running, pk=performance_test.pk).update(last_result=running)
+        if not updated:
             return Response({
                 'success': False,
-                'error': f'执行失败: {str(e)}'
-            }, status=http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': '性能测试正在执行中，请等待当前执行完成'
+            }, status=http_status.HTTP_409_CONFLICT)
+        performance_test.last_result = running
+        job_id = enqueue('run_performance_job', performance_test.id)
+
+        return Response({
+            'success': True,
+            'job_id': job_id,
+            'status': 'running',
+            'message': '性能测试已提交执行'
+        }, status=http_status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def live(self, request, pk=None):
+        """
+        实时指标（轮询）：每秒的 RPS、响应时间百分位、失败数和并发用户数
+        参数 since：只返回该时间戳（秒）之后的数据点
+        """
+        performance_test = self.get_object()
+        last_result = performance_test.last_result or {}
+        csv_prefix = _live_csv_prefix(last_result)
+        since = request.query_params.get('since')
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return Response({'error': 'since 必须是时间戳（秒）'}, status=http_status.HTTP_400_BAD_REQUEST)
+        
+        points = []
+        latest = None
+        if csv_prefix:
+            metrics = get_live_metrics(csv_prefix)
+            points = metrics.since(since)
+            latest = metrics.latest
+        return Response({
+            'status': last_result.get('status'),
+            'points': points,
+            'latest': latest
+        }, status=http_status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'], renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def live_stream(self, request, pk=None):
+        """
+        实时指标（SSE）：每个数据点作为一个 metrics 事件推送，事件 id 为时间戳，
+        运行结束后推送 end 事件并关闭连接；连接超过 PERF_LIVE_STREAM_TIMEOUT 秒后关闭，客户端携带 Last-Event-ID 重连
+        """
+        performance_test = self.get_object()
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        try:
+            since = int(last_event_id) if last_event_id else None
+        except ValueError:
+            since = None
+        interval = getattr(settings, 'PERF_LIVE_STREAM_INTERVAL', 1)
+        timeout = getattr(settings, 'PERF_LIVE_STREAM_TIMEOUT', 600)
+        
+        def events(since):
+            deadline = time.monotonic() + timeout
+            while True:
+                last_result = PerformanceTest.objects.filter(pk=performance_test.pk).values_list(
+                    'last_result', flat=True
+                ).first() or {}
+                status = last_result.get('status')
+                csv_prefix = _live_csv_prefix(last_result)
+                if csv_prefix:
+                    for point in get_live_metrics(csv_prefix).since(since):
+                        since = point['timestamp']
+                        yield f"id: {since}\nevent: metrics\ndata: {json.dumps(point)}\n\n"
+                if status != 'running':
+                    yield f"event: end\ndata: {json.dumps({'status': status})}\n\n"
+                    return
+                if time.monotonic() > deadline:
+                    return
+                # 保持连接（注释行）
+                yield ': keep-alive\n\n'
+                time.sleep(interval)
+        
+        response = StreamingHttpResponse(events(since), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # 禁用 Nginx 缓冲
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def compare(self, request, pk=None):
+        """
+        叠加对比多次运行的时间序列
+        参数 runs：逗号分隔的运行记录ID（默认最近两次），其余参数同 performance-runs/{id}/series
+        """
+        performance_test = self.get_object()
+        try:
+            params = _series_params(request.query_params)
+            run_ids = [int(run_id) for run_id in (request.query_params.get('runs') or '').split(',') if run_id.strip()]
+        except ValueError as e:
+            return Response({'error': str(e)}, status=http_status.HTTP_400_BAD_REQUEST)
+        
+        runs = performance_test.runs.all()
+        if run_ids:
+            runs = [run for run in runs.filter(id__in=run_ids)]
+            runs.sort(key=lambda run: run_ids.index(run.id))
+        else:
+            runs = list(runs[:2])
+        return Response({
+            'runs': [_run_series(run, params) for run in runs]
+        }, status=http_status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post', 'delete'])
+    def baseline(self, request, pk=None):
+        """
+        设置回归检测的基线运行（POST {"run_id": 运行记录ID}，默认最近一次成功的运行），DELETE 取消基线
+        设置基线后，每次运行结束都会与基线比较，结果保存在运行记录的 verdict/regression 中并发送通知
+        """
+        performance_test = self.get_object()
+        if request.method == 'DELETE':
+            performance_test.baseline_run = None
+            performance_test.save(update_fields=['baseline_run'])
+            return Response({'baseline_run': None, 'message': '已取消基线'}, status=http_status.HTTP_200_OK)
+        
+        runs = performance_test.runs.defer('series').filter(status='completed')
+        run_id = request.data.get('run_id')
+        run = runs.filter(id=run_id).first() if run_id else runs.first()
+        if run is None:
+            return Response({
+                'error': '运行记录不存在或执行失败，只能选择该性能测试成功的运行作为基线'
+            }, status=http_status.HTTP_400_BAD_REQUEST)
+        performance_test.baseline_run = run
+        performance_test.save(update_fields=['baseline_run'])
+        return Response({
+            'baseline_run': PerformanceRunSerializer(run).data,
+            'message': '已设置基线'
+        }, status=http_status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def percentiles(self, request, pk=None):
+        """
+        合并多次运行的响应时间直方图并计算百分位（按桶累加，结果与把所有请求放在一起统计相同）
+        参数 runs：逗号分隔的运行记录ID（默认最近一次）；p：逗号分隔的百分位（默认 50,75,90,95,99,99.9）；
+        name：请求名称/步骤名称（默认汇总）
+        """
+        performance_test = self.get_object()
+        try:
+            run_ids = [int(run_id) for run_id in (request.query_params.get('runs') or '').split(',') if run_id.strip()]
+            percents = [float(p) for p in (request.query_params.get('p') or '').split(',') if p.strip()]
+        except ValueError:
+            return Response({'error': 'runs 和 p 必须是逗号分隔的数字'}, status=http_status.HTTP_400_BAD_REQUEST)
+        if any(p < 0 or p > 100 for p in percents):
+            return Response({'error': '百分位必须在 0-100 之间'}, status=http_status.HTTP_400_BAD_REQUEST)
+        
+        runs = performance_test.runs.defer('series')
+        runs = list(runs.filter(id__in=run_ids)) if run_ids else list(runs[:1])
+        name = request.query_params.get('name')
+        encoded = {run.id: _summary_histogram(run.summary, name) for run in runs}
+        try:
+            histogram = merge_encoded(encoded.values())
+        except ValueError as e:
+            return Response({'error': f'直方图解析失败: {e}'}, status=http_status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'name': name or AGGREGATED,
+            'runs': [run_id for run_id, value in encoded.items() if value],
+            # 没有直方图的运行（旧版本记录或 Locust 异常退出）不参与合并
+            'missing_runs': [run_id for run_id, value in encoded.items() if not value],
+            'count': histogram.count,
+            'mean': histogram.mean,
+            'min': histogram.min,
+            'max': histogram.max,
+            'percentiles': histogram.percentiles(percents or DEFAULT_PERCENTILES),
+            'histogram': histogram.encode() if histogram.count else None,
+        }, status=http_status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'])
     def html_report(self, request, pk=None):
@@ -413,4 +454,57 @@ class PerformanceTestViewSet(viewsets.ModelViewSet):
             }, status=http_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PerformanceRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """性能测试运行记录视图集"""
+    serializer_class = PerformanceRunSerializer
+
+    def get_queryset(self):
+        queryset = PerformanceRun.objects.all()
+        performance_test_id = self.request.query_params.get('performance_test_id')
+        if performance_test_id:
+            queryset = queryset.filter(performance_test_id=performance_test_id)
+        # 列表和详情不加载时间序列
+        if self.action not in ('series', 'regression'):
+            queryset = queryset.defer('series')
+        return queryset
 
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        """
+        运行的时间序列（降采样）
+        参数：name 序列名称（默认 Aggregated），metrics 逗号分隔的指标（默认全部），
+        points 最多返回的点数（默认300），agg 区间聚合方式 avg/max/min（默认 avg）
+        """
+        run = self.get_object()
+        try:
+            params = _series_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=http_status.HTTP_400_BAD_REQUEST)
+        data = _run_series(run, params)
+        if data['series'] is None:
+            return Response({
+                'error': f"未找到序列: {params['name']}",
+                'series_names': run.series_names
+            }, status=http_status.HTTP_404_NOT_FOUND)
+        return Response(data, status=http_status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def regression(self, request, pk=None):
+        """
+        与基线运行比较（不保存结果），参数 baseline：基线运行记录ID（默认性能测试当前的基线），
+        tolerances 使用性能测试配置的回归容差
+        """
+        run = self.get_object()
+        performance_test = run.performance_test
+        baseline_id = request.query_params.get('baseline') or performance_test.baseline_run_id
+        if not baseline_id:
+            return Response({'error': '未设置基线运行'}, status=http_status.HTTP_400_BAD_REQUEST)
+        baseline = PerformanceRun.objects.filter(
+            id=baseline_id, performance_test_id=performance_test.id, status='completed'
+        ).first()
+        if baseline is None:
+            return Response({'error': '基线运行不存在或执行失败'}, status=http_status.HTTP_404_NOT_FOUND)
+        return Response(
+            run.compare_to(baseline, performance_test.regression_tolerances),
+            status=http_status.HTTP_200_OK
+        )
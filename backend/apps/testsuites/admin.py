@@ -22,6 +22,9 @@ class TestSuiteAdmin(admin.ModelAdmin):
         ('基本信息', {
             'fields': ('name', 'project', 'environment', 'description', 'is_active')
         }),
+        ('执行配置', {
+            'fields': ('max_concurrency',),
+        }),
         ('时间信息', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
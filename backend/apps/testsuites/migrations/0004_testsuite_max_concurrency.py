@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testsuites', '0003_fix_cascade_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsuite',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(blank=True, help_text='套件执行时同时运行的用例数上限，留空则使用系统默认值（SUITE_MAX_CONCURRENCY）', null=True, verbose_name='最大并发数'),
+        ),
+    ]
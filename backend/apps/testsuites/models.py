@@ -33,6 +33,12 @@ class TestSuite(models.Model):
     )
     environment = models.ForeignKey(Environment, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='测试环境')
     description = models.TextField(blank=True, null=True, verbose_name='套件描述')
+    max_concurrency = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='最大并发数',
+        help_text='套件执行时同时运行的用例数上限，留空则使用系统默认值（SUITE_MAX_CONCURRENCY）'
+    )
     is_active = models.BooleanField(default=True, verbose_name='是否激活')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
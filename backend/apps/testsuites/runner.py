@@ -0,0 +1,488 @@
+"""
+测试套件执行引擎（依赖感知的并行调度）
+
+根据用例的变量提取配置（variables.extractors）和 ${var} 引用推断用例之间的依赖关系，
+互不依赖的用例在有界线程池中并行执行，存在依赖的用例仍按套件顺序先后执行，
+前置用例提取的变量只会传递给依赖它的用例。
+"""
+import re
+import asyncio
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Set
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from apps.executions.models import Execution
+from apps.executions.recorder import ExecutionRecorder
+from apps.executions.rollups import record_finished
+from apps.executions.blobs import summarize_result
+from apps.environments.tokens import GlobalTokenResolver
+from apps.testcases.executor import (
+    TestCaseExecutor, AsyncTestCaseExecutor, create_async_client, is_async_execution_enabled
+)
+
+logger = logging.getLogger(__name__)
+
+VARIABLE_PATTERN = re.compile(r'\$\{(\w+)\}')
+# 脚本中以字面量变量名调用 set_variable，可以静态识别输出变量
+SET_VARIABLE_PATTERN = re.compile(r'set_variable\(\s*[\'"](\w+)[\'"]')
+# 脚本中直接修改 variables 或以非字面量调用 set_variable，无法静态识别输出变量
+DYNAMIC_MUTATION_PATTERN = re.compile(
+    r'variables\s*\[|variables\.(?:update|setdefault|pop|clear)\s*\(|set_variable\(\s*[^\'"\s)]'
+)
+# 脚本中以字面量变量名读取变量（get_variable('x') / variables.get('x')），可以静态识别输入变量
+GET_VARIABLE_PATTERN = re.compile(r'(?:get_variable|variables\.get)\(\s*[\'"](\w+)[\'"]')
+# 去掉可静态识别的读写后仍出现 variables/get_variable（如以非字面量读取、遍历 variables），无法静态识别输入变量
+DYNAMIC_ACCESS_PATTERN = re.compile(r'\b(?:variables|get_variable)\b')
+# 未显式引用变量时，认证逻辑也会读取这些变量（见 TestCaseExecutor._build_auth）
+IMPLICIT_AUTH_VARIABLES = {'token', 'access_token'}
+BASIC_AUTH_VARIABLES = {'username', 'password', 'basic_username', 'basic_password'}
+
+
+def collect_variable_references(data: Any, found: Optional[Set[str]] = None) -> Set[str]:
+    """递归收集数据中引用的 ${variable} 变量名"""
+    if found is None:
+        found = set()
+    if isinstance(data, dict):
+        for key, value in data.items():
+            collect_variable_references(key, found)
+            collect_variable_references(value, found)
+    elif isinstance(data, list):
+        for item in data:
+            collect_variable_references(item, found)
+    elif isinstance(data, str):
+        found.update(VARIABLE_PATTERN.findall(data))
+    return found
+
+
+def get_suite_concurrency(testsuite, override=None) -> int:
+    """
+    获取套件执行的最大并发数
+    优先级：本次执行传入 > 套件配置 > 系统默认值
+    """
+    for value in (override, testsuite.max_concurrency, getattr(settings, 'SUITE_MAX_CONCURRENCY', 4)):
+        if value in (None, ''):
+            continue
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            continue
+    return 1
+
+
+def create_suite_execution(testsuite, user=None, name=None, status='running') -> Execution:
+    """创建套件执行记录（父记录），提交到后台任务执行时状态为 pending"""
+    return Execution.objects.create(
+        name=name or f"{testsuite.name} - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        project=testsuite.project,
+        testsuite=testsuite,
+        executor=user,
+        status=status,
+        start_time=timezone.now(),
+        execution_type='suite',
+        parent=None  # 父记录
+    )
+
+
+class CaseNode:
+    """套件中的一个用例节点"""
+
+    def __init__(self, index: int, testcase, environment=None):
+        self.index = index
+        self.testcase = testcase
+        self.inputs = self._collect_inputs(testcase, environment)
+        self.outputs, self.is_barrier = self._collect_outputs(testcase, environment)
+        self.dependencies: Set[int] = set()
+        self.dependents: Set[int] = set()
+
+    @staticmethod
+    def _scripts(testcase, environment) -> List[str]:
+        """用例执行时运行的脚本：用例前置/后置脚本和环境前置/后置钩子"""
+        scripts = [testcase.pre_script, testcase.post_script]
+        if environment:
+            scripts.extend([environment.pre_hook, environment.post_hook])
+        return [script for script in scripts if script]
+
+    @classmethod
+    def _collect_inputs(cls, testcase, environment) -> Set[str]:
+        """收集用例请求、脚本和钩子中读取的变量"""
+        api = testcase.api
+        sources = [
+            testcase.url_override or api.url,
+            api.headers,
+            testcase.headers_override,
+            testcase.params_override or api.params,
+            testcase.body_override or api.body,
+            api.auth_config,
+        ]
+        if environment:
+            sources.append(environment.headers)
+        inputs = collect_variable_references(sources)
+        for script in cls._scripts(testcase, environment):
+            inputs.update(GET_VARIABLE_PATTERN.findall(script))
+        inputs.update(IMPLICIT_AUTH_VARIABLES)
+        if api.auth_type and api.auth_type.lower() == 'basic':
+            inputs.update(BASIC_AUTH_VARIABLES)
+        return inputs
+
+    @classmethod
+    def _collect_outputs(cls, testcase, environment):
+        """
+        收集用例输出的变量
+        :return: (输出变量集合, 脚本读写的变量是否无法静态分析)
+        """
+        extractors = (testcase.variables or {}).get('extractors') or {}
+        outputs = set(extractors.keys()) if isinstance(extractors, dict) else set()
+        is_barrier = False
+        for script in cls._scripts(testcase, environment):
+            outputs.update(SET_VARIABLE_PATTERN.findall(script))
+            if DYNAMIC_MUTATION_PATTERN.search(script):
+                is_barrier = True
+            remaining = GET_VARIABLE_PATTERN.sub('', SET_VARIABLE_PATTERN.sub('', script))
+            if DYNAMIC_ACCESS_PATTERN.search(remaining):
+                is_barrier = True
+        return outputs, is_barrier
+
+
+def build_dependency_graph(nodes: List[CaseNode]) -> None:
+    """
+    根据变量的读写关系建立用例依赖
+    - 读取变量的用例依赖于套件顺序中该变量最近的一个提取者
+    - 重复提取同一变量的用例保持原有先后顺序
+    - 脚本读写的变量无法静态分析的用例作为屏障：依赖之前的所有用例，之后的所有用例都依赖它
+    """
+    last_producer: Dict[str, int] = {}
+    last_barrier = None
+    for node in nodes:
+        if node.is_barrier:
+            node.dependencies.update(n.index for n in nodes[:node.index])
+        else:
+            if last_barrier is not None:
+                node.dependencies.add(last_barrier)
+            for var_name in node.inputs | node.outputs:
+                if var_name in last_producer:
+                    node.dependencies.add(last_producer[var_name])
+        for var_name in node.outputs:
+            last_producer[var_name] = node.index
+        if node.is_barrier:
+            last_barrier = node.index
+            last_producer = {}
+        for dep in node.dependencies:
+            nodes[dep].dependents.add(node.index)
+
+
+class SuiteRunner:
+    """测试套件执行器"""
+
+    def __init__(self, testsuite, user=None, max_workers=None):
+        """
+        初始化套件执行器
+        :param testsuite: TestSuite 实例
+        :param user: 执行人（可选）
+        :param max_workers: 本次执行的最大并发数（可选，默认使用套件配置）
+        """
+        self.testsuite = testsuite
+        self.user = user
+        self.environment = testsuite.environment
+        self.max_workers = get_suite_concurrency(testsuite, max_workers)
+        # 整个套件共用一个全局Token解析器，每个用例不再重复查询
+        self.token_resolver = GlobalTokenResolver()
+
+        # 套件的基础共享变量（环境变量）
+        self.base_variables = {}
+        if self.environment and self.environment.variables:
+            self.base_variables.update(self.environment.variables)
+
+        testcases = list(testsuite.get_ordered_testcases().select_related('api', 'project', 'environment'))
+        self.nodes = [
+            CaseNode(idx, testcase, self.environment or testcase.environment)
+            for idx, testcase in enumerate(testcases)
+        ]
+        build_dependency_graph(self.nodes)
+
+        # 每个节点执行完成后提取的变量
+        self.node_variables: Dict[int, Dict[str, Any]] = {}
+        # 子执行记录批量写入器（run 时创建）
+        self.recorder: Optional[ExecutionRecorder] = None
+
+    def _closure(self, node: CaseNode) -> List[int]:
+        """获取节点的所有（传递）依赖，按套件顺序排列"""
+        visited = set()
+        stack = list(node.dependencies)
+        while stack:
+            index = stack.pop()
+            if index in visited:
+                continue
+            visited.add(index)
+            stack.extend(self.nodes[index].dependencies)
+        return sorted(visited)
+
+    def _build_scope(self, node: CaseNode) -> Dict[str, Any]:
+        """构建节点执行时可见的共享变量：基础变量 + 依赖用例按顺序提取的变量"""
+        scope = dict(self.base_variables)
+        for index in self._closure(node):
+            scope.update(self.node_variables.get(index, {}))
+        return scope
+
+    @staticmethod
+    def _iterations(testcase):
+        """获取用例的执行迭代：参数化用例每组参数一次，普通用例一次"""
+        parameterized_data = testcase.parameterized_data or []
+        is_parameterized = ((testcase.parameterized_mode or 'disabled') == 'enabled' and
+                            isinstance(parameterized_data, list) and
+                            len(parameterized_data) > 0)
+        if not is_parameterized:
+            return [(None, None, None)]
+        total = len(parameterized_data)
+        return [(param_set, idx + 1, total) for idx, param_set in enumerate(parameterized_data)]
+
+    def _start_case(self, testcase, suite_execution, param_set=None, param_index=None, param_total=None):
+        """创建用例执行记录（子记录，暂不写入数据库）"""
+        if param_set is not None:
+            name = f"{testcase.name} [参数化#{param_index}/{param_total}] - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            display_name = f"{testcase.name} [参数化#{param_index}]"
+        else:
+            name = f"{testcase.name} - {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            display_name = testcase.name
+
+        # 子记录在用例执行完成后由 ExecutionRecorder 批量写入
+        case_execution = self.recorder.new(
+            name=name,
+            project=testcase.project,
+            testsuite=self.testsuite,
+            testcase=testcase,
+            executor=self.user,
+            status='running',
+            start_time=timezone.now(),
+            execution_type='suite',  # 套件内的执行
+            parent=suite_execution  # 关联到父记录（套件执行）
+        )
+
+        case_result = {
+            'testcase_id': testcase.id,
+            'testcase_name': display_name,
+            'execution_id': None,  # 子记录写入后回填
+        }
+        if param_set is not None:
+            case_result['parameterized_index'] = param_index
+            case_result['parameterized_total'] = param_total
+        return case_execution, case_result
+
+    def _build_executor(self, executor_class, testcase, shared_variables, param_set=None):
+        """创建执行器，并传入共享变量和参数化数据"""
+        executor = executor_class(testcase, self.environment or testcase.environment, self.token_resolver)
+        # 将之前提取的变量传递给当前执行器
+        executor.variables.update(shared_variables)
+        if param_set is not None:
+            # 将参数化数据合并到执行器的变量中
+            executor.variables.update(param_set)
+        return executor
+
+    def _finish_case(self, case_execution, case_result, result, shared_variables) -> None:
+        """根据执行结果更新用例执行记录，并更新共享变量"""
+        # 将当前执行提取的变量合并到共享变量中，供后续用例使用
+        extracted_vars = result.get('extracted_variables', {})
+        if extracted_vars:
+            shared_variables.update(extracted_vars)
+
+        # 优先使用HTTP请求的实际时间（result.time，毫秒），如果没有则使用总执行时间
+        case_end_time = timezone.now()
+        http_time = result.get('time')
+        if http_time:
+            case_duration = http_time / 1000.0
+        else:
+            case_duration = (case_end_time - case_execution.start_time).total_seconds()
+
+        case_execution.status = 'passed' if result.get('success', False) else 'failed'
+        case_execution.result = result
+        case_execution.end_time = case_end_time
+        case_execution.duration = case_duration
+
+        case_result.update({
+            'status': case_execution.status,
+            'duration': case_duration,
+            # 父记录只保存结果摘要，响应体等完整结果在子执行记录中
+            'result': summarize_result(result)
+        })
+        self.recorder.record(case_execution, case_result)
+
+    def _fail_case(self, case_execution, case_result, error, error_trace) -> None:
+        """用例执行异常时更新执行记录"""
+        logger.warning(f"套件 {self.testsuite.name} 中用例 {case_result['testcase_name']} 执行异常: {error}")
+        case_end_time = timezone.now()
+        case_duration = (case_end_time - case_execution.start_time).total_seconds()
+
+        case_execution.status = 'failed'
+        case_execution.result = {
+            'error': str(error),
+            'traceback': error_trace,
+            'success': False
+        }
+        case_execution.end_time = case_end_time
+        case_execution.duration = case_duration
+
+        case_result.update({
+            'status': 'failed',
+            'duration': case_duration,
+            'error': str(error)
+        })
+        self.recorder.record(case_execution, case_result)
+
+    def _run_node(self, node: CaseNode, suite_execution, shared_variables) -> List[Dict[str, Any]]:
+        """在工作线程中执行一个用例节点（参数化用例的各次迭代在节点内顺序执行）"""
+        try:
+            case_results = []
+            for param_set, param_index, param_total in self._iterations(node.testcase):
+                case_execution, case_result = self._start_case(
+                    node.testcase, suite_execution, param_set, param_index, param_total
+                )
+                try:
+                    executor = self._build_executor(TestCaseExecutor, node.testcase, shared_variables, param_set)
+                    result = executor.execute()
+                    self._finish_case(case_execution, case_result, result, shared_variables)
+                except Exception as e:
+                    self._fail_case(case_execution, case_result, e, traceback.format_exc())
+                case_results.append(case_result)
+            return case_results
+        finally:
+            # 工作线程持有独立的数据库连接，执行完毕后关闭，避免连接泄漏
+            connection.close()
+
+    def _run_nodes(self, suite_execution) -> Dict[int, List[Dict[str, Any]]]:
+        """在有界线程池中按依赖关系执行所有用例节点"""
+        node_results: Dict[int, List[Dict[str, Any]]] = {}
+        remaining = {node.index: set(node.dependencies) for node in self.nodes}
+        ready = sorted(index for index, deps in remaining.items() if not deps)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='suite-runner') as pool:
+            running = {}
+
+            def submit(index):
+                node = self.nodes[index]
+                shared_variables = self._build_scope(node)
+                future = pool.submit(self._run_node, node, suite_execution, shared_variables)
+                running[future] = (index, shared_variables)
+
+            for index in ready:
+                submit(index)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                released = []
+                for future in done:
+                    index, shared_variables = running.pop(future)
+                    node_results[index] = future.result()
+                    self.node_variables[index] = shared_variables
+                    # 依赖用例无论成功与否都会继续执行（与顺序执行时的行为一致）
+                    for dependent in self.nodes[index].dependents:
+                        remaining[dependent].discard(index)
+                        if not remaining[dependent]:
+                            released.append(dependent)
+                for dependent in sorted(released):
+                    submit(dependent)
+
+        return node_results
+
+    async def _run_node_async(self, node: CaseNode, suite_execution, shared_variables, client) -> List[Dict[str, Any]]:
+        """在事件循环中执行一个用例节点（数据库读写在线程中完成，HTTP请求异步发送）"""
+        case_results = []
+        for param_set, param_index, param_total in self._iterations(node.testcase):
+            case_execution, case_result = self._start_case(
+                node.testcase, suite_execution, param_set, param_index, param_total
+            )
+            try:
+                executor = await sync_to_async(self._build_executor)(
+                    AsyncTestCaseExecutor, node.testcase, shared_variables, param_set
+                )
+                result = await executor.execute(client=client)
+                await sync_to_async(self._finish_case)(case_execution, case_result, result, shared_variables)
+            except Exception as e:
+                await sync_to_async(self._fail_case)(case_execution, case_result, e, traceback.format_exc())
+            case_results.append(case_result)
+        return case_results
+
+    async def _run_nodes_async(self, suite_execution) -> Dict[int, List[Dict[str, Any]]]:
+        """在单个事件循环中按依赖关系并发执行所有用例节点（TESTCASE_EXECUTION_MODE=async）"""
+        node_results: Dict[int, List[Dict[str, Any]]] = {}
+        semaphore = asyncio.Semaphore(self.max_workers)
+        finished = {node.index: asyncio.Event() for node in self.nodes}
+
+        async with create_async_client() as client:
+            async def run_node(node):
+                try:
+                    for dependency in node.dependencies:
+                        await finished[dependency].wait()
+                    async with semaphore:
+                        shared_variables = self._build_scope(node)
+                        node_results[node.index] = await self._run_node_async(
+                            node, suite_execution, shared_variables, client
+                        )
+                        self.node_variables[node.index] = shared_variables
+                finally:
+                    # 依赖用例无论成功与否都会继续执行（与顺序执行时的行为一致）
+                    finished[node.index].set()
+
+            await asyncio.gather(*(run_node(node) for node in self.nodes))
+
+        # 关闭执行数据库操作的线程所持有的连接
+        await sync_to_async(connection.close)()
+        return node_results
+
+    def run(self, suite_execution) -> Dict[str, Any]:
+        """
+        执行套件并更新套件执行记录
+        :param suite_execution: 套件执行记录（父记录）
+        :return: 执行汇总
+        """
+        suite_start_time = suite_execution.start_time or timezone.now()
+        # 在调度用例前加载全局Token，执行期间各用例直接复用
+        self.token_resolver.get()
+        self.recorder = ExecutionRecorder(
+            suite_execution,
+            total=sum(len(self._iterations(node.testcase)) for node in self.nodes)
+        )
+        try:
+            if is_async_execution_enabled():
+                node_results = asyncio.run(self._run_nodes_async(suite_execution))
+            else:
+                node_results = self._run_nodes(suite_execution)
+        finally:
+            # 写入剩余的子执行记录
+            self.recorder.close()
+
+        # 按套件顺序汇总结果
+        case_results = []
+        for node in self.nodes:
+            case_results.extend(node_results.get(node.index, []))
+        passed_count = sum(1 for r in case_results if r.get('status') == 'passed')
+        failed_count = len(case_results) - passed_count
+        total = len(self.nodes)
+
+        suite_end_time = timezone.now()
+        suite_duration = (suite_end_time - suite_start_time).total_seconds()
+
+        suite_execution.status = 'passed' if failed_count == 0 else 'failed'
+        suite_execution.result = {
+            'total': total,
+            'passed': passed_count,
+            'failed': failed_count,
+            'pass_rate': round(passed_count / total * 100, 2) if total > 0 else 0,
+            'max_concurrency': self.max_workers,
+            'case_results': case_results
+        }
+        suite_execution.end_time = suite_end_time
+        suite_execution.duration = suite_duration
+        suite_execution.save()
+        record_finished([suite_execution])
+
+        return {
+            'total': total,
+            'passed': passed_count,
+            'failed': failed_count,
+            'pass_rate': suite_execution.result['pass_rate'],
+            'duration': suite_duration,
+            'case_results': case_results
+        }
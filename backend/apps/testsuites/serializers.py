@@ -52,16 +52,20 @@ class TestSuiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestSuite
         fields = ['id', 'name', 'project', 'project_id', 'testcases_with_order', 'testcases_order',
-                  'environment', 'environment_id', 'description', 'is_active', 'created_at', 'updated_at']
+                  'environment', 'environment_id', 'description', 'max_concurrency',
+                  'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_testcases_with_order(self, obj):
         """获取带顺序的测试用例列表"""
-        # 获取关联关系，按order排序
-        relations = TestSuiteTestCase.objects.filter(testsuite=obj).select_related('testcase').order_by('order', 'id')
+        # 获取关联关系，按order排序（优先使用列表查询时预加载的关联关系）
+        if 'testsuitetestcase_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            relations = obj.testsuitetestcase_set.all()
+        else:
+            relations = TestSuiteTestCase.objects.filter(testsuite=obj).select_related('testcase').order_by('order', 'id')
         result = []
         for relation in relations:
-            testcase_data = TestCaseSerializer(relation.testcase).data
+            testcase_data = TestCaseSerializer(relation.testcase, context=self.context).data
             testcase_data['order'] = relation.order
             result.append(testcase_data)
         return result
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+
+from .runner import CaseNode, build_dependency_graph
+
+
+def make_case(pre_script=None, post_script=None, url='/ok', extractors=None):
+    api = SimpleNamespace(url=url, headers={}, params={}, body={}, auth_config={}, auth_type=None)
+    return SimpleNamespace(
+        api=api, url_override=None, headers_override=None, params_override=None, body_override=None,
+        variables={'extractors': extractors or {}}, pre_script=pre_script, post_script=post_script,
+    )
+
+
+def build(*testcases, environment=None):
+    nodes = [CaseNode(index, testcase, environment) for index, testcase in enumerate(testcases)]
+    build_dependency_graph(nodes)
+    return nodes
+
+
+class DependencyGraphTests(SimpleTestCase):
+    """用例依赖推断：请求、脚本和钩子中读取的变量都作为输入"""
+
+    def test_independent_cases(self):
+        nodes = build(make_case(), make_case())
+        self.assertEqual(nodes[1].dependencies, set())
+
+    def test_request_reference(self):
+        nodes = build(make_case(extractors={'user_id': '$.id'}), make_case(url='/users/${user_id}'))
+        self.assertEqual(nodes[1].dependencies, {0})
+
+    def test_script_reads_are_inputs(self):
+        nodes = build(
+            make_case(post_script="set_variable('order_id', 1)"),
+            make_case(pre_script="order = get_variable('order_id')"),
+            make_case(post_script="assert variables.get(\"order_id\")"),
+            make_case(),
+        )
+        self.assertEqual(nodes[1].dependencies, {0})
+        self.assertEqual(nodes[2].dependencies, {0})
+        self.assertEqual(nodes[3].dependencies, set())
+
+    def test_dynamic_script_read_is_barrier(self):
+        nodes = build(
+            make_case(extractors={'token': '$.token'}),
+            make_case(),
+            make_case(pre_script="for name in variables:\n    print(name)"),
+            make_case(),
+        )
+        self.assertTrue(nodes[2].is_barrier)
+        self.assertEqual(nodes[2].dependencies, {0, 1})
+        self.assertEqual(nodes[3].dependencies, {2})
+
+    def test_environment_hook_reads(self):
+        environment = SimpleNamespace(headers={}, pre_hook="sign(get_variable('secret'))", post_hook=None)
+        nodes = build(make_case(extractors={'secret': '$.secret'}), make_case(), environment=environment)
+        self.assertIn('secret', nodes[1].inputs)
+        self.assertEqual(nodes[1].dependencies, {0})
@@ -16,4 +16,31 @@ export const batchDeleteExecutions = (ids) => {
   return api.post('/executions/executions/batch_delete/', { ids })
 }
 
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms))
 
+// 执行在后台任务中进行，轮询执行记录直到执行结束
+export const waitForExecution = async (id, { interval = 1000, timeout = 30 * 60 * 1000 } = {}) => {
+  const deadline = Date.now() + timeout
+  while (true) {
+    const execution = await getExecution(id)
+    if (!['pending', 'running'].includes(execution.status)) {
+      return execution
+    }
+    if (Date.now() > deadline) {
+      throw new Error('等待执行结果超时，执行可能仍在后台进行，请稍后在执行记录中查看')
+    }
+    await sleep(interval)
+  }
+}
+
+// 提交执行后等待结果，返回与同步执行接口一致的结构
+export const resolveExecutionResult = async (submitted) => {
+  const execution = await waitForExecution(submitted.execution_id)
+  const result = execution.result || {}
+  return {
+    ...result,
+    execution_id: execution.id,
+    status: execution.status,
+    result
+  }
+}
@@ -20,11 +20,25 @@ export const deletePerformanceTest = (id) => {
   return api.delete(`/testcases/performance-tests/${id}/`)
 }
 
-export const executePerformanceTest = (id) => {
-  // 性能测试可能需要很长时间（60秒+），需要增加超时时间
-  // 使用自定义配置覆盖默认的10秒超时
-  return api.post(`/testcases/performance-tests/${id}/execute/`, {}, {
-    timeout: 300000  // 5分钟超时（300秒），足够60秒测试 + 启动时间 + 缓冲
-  })
+// 性能测试在后台任务中执行，轮询任务的最新结果直到执行结束
+export const executePerformanceTest = async (id, { interval = 3000, timeout = 2 * 60 * 60 * 1000 } = {}) => {
+  await api.post(`/testcases/performance-tests/${id}/execute/`)
+  const deadline = Date.now() + timeout
+  while (true) {
+    const performanceTest = await getPerformanceTest(id)
+    const result = performanceTest.last_result || {}
+    if (result.status !== 'running') {
+      const success = result.status !== 'failed'
+      return {
+        success,
+        message: success ? '性能测试执行成功' : '性能测试执行失败',
+        error: result.error,
+        result: success ? result : (result.failed_result || result)
+      }
+    }
+    if (Date.now() > deadline) {
+      throw new Error('等待性能测试结果超时，测试可能仍在后台执行中，请稍后查看结果')
+    }
+    await new Promise(resolve => setTimeout(resolve, interval))
+  }
 }
-
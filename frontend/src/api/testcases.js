@@ -1,4 +1,5 @@
 import api from './index'
+import { resolveExecutionResult } from './executions'
 
 // 获取测试用例列表
 export const getTestCases = (params = {}) => {
@@ -25,9 +26,10 @@ export const deleteTestCase = (id) => {
   return api.delete(`/testcases/testcases/${id}/`)
 }
 
-// 执行测试用例
-export const executeTestCase = (id, data = {}) => {
-  return api.post(`/testcases/testcases/${id}/execute/`, data)
+// 执行测试用例（后台执行，等待执行完成后返回结果）
+export const executeTestCase = async (id, data = {}) => {
+  const submitted = await api.post(`/testcases/testcases/${id}/execute/`, data)
+  return resolveExecutionResult(submitted)
 }
 
 // 获取测试用例统计数据
@@ -1,4 +1,5 @@
 import api from './index'
+import { resolveExecutionResult } from './executions'
 
 export const getTestSuites = (params = {}) => {
   return api.get('/testsuites/testsuites/', { params })
@@ -20,8 +21,10 @@ export const deleteTestSuite = (id) => {
   return api.delete(`/testsuites/testsuites/${id}/`)
 }
 
-export const executeTestSuite = (id) => {
-  return api.post(`/testsuites/testsuites/${id}/execute/`)
+// 执行测试套件（后台执行，等待执行完成后返回结果）
+export const executeTestSuite = async (id) => {
+  const submitted = await api.post(`/testsuites/testsuites/${id}/execute/`)
+  return resolveExecutionResult(submitted)
 }
 
 export const reorderTestCases = (id, testcase_orders) => {